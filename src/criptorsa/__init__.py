@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+RSA, Diffie-Hellman and ElGamal from the Criptografía portfolio.
+
+The top level namespace is lazy: importing criptorsa loads nothing else,
+and each name is imported from its submodule on first access, so command
+line tools that only need RSA never pay for the Diffie-Hellman, pi or
+NumPy machinery.
+
+    import criptorsa
+    (n, e), d = criptorsa.rsa_keygen(2048)
+"""
+import importlib
+
+__version__ = "0.1.0"
+
+# Public name -> submodule defining it
+_EXPORTS = {
+    "rsa": ("CRTKey", "BlockMemo", "max_primes", "crt_key", "rsa_keygen",
+            "rsa_encrypt", "rsa_decrypt", "rsa_encrypted_size", "rsa_encrypt_into",
+            "rsa_decrypt_into", "rsa_decrypt_range", "rsa_encrypt_stream",
+            "rsa_decrypt_stream", "rsa_encrypt_many", "rsa_encrypt_for_recipients"),
+    "rsa_signature": ("rsa_sign", "rsa_verify"),
+    "diffie_hellman": ("DHGroup", "safe_prime", "diffie_primes", "rfc_group",
+                       "generate_keypair", "common_key", "random_exponent",
+                       "PeerKeyCache", "check_public_value", "validate_public_value",
+                       "peer_key_metrics"),
+    "elgamal": ("elgamal_domain", "elgamal_keygen", "elgamal_encrypt", "elgamal_decrypt",
+                "elgamal_encrypt_many", "elgamal_encrypt_for_recipients"),
+    "funcs": ("power_mod", "is_probable_prime", "random_probable_prime",
+              "CandidateSampler", "set_backend", "get_backend", "available_backends",
+              "seed_random", "CancelToken", "GenerationCancelled", "GenerationTimeout",
+              "GenerationProgress", "free_threaded", "execution_mode",
+              "parallel_executor"),
+    "compression": ("compress", "decompress", "rsa_encrypt_compressed",
+                    "rsa_decrypt_compressed", "elgamal_encrypt_compressed",
+                    "elgamal_decrypt_compressed"),
+    "pi": ("pi_fixed", "approximate_pi"),
+    "dh_session": ("DHSession", "EphemeralKeyPool"),
+    "prime_pool": ("PrimePool",),
+    "domain_params": ("DomainParameterStore", "default_store"),
+    "rsa_keyring": ("Keyring",),
+    "crypto_client": ("CryptoClient",),
+}
+_LOCATIONS = {name: module for module, names in _EXPORTS.items() for name in names}
+_SUBMODULES = ("batch", "benchmarks", "compression", "crypto_client", "crypto_daemon",
+               "dh_session", "diffie_hellman", "domain_params", "elgamal", "funcs",
+               "load_test", "memory_bench", "pi", "prime_pool", "rsa", "rsa_keyring",
+               "rsa_signature", "small_group")
+
+__all__ = sorted(_LOCATIONS)
+
+
+def __getattr__(name: str):
+    if name in _LOCATIONS:
+        value = getattr(importlib.import_module("." + _LOCATIONS[name], __name__), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module("." + name, __name__)
+    else:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    # Cached, so __getattr__ only runs on the first access
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LOCATIONS) | set(_SUBMODULES))
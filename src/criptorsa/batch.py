@@ -0,0 +1,503 @@
+# -*- coding: utf-8 -*-
+"""
+Parallel batch processing of file trees with RSA.
+
+Walks a directory and spreads its files over a pool of worker processes.
+Each worker loads the key once, when it starts, and streams every file in
+chunks, so memory does not grow with the size of the files. Every finished
+file is appended to a manifest, and a run given the same manifest skips the
+files already done, so an interrupted run can be resumed.
+
+    python -m criptorsa.batch keygen keys --nlen 2048
+    python -m criptorsa.batch encrypt export/ encrypted/ --key keys/key.pub.json
+    python -m criptorsa.batch decrypt encrypted/ export/ --key keys/key.json
+    python -m criptorsa.batch sign export/ signatures/ --key keys/key.json
+    python -m criptorsa.batch verify export/ signatures/ --key keys/key.pub.json
+
+Encrypted files are byte for byte what rsa_encrypt returns, and signatures
+what rsa_sign returns for the SHA-256 of the file. Keys are JSON files with
+the fields of rsa_keyring.import_json, or a keyring plus a fingerprint.
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from .funcs import CancelToken, GenerationCancelled
+from .rsa import CRTKey, crt_key, rsa_keygen, rsa_encrypt_stream, rsa_decrypt_stream
+from .rsa_signature import rsa_sign, rsa_verify
+from .rsa_keyring import Keyring, fingerprint
+
+COMMANDS = ("encrypt", "decrypt", "sign", "verify")
+SUFFIXES = {"encrypt": ".enc", "sign": ".sig", "verify": ".sig"}
+PARTIAL_SUFFIX = ".part"
+CHUNK_SIZE = 1 << 20
+MANIFEST_PREFIX = ".manifest."
+
+# Key of the worker, loaded once by _init_worker
+_key = None
+# Event that stops the generations of a keygen worker, see _init_keygen
+_stop = None
+
+
+def load_key(path: str, fp: str = None) -> tuple[int, int, int | CRTKey | None]:
+    '''
+    Load a key from a JSON key file or, with a fingerprint, from a keyring
+
+    Parameters
+    ----------
+    path : str
+        JSON file {"n", "e", "d", "primes"} ("d" and "primes" optional) or
+        binary keyring
+    fp : str, optional
+        Hex fingerprint of the key in the keyring. The default is None, path
+        is a JSON key file
+
+    Returns
+    -------
+    tuple[int, int, int | CRTKey | None]
+        n, e and the private key, None for a public key
+    '''
+    if fp is not None:
+        with Keyring(path) as keyring:
+            return keyring.get(fp)
+    with open(path) as f:
+        params = json.load(f)
+    d = params.get("d")
+    if d is not None:
+        d = int(d)
+        if params.get("primes"):
+            d = crt_key(d, [int(r) for r in params["primes"]])
+    return int(params["n"]), int(params["e"]), d
+
+
+def key_params(n: int, e: int, d: int | CRTKey = None) -> dict:
+    '''
+    Fields of the JSON key file of a key, the inverse of load_key
+    '''
+    params = {"n": n, "e": e}
+    if isinstance(d, CRTKey):
+        params["d"] = d.d
+        params["primes"] = list(d.primes)
+    elif d is not None:
+        params["d"] = d
+    return params
+
+
+def target_path(command: str, relative: str) -> str:
+    '''
+    Path, relative to the output tree, written (or read, for verify) for
+    the file relative of the input tree
+    '''
+    if command == "decrypt":
+        root, suffix = os.path.splitext(relative)
+        return root if suffix == SUFFIXES["encrypt"] else relative
+    return relative + SUFFIXES[command]
+
+
+def walk(source: str, skip: tuple[str, ...] = None) -> list[str]:
+    '''
+    Files of a tree as sorted paths relative to its root. Manifests and
+    files ending in one of the skip suffixes (for example the signatures
+    written next to the files) are left out
+    '''
+    files = []
+    for root, dirs, names in os.walk(source):
+        dirs.sort()
+        for name in sorted(names):
+            if name.startswith(MANIFEST_PREFIX):
+                continue
+            if skip is None or not name.endswith(skip):
+                files.append(os.path.relpath(os.path.join(root, name), source))
+    return files
+
+
+def read_chunks(f, chunk_size: int = CHUNK_SIZE):
+    while chunk := f.read(chunk_size):
+        yield chunk
+
+
+def _init_worker(path: str, fp: str):
+    global _key
+    _key = load_key(path, fp)
+
+
+def _write_atomic(path: str, pieces, mode: int = 0o666) -> None:
+    # Written aside and renamed, so an interrupted run never leaves a
+    # truncated file that looks finished. mode (0o600 for private keys) is
+    # set on the partial file before anything is written to it
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    partial = path + PARTIAL_SUFFIX
+    try:
+        fd = os.open(partial, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+        if mode != 0o666:
+            # A partial file left by a crash keeps its old mode
+            os.fchmod(fd, mode)
+        with os.fdopen(fd, "wb") as f:
+            for piece in pieces:
+                f.write(piece)
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+
+
+def _file_digest(path: str) -> bytes:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in read_chunks(f):
+            sha.update(chunk)
+    return sha.digest()
+
+
+def process_file(job: tuple[str, str, str, str]) -> tuple[str, int, bool, str | None]:
+    '''
+    Run a command on one file with the key of the worker
+
+    Parameters
+    ----------
+    job : tuple[str, str, str, str]
+        Command, input tree, output tree and path of the file relative to
+        the input tree
+
+    Returns
+    -------
+    tuple[str, int, bool, str | None]
+        Relative path, bytes read, whether the file is done (for verify,
+        whether the signature is valid) and the error, if any
+    '''
+    command, source, output, relative = job
+    n, e, d = _key
+    src = os.path.join(source, relative)
+    dst = os.path.join(output, target_path(command, relative))
+    try:
+        size = os.path.getsize(src)
+        if command in ("decrypt", "sign") and d is None:
+            raise ValueError("{} needs a private key".format(command))
+        if command == "sign":
+            _write_atomic(dst, [rsa_sign(_file_digest(src), n, d)])
+        elif command == "verify":
+            with open(dst, "rb") as f:
+                signature = f.read()
+            valid = rsa_verify(_file_digest(src), n, e, signature)
+            return relative, size, valid, None if valid else "invalid signature"
+        else:
+            with open(src, "rb") as f:
+                if command == "encrypt":
+                    _write_atomic(dst, rsa_encrypt_stream(read_chunks(f), n, e))
+                else:
+                    _write_atomic(dst, rsa_decrypt_stream(read_chunks(f), n, d))
+    except (OSError, ValueError, OverflowError) as error:
+        # OverflowError: a block that decrypts to more than a block, the
+        # file was not encrypted with this key
+        return relative, 0, False, str(error)
+    return relative, size, True, None
+
+
+class Manifest:
+    '''
+    Append-only record of the files finished by a run, one JSON line each,
+    after a header line with the command and the fingerprint of the key.
+
+    Failed files are not recorded, so a resumed run retries them. verify
+    records every checked file with its result.
+    '''
+
+    def __init__(self, path: str, command: str, key_fp: str):
+        self.path = path
+        self.done = {}
+        header = {"command": command, "key": key_fp}
+        if os.path.exists(path):
+            with open(path) as f:
+                lines = [line for line in f if line.strip()]
+            # A run killed mid write may leave a partial last line
+            records = []
+            for line in lines:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    pass
+            if records and records[0] != header:
+                raise ValueError("Manifest {} belongs to another run: {}".format(path, records[0]))
+            self.done = {record["path"]: record for record in records[1:]}
+            self._file = open(path, "a")
+            if not records:
+                self._write(header)
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._file = open(path, "w")
+            self._write(header)
+
+    def _write(self, record: dict):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def record(self, relative: str, size: int, ok: bool):
+        self.done[relative] = {"path": relative, "bytes": size, "ok": ok}
+        self._write(self.done[relative])
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Progress:
+    '''
+    Throughput of a run in MB/s and files/s, reported at most once per
+    interval on a single line
+    '''
+
+    def __init__(self, total: int, stream=sys.stderr, interval: float = 1.0):
+        self.total = total
+        self.stream = stream
+        self.interval = interval
+        self.files = 0
+        self.bytes = 0
+        self.failed = 0
+        self.start = time.perf_counter()
+        self._last = self.start
+
+    def update(self, size: int, ok: bool):
+        self.files += 1
+        self.bytes += size
+        self.failed += not ok
+        now = time.perf_counter()
+        if now - self._last >= self.interval:
+            self._last = now
+            self.stream.write("\r" + self.line())
+            self.stream.flush()
+
+    def line(self) -> str:
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        return "{}/{} files, {:.1f} MB, {:.2f} MB/s, {:.1f} files/s, {} failed".format(
+            self.files, self.total, self.bytes / 1e6, self.bytes / 1e6 / elapsed,
+            self.files / elapsed, self.failed)
+
+    def finish(self):
+        self.stream.write("\r" + self.line() + " in {:.2f} s\n".format(
+            time.perf_counter() - self.start))
+
+
+def run_batch(command: str, source: str, output: str, key_path: str,
+              fp: str = None, manifest_path: str = None, workers: int = None,
+              stream=sys.stderr) -> dict:
+    '''
+    Run a command over every file of a tree across a pool of processes
+
+    Parameters
+    ----------
+    command : str
+        One of COMMANDS
+    source : str
+        Input tree
+    output : str
+        Output tree. For verify, tree holding the signatures
+    key_path : str
+        Key file or keyring, see load_key
+    fp : str, optional
+        Fingerprint of the key in the keyring
+    manifest_path : str, optional
+        Manifest to resume from and append to. The default is None,
+        <output>/.manifest.<command>.jsonl
+    workers : int, optional
+        Number of processes. The default is None, one per core
+    stream : file, optional
+        Where progress is reported. The default is stderr
+
+    Returns
+    -------
+    dict
+        Files and bytes processed, skipped, failures and throughput
+    '''
+    n, e, _ = load_key(key_path, fp)
+    if manifest_path is None:
+        manifest_path = os.path.join(output, MANIFEST_PREFIX + command + ".jsonl")
+    # Files written into the input tree, finished or partial, are not
+    # processed themselves
+    skip = None
+    if os.path.realpath(output) == os.path.realpath(source):
+        skip = (SUFFIXES.get(command, PARTIAL_SUFFIX), PARTIAL_SUFFIX)
+    files = walk(source, skip)
+    workers = workers or os.cpu_count()
+
+    failures = {}
+    with Manifest(manifest_path, command, fingerprint(n, e).hex()) as manifest:
+        pending = [relative for relative in files if relative not in manifest.done]
+        jobs = iter((command, source, output, relative) for relative in pending)
+        progress = Progress(len(pending), stream)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(key_path, fp)) as executor:
+            # A bounded window of jobs in flight instead of 100k futures
+            running = set()
+            while True:
+                for job in jobs:
+                    running.add(executor.submit(process_file, job))
+                    if len(running) >= 4 * workers:
+                        break
+                if not running:
+                    break
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    relative, size, ok, error = future.result()
+                    if ok or command == "verify" and error == "invalid signature":
+                        manifest.record(relative, size, ok)
+                    if not ok:
+                        failures[relative] = error
+                    progress.update(size, ok)
+        progress.finish()
+        invalid = sorted(path for path, record in manifest.done.items() if not record["ok"])
+
+    elapsed = time.perf_counter() - progress.start
+    return {
+        "command": command,
+        "files": progress.files,
+        "bytes": progress.bytes,
+        "skipped": len(files) - len(pending),
+        "seconds": elapsed,
+        "mb_per_second": progress.bytes / 1e6 / elapsed if elapsed else 0.0,
+        "files_per_second": progress.files / elapsed if elapsed else 0.0,
+        "failures": failures,
+        "invalid": invalid,
+    }
+
+
+def _init_keygen(stop):
+    global _stop
+    _stop = stop
+
+
+def _keygen(job: tuple[int, int, float | None]) -> dict:
+    nlen, nprimes, timeout = job
+    (n, e), d = rsa_keygen(nlen, nprimes=nprimes, crt=True,
+                           deadline=CancelToken(timeout, _stop))
+    return key_params(n, e, d)
+
+
+def keygen(output: str, count: int = 1, nlen: int = 2048, nprimes: int = 2,
+           workers: int = None, deadline: float | CancelToken = None) -> list[str]:
+    '''
+    Generate count RSA keys in parallel, each written as key<i>.json
+    (private) and key<i>.pub.json (public) in output, or key.json and
+    key.pub.json for a single key
+
+    If the deadline passes, the token is cancelled or a generation fails,
+    every worker is told to stop at its next candidate, so the pool shuts
+    down promptly instead of finishing the remaining keys. Keys already
+    written are kept. Private key files are only readable by their owner
+
+    Parameters
+    ----------
+    count : int, optional
+        Number of keys, at least 1. The default is 1
+    deadline : float | CancelToken, optional
+        Seconds of budget for the whole run, or a token. The default is None
+
+    Returns
+    -------
+    list[str]
+        Paths of the private key files
+    '''
+    if count < 1:
+        raise ValueError("count must be at least 1, got {}".format(count))
+    os.makedirs(output, exist_ok=True)
+    workers = min(workers or os.cpu_count(), count)
+    token = deadline if isinstance(deadline, CancelToken) else CancelToken(deadline)
+    context = multiprocessing.get_context()
+    stop = context.Event()
+    paths = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_keygen, initargs=(stop,)) as executor:
+        futures = [executor.submit(_keygen, (nlen, nprimes, token.remaining()))
+                   for _ in range(count)]
+        try:
+            for i, future in enumerate(futures):
+                # Polled, so a token cancelled by another thread is noticed
+                while not wait([future], timeout=0.1).done:
+                    token.check()
+                params = future.result()
+                name = os.path.join(output, "key{}".format(i if count > 1 else ""))
+                public = {"n": params["n"], "e": params["e"]}
+                _write_atomic(name + ".json", [json.dumps(params, indent=1).encode()], 0o600)
+                _write_atomic(name + ".pub.json", [json.dumps(public, indent=1).encode()])
+                paths.append(name + ".json")
+        except BaseException:
+            stop.set()
+            for future in futures:
+                future.cancel()
+            raise
+    return paths
+
+
+def _positive(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError("must be at least 1, got {}".format(number))
+    return number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("keygen", help="Generate RSA key files")
+    command.add_argument("output")
+    command.add_argument("--count", type=_positive, default=1)
+    command.add_argument("--nlen", type=int, default=2048)
+    command.add_argument("--nprimes", type=int, default=2)
+    command.add_argument("--workers", type=int, default=None)
+    command.add_argument("--timeout", type=float, default=None,
+                         help="Give up after this many seconds")
+    for name in COMMANDS:
+        command = commands.add_parser(name, help="{} every file of a tree".format(name.capitalize()))
+        command.add_argument("source")
+        command.add_argument("output", nargs="?" if name in ("sign", "verify") else None,
+                             help="Output tree" + (", the source tree by default"
+                                                   if name in ("sign", "verify") else ""))
+        command.add_argument("--key", required=True, help="Key file, or keyring with --fingerprint")
+        command.add_argument("--fingerprint", default=None)
+        command.add_argument("--manifest", default=None,
+                             help="Resume from and record into this manifest")
+        command.add_argument("--workers", type=int, default=None)
+        command.add_argument("--report", default=None, help="Write the summary as JSON")
+    args = parser.parse_args()
+
+    if args.command == "keygen":
+        try:
+            for path in keygen(args.output, args.count, args.nlen, args.nprimes,
+                               args.workers, args.timeout):
+                print(path)
+        except GenerationCancelled as error:
+            sys.exit(str(error))
+        return
+
+    try:
+        report = run_batch(args.command, args.source, args.output or args.source, args.key,
+                           args.fingerprint, args.manifest, args.workers)
+    except ValueError as error:
+        parser.error(str(error))
+    except KeyboardInterrupt:
+        sys.exit("\nInterrupted, run the same command again to resume")
+    print("{} files, {} skipped, {:.1f} MB in {:.2f} s: {:.2f} MB/s, {:.1f} files/s".format(
+        report["files"], report["skipped"], report["bytes"] / 1e6, report["seconds"],
+        report["mb_per_second"], report["files_per_second"]))
+    for path, error in sorted(report["failures"].items()):
+        print("FAILED {}: {}".format(path, error))
+    if args.report is not None:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    if report["failures"] or report["invalid"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
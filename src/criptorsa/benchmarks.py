@@ -0,0 +1,571 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for the performance sensitive paths of the portfolio.
+
+Run one with:
+    python -m criptorsa.benchmarks <name> [--options]
+"""
+import argparse
+import secrets
+import time
+import warnings
+
+from . import funcs
+
+from .rsa import rsa_keygen, rsa_encrypt, rsa_decrypt, max_primes
+
+
+def timed(func, *args, rounds: int = 1) -> float:
+    '''
+    Average wall time of func(*args) over rounds executions
+
+    Parameters
+    ----------
+    func : Callable
+        Function to time
+    rounds : int, optional
+        Number of executions. The default is 1
+
+    Returns
+    -------
+    float
+        Seconds per execution
+    '''
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(*args)
+    return (time.perf_counter() - start) / rounds
+
+
+# Maximum import time in milliseconds, over a bare interpreter start, of
+# the modules command line tools start with
+IMPORT_BUDGETS_MS = {
+    "criptorsa": 5,
+    "criptorsa.rsa": 40,
+    "criptorsa.rsa_signature": 40,
+    "criptorsa.elgamal": 60,
+}
+
+
+def benchmark_import(rounds: int = 10):
+    '''
+    Startup cost of importing the package and its entry modules, measured
+    in fresh interpreters against a bare "python -c pass". Exits with
+    status 1 if a module goes over its budget in IMPORT_BUDGETS_MS
+
+    Parameters
+    ----------
+    rounds : int, optional
+        Interpreter starts per module, the median is kept. The default is 10
+    '''
+    import os
+    import statistics
+    import subprocess
+    import sys
+
+    # Import the package from this tree even if it is not installed, and
+    # with bytecode caches like an installed package
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        filter(None, [os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      os.environ.get("PYTHONPATH")])))
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+
+    def run(code):
+        times = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", code], env=env, check=True)
+            times.append((time.perf_counter() - start) * 1000)
+        return statistics.median(times)
+
+    # Warm up: writes the bytecode caches
+    subprocess.run([sys.executable, "-c", "import " + ", ".join(IMPORT_BUDGETS_MS)],
+                   env=env, check=True)
+    baseline = run("pass")
+    over = []
+    print("interpreter start: {:.1f} ms".format(baseline))
+    print("{:>26} {:>10} {:>10}".format("module", "ms", "budget"))
+    for module, budget in IMPORT_BUDGETS_MS.items():
+        elapsed = run("import " + module) - baseline
+        print("{:>26} {:>10.1f} {:>10}".format(module, elapsed, budget))
+        if elapsed > budget:
+            over.append(module)
+    if over:
+        print("Over the import budget: {}".format(", ".join(over)))
+        sys.exit(1)
+
+
+def benchmark_multiprime(nlen: int = 4096, rounds: int = 20, keys: int = 1):
+    '''
+    Compare key generation time and private operation throughput of RSA keys
+    with 2, 3 and 4 primes (only the counts allowed for nlen are measured,
+    see rsa.max_primes: 4 primes need nlen of at least 4096)
+
+    Parameters
+    ----------
+    nlen : int, optional
+        Number of bits of n. The default is 4096
+    rounds : int, optional
+        Number of decryptions timed per key. The default is 20
+    keys : int, optional
+        Number of keys generated per prime count. The default is 1
+    '''
+    message = bytes(range(256))
+    print("nlen = {}".format(nlen))
+    print("{:>7} {:>12} {:>14}".format("primes", "keygen (s)", "decrypt/s"))
+    for nprimes in range(2, max_primes(nlen) + 1):
+        start = time.perf_counter()
+        for _ in range(keys):
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                (n, e), d = rsa_keygen(nlen, nprimes=nprimes, crt=True)
+        keygen = (time.perf_counter() - start) / keys
+        encrypted = rsa_encrypt(message, n, e)
+        decrypt = timed(rsa_decrypt, encrypted, n, d, rounds=rounds)
+        print("{:>7} {:>12.3f} {:>14.1f}".format(nprimes, keygen, 1 / decrypt))
+
+
+def benchmark_backends(nlen: int = 2048, rounds: int = 200):
+    '''
+    Compare the arithmetic backends available in funcs. Every backend must
+    give the same results as the builtin one, the speedup is relative to it
+
+    Parameters
+    ----------
+    nlen : int, optional
+        Number of bits of the operands. The default is 2048
+    rounds : int, optional
+        Number of operations timed. The default is 200
+    '''
+    m = secrets.randbits(nlen) | 1 | (1 << (nlen - 1))
+    operands = [(secrets.randbelow(m), secrets.randbelow(m)) for _ in range(rounds)]
+    previous = funcs.get_backend().name
+    reference = None
+    baseline = None
+    print("{:>10} {:>14} {:>14} {:>9}".format("backend", "power_mod/s", "inverse/s", "speedup"))
+    try:
+        for name in reversed(funcs.available_backends()):
+            funcs.set_backend(name)
+            results = [funcs.power_mod(a, b, m) for a, b in operands]
+            if reference is None:
+                reference = results
+            elif results != reference:
+                raise AssertionError("Backend {} gives different results".format(name))
+            start = time.perf_counter()
+            for a, b in operands:
+                funcs.power_mod(a, b, m)
+            power = (time.perf_counter() - start) / rounds
+            start = time.perf_counter()
+            for a, _ in operands:
+                try:
+                    funcs.multiplicative_inverse(a, m)
+                except ValueError:
+                    pass
+            inverse = (time.perf_counter() - start) / rounds
+            baseline = baseline or power
+            print("{:>10} {:>14.1f} {:>14.1f} {:>8.2f}x".format(
+                name, 1 / power, 1 / inverse, baseline / power))
+    finally:
+        funcs.set_backend(previous)
+
+
+def benchmark_primality(nlen: int = 1024, rounds: int = 20):
+    '''
+    Time spent by each primality engine on the final accept path (testing a
+    number that is prime) and generating a whole random prime
+
+    Parameters
+    ----------
+    nlen : int, optional
+        Number of bits of the primes. The default is 1024
+    rounds : int, optional
+        Number of primes generated per engine. The default is 20
+    '''
+    k = funcs.estimate_k(nlen)
+    generator = funcs.random_odd_number_nbits(nlen)
+    primes = [funcs.random_probable_prime(generator, k=k) for _ in range(rounds)]
+    print("nlen = {}, k = {}".format(nlen, k))
+    print("{:>14} {:>16} {:>16}".format("engine", "accept (ms)", "generate (ms)"))
+    for engine in funcs.PRIMALITY_ENGINES:
+        start = time.perf_counter()
+        for prime in primes:
+            funcs.is_probable_prime(prime, k=k, engine=engine)
+        accept = (time.perf_counter() - start) / rounds
+        generate = timed(funcs.random_probable_prime, generator, k, None, None,
+                         engine, rounds=rounds)
+        print("{:>14} {:>16.2f} {:>16.2f}".format(engine, accept * 1000, generate * 1000))
+
+
+def benchmark_candidates(nlen: int = 1024, rounds: int = 20, e: int = 2 ** 16 + 1):
+    '''
+    Generation of RSA primes from fresh random odd numbers filtered one by
+    one, against funcs.CandidateSampler, with the number of candidates that
+    reach the primality test
+
+    Parameters
+    ----------
+    nlen : int, optional
+        Number of bits of the primes. The default is 1024
+    rounds : int, optional
+        Number of primes generated per sampler. The default is 20
+    e : int, optional
+        Public exponent. The default is 2 ** 16 + 1
+    '''
+    k = funcs.estimate_k(nlen)
+    min_prime = funcs.prime_lower_bound(nlen)
+    tested = 0
+    is_probable_prime = funcs.is_probable_prime
+
+    def counted(*args, **kwargs):
+        nonlocal tested
+        tested += 1
+        return is_probable_prime(*args, **kwargs)
+
+    print("{:>10} {:>14} {:>14}".format("sampler", "ms / prime", "tests / prime"))
+    funcs.is_probable_prime = counted
+    try:
+        for name, new_generator, test_func in [
+                ("random", lambda: funcs.random_odd_number_nbits(nlen),
+                 lambda c: c >= min_prime and funcs.coprimes(c - 1, e)),
+                ("sieve", lambda: funcs.CandidateSampler(nlen, min_prime, e), None)]:
+            tested = 0
+            start = time.perf_counter()
+            for _ in range(rounds):
+                funcs.random_probable_prime(new_generator(), k, test_func)
+            elapsed = (time.perf_counter() - start) / rounds
+            print("{:>10} {:>14.2f} {:>14.1f}".format(name, elapsed * 1000, tested / rounds))
+    finally:
+        funcs.is_probable_prime = is_probable_prime
+
+
+def benchmark_random(rounds: int = 20000):
+    '''
+    Cost of one uniform draw below 2 ** bits with secrets (one os.urandom
+    call each) and with the buffered source of funcs, one by one and in a
+    single batch
+
+    Parameters
+    ----------
+    rounds : int, optional
+        Number of draws timed. The default is 20000
+    '''
+    print("{:>6} {:>14} {:>14} {:>14}".format("bits", "secrets (ns)", "funcs (ns)", "batch (ns)"))
+    for bits in (16, 64, 256, 1024, 2048):
+        n = 2 ** bits - 1
+        print("{:>6} {:>14.0f} {:>14.0f} {:>14.0f}".format(
+            bits, timed(lambda: [secrets.randbelow(n) for _ in range(rounds)]) / rounds * 1e9,
+            timed(lambda: [funcs.random_below(n) for _ in range(rounds)]) / rounds * 1e9,
+            timed(funcs.random_many, 0, n, rounds) / rounds * 1e9))
+
+
+def benchmark_short_exponent(rounds: int = 50):
+    '''
+    Compare full size and short exponents on the RFC 3526 1536 bits group:
+    key pair generation, common_key and ElGamal encryption of one block
+
+    Parameters
+    ----------
+    rounds : int, optional
+        Number of operations timed. The default is 50
+    '''
+    from .diffie_hellman import rfc_group, generate_keypair, common_key
+    from .elgamal import elgamal_encrypt
+
+    group = rfc_group(1536)
+    p, g, q, bits = group
+    _, peer = generate_keypair(p, g)
+    message = bytes(range(100))
+    print("p = {} bits, short exponents = {} bits".format(p.bit_length(), bits))
+    print("{:>12} {:>12} {:>12} {:>12}".format("mode", "keypair/s", "common/s", "elgamal/s"))
+    results = []
+    for mode, exponent_bits in [("full", None), ("short", bits)]:
+        rates = [1 / timed(generate_keypair, p, g, q, exponent_bits, rounds=rounds),
+                 1 / timed(common_key, p, peer, q, exponent_bits, rounds=rounds),
+                 1 / timed(elgamal_encrypt, message, g, peer, p, q, exponent_bits,
+                           rounds=rounds)]
+        results.append(rates)
+        print("{:>12} {:>12.1f} {:>12.1f} {:>12.1f}".format(mode, *rates))
+    print("{:>12} {:>11.1f}x {:>11.1f}x {:>11.1f}x".format(
+        "speedup", *(short / full for full, short in zip(*results))))
+
+
+def benchmark_domain_params(nlen: int = 256, rounds: int = 20):
+    '''
+    Startup cost of ElGamal domain parameters: generating them, as every
+    node used to do, against loading them from a DomainParameterStore
+
+    Parameters
+    ----------
+    nlen : int, optional
+        Bit size of p. The default is 256, larger sizes take minutes
+    rounds : int, optional
+        Number of store loads timed. The default is 20
+    '''
+    import os
+    import tempfile
+    from .domain_params import DomainParameterStore
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "domain_params.json")
+        generate = timed(DomainParameterStore(path).get, nlen, "elgamal")
+        load = timed(lambda: DomainParameterStore(path).get(nlen, "elgamal"), rounds=rounds)
+    print("{} bits: generate {:.2f} s, load from the store {:.3f} ms ({:.0f}x)".format(
+        nlen, generate, load * 1e3, generate / load))
+
+
+def benchmark_peer_validation(rounds: int = 50):
+    '''
+    Cost of validating the peer public value in common_key on the RFC 3526
+    1536 bits group: without validation, validating every time (cold
+    cache) and with the value already in the PeerKeyCache
+
+    Parameters
+    ----------
+    rounds : int, optional
+        Number of operations timed. The default is 50
+    '''
+    from .diffie_hellman import rfc_group, generate_keypair, common_key, PeerKeyCache
+    from . import diffie_hellman
+
+    p, g, q, bits = rfc_group(1536)
+    _, peer = generate_keypair(p, g, q, bits)
+    cold = PeerKeyCache(maxsize=0)
+
+    def validate_cold():
+        cold.validate(peer, p, q)
+        return common_key(p, peer, q, bits, validate=False)
+
+    print("{:>12} {:>12}".format("mode", "common/s"))
+    rates = {"none": 1 / timed(common_key, p, peer, q, bits, False, rounds=rounds),
+             "cold": 1 / timed(validate_cold, rounds=rounds)}
+    common_key(p, peer, q, bits)
+    rates["cached"] = 1 / timed(common_key, p, peer, q, bits, rounds=rounds)
+    for mode, rate in rates.items():
+        print("{:>12} {:>12.1f}".format(mode, rate))
+    print(diffie_hellman.peer_key_metrics())
+
+
+def benchmark_pi(sizes: tuple[int, ...] = (400, 1000, 5000, 10000, 50000, 100000)):
+    '''
+    Time pi.approximate_pi from 400 to 100k digits: cold (empty cache),
+    extending the value cached for the previous size, and cached
+
+    Parameters
+    ----------
+    sizes : tuple[int, ...], optional
+        Numbers of digits
+    '''
+    from . import pi
+
+    print("{:>8} {:>12} {:>12} {:>12}".format("digits", "cold (ms)", "extend (ms)", "cached (ms)"))
+    previous = None
+    for digits in sizes:
+        pi.clear_cache()
+        cold = timed(pi.approximate_pi, digits)
+        extend = float("nan")
+        if previous is not None:
+            pi.clear_cache()
+            pi.approximate_pi(previous)
+            extend = timed(pi.approximate_pi, digits)
+        cached = timed(pi.approximate_pi, digits, rounds=10)
+        print("{:>8} {:>12.2f} {:>12.2f} {:>12.3f}".format(
+            digits, cold * 1000, extend * 1000, cached * 1000))
+        previous = digits
+
+
+def benchmark_small_group(size: int = 100000, rounds: int = 3):
+    '''
+    ElGamal encryption/decryption throughput on the p = 68507 demo group,
+    with and without the vectorized engine of small_group
+
+    Parameters
+    ----------
+    size : int, optional
+        Bytes of the message. The default is 100000
+    rounds : int, optional
+        Number of operations timed. The default is 3
+    '''
+    import contextlib
+    import io
+    from . import small_group
+    from .elgamal import elgamal_encryption, elgamal_decryption, elgamal_keygen
+
+    p, g = 68507, 64136
+    pk, ai = elgamal_keygen(p, g)
+    message = secrets.token_bytes(size)
+    block_size = funcs.compute_block_size(p)
+    numpy = small_group._load_numpy()
+    if numpy is None:
+        print("NumPy is not installed")
+        return
+    print("{:>10} {:>14} {:>14}".format("engine", "encrypt MB/s", "decrypt MB/s"))
+    results = []
+    try:
+        for name, module in [("python", None), ("numpy", numpy)]:
+            small_group.np = module
+            encrypted = elgamal_encryption(message, g, pk, p, block_size)
+            listC1 = [c1 for c1, _ in encrypted]
+            listC2 = [c2.to_bytes(block_size + 1, "big") for _, c2 in encrypted]
+            with contextlib.redirect_stdout(io.StringIO()):
+                encrypt = timed(elgamal_encryption, message, g, pk, p, block_size,
+                                rounds=rounds)
+                decrypt = timed(elgamal_decryption, listC1, listC2, ai, p, rounds=rounds)
+            results.append((encrypt, decrypt))
+            print("{:>10} {:>14.3f} {:>14.3f}".format(
+                name, size / encrypt / 1e6, size / decrypt / 1e6))
+    finally:
+        small_group.np = numpy
+    (python_enc, python_dec), (numpy_enc, numpy_dec) = results
+    print("{:>10} {:>13.1f}x {:>13.1f}x".format(
+        "speedup", python_enc / numpy_enc, python_dec / numpy_dec))
+
+
+def benchmark_compression(nlen: int = 2048, rounds: int = 3):
+    '''
+    RSA encryption time with and without the compression stage, on a
+    redundant payload (JSON logs) and on an incompressible one (random
+    bytes, where the stage must skip compression)
+
+    Parameters
+    ----------
+    nlen : int, optional
+        Bit size of the modulus. The default is 2048
+    rounds : int, optional
+        Number of operations timed. The default is 3
+    '''
+    import json
+    from .compression import rsa_encrypt_compressed, METHODS
+
+    (n, e), _ = rsa_keygen(nlen, engine="bpsw")
+    logs = json.dumps([{"id": i, "level": "INFO", "path": "/api/items/%d" % (i % 100)}
+                       for i in range(5000)]).encode()
+    payloads = [("json", logs), ("random", secrets.token_bytes(len(logs)))]
+    print("{:>8} {:>8} {:>10}".format("payload", "method", "ms"))
+    for label, payload in payloads:
+        print("{:>8} {:>8} {:>10.1f}".format(
+            label, "-", timed(rsa_encrypt, payload, n, e, rounds=rounds) * 1000))
+        for method in sorted(METHODS):
+            print("{:>8} {:>8} {:>10.1f}".format(label, method, timed(
+                rsa_encrypt_compressed, payload, n, e, method, rounds=rounds) * 1000))
+
+
+def benchmark_bulk(nlen: int = 2048, rounds: int = 1, count: int = 2000):
+    '''
+    Encryption of many small messages for one key and of one message for
+    many keys: loop over rsa_encrypt against the bulk APIs, in the calling
+    process and on a process pool
+
+    Parameters
+    ----------
+    nlen : int, optional
+        Bit size of the moduli. The default is 2048
+    rounds : int, optional
+        Number of operations timed. The default is 1
+    count : int, optional
+        Number of messages, and of keys. The default is 2000
+    '''
+    import os
+    from .rsa import rsa_encrypt_many, rsa_encrypt_for_recipients
+
+    key, _ = rsa_keygen(nlen, engine="bpsw")
+    # Recipients only differ in the exponent, generating thousands of
+    # moduli would dominate the benchmark
+    keys = [(key[0], e) for e in range(3, 2 * count + 3, 2)]
+    messages = [secrets.token_bytes(64 + i % 200) for i in range(count)]
+    message = secrets.token_bytes(1024)
+    workers = os.cpu_count()
+    print("{:>12} {:>10} {:>10} {:>10}".format("case", "loop s", "bulk s", "pool s"))
+    for case, loop, bulk in [
+            ("many", lambda: [rsa_encrypt(m, *key) for m in messages],
+             lambda w: rsa_encrypt_many(messages, key, workers=w)),
+            ("recipients", lambda: [rsa_encrypt(message, *k) for k in keys],
+             lambda w: rsa_encrypt_for_recipients(message, keys, workers=w))]:
+        print("{:>12} {:>10.3f} {:>10.3f} {:>10.3f}".format(
+            case, timed(loop, rounds=rounds), timed(bulk, None, rounds=rounds),
+            timed(bulk, workers, rounds=rounds)))
+
+
+def benchmark_execution(nlen: int = 2048, rounds: int = 3):
+    '''
+    Compare thread and process pools (see funcs.execution_mode) against the
+    calling thread alone: RSA exponentiation of the blocks of a message,
+    ElGamal encryption and decryption, and prime generation. Threads only
+    run in parallel on a free-threaded interpreter
+
+    Parameters
+    ----------
+    nlen : int, optional
+        Bit size of the RSA modulus and of the primes generated. The
+        default is 2048. ElGamal uses the RFC 3526 1536 bits group
+    rounds : int, optional
+        Number of operations timed. The default is 3
+    '''
+    import os
+    from .rsa import rsa_conversion
+    from .elgamal import elgamal_encryption, elgamal_decryption
+    from .diffie_hellman import rfc_group, generate_keypair
+
+    # At least two, a single worker would run in the calling thread
+    workers = max(os.cpu_count() or 1, 2)
+    (n, e), d = rsa_keygen(nlen, engine="bpsw")
+    p, g, q, _ = rfc_group(1536)
+    private, public = generate_keypair(p, g, q)
+    message = secrets.token_bytes(16 * 1024)
+    block_size = funcs.compute_block_size(p)
+    encrypted = elgamal_encryption(message, g, public, p, block_size, q)
+    listC1 = [C1 for C1, _ in encrypted]
+    listC2 = [C2.to_bytes(block_size + 1, "big") for _, C2 in encrypted]
+    candidates = funcs.random_odd_number_nbits(nlen // 2)
+    cases = [
+        ("rsa", lambda **pool: rsa_conversion(message, n, d, funcs.compute_block_size(n),
+                                              **pool)),
+        ("elgamal enc", lambda **pool: elgamal_encryption(message, g, public, p, block_size,
+                                                          q, **pool)),
+        ("elgamal dec", lambda **pool: elgamal_decryption(listC1, listC2, private, p,
+                                                          **pool)),
+        ("prime", lambda **pool: funcs.random_probable_prime(candidates, engine="bpsw",
+                                                             **pool)),
+    ]
+    print("free-threaded = {}, default mode = {}, workers = {}".format(
+        funcs.free_threaded(), funcs.execution_mode(), workers))
+    print("{:>12} {:>10} {:>10} {:>10}".format("case", "serial s", "threads s",
+                                               "processes s"))
+    for case, run in cases:
+        print("{:>12} {:>10.3f} {:>10.3f} {:>10.3f}".format(
+            case, timed(run, rounds=rounds),
+            *(timed(lambda: run(workers=workers, mode=mode), rounds=rounds)
+              for mode in funcs.EXECUTION_MODES)))
+
+
+BENCHMARKS = {
+    "backends": benchmark_backends,
+    "bulk": benchmark_bulk,
+    "candidates": benchmark_candidates,
+    "compression": benchmark_compression,
+    "domain_params": benchmark_domain_params,
+    "execution": benchmark_execution,
+    "import": benchmark_import,
+    "multiprime": benchmark_multiprime,
+    "peer_validation": benchmark_peer_validation,
+    "pi": benchmark_pi,
+    "primality": benchmark_primality,
+    "random": benchmark_random,
+    "short_exponent": benchmark_short_exponent,
+    "small_group": benchmark_small_group,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("name", choices=sorted(BENCHMARKS))
+    parser.add_argument("--nlen", type=int, default=None)
+    parser.add_argument("--rounds", type=int, default=None)
+    args = parser.parse_args()
+    kwargs = {key: value for key, value in vars(args).items()
+              if key != "name" and value is not None}
+    BENCHMARKS[args.name](**kwargs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Optional compression stage ahead of block encryption.
+
+Every plaintext byte costs its share of a modular exponentiation, so
+compressing redundant payloads first saves exponentiations in the same
+proportion. The compressed payload starts with a one byte flag naming the
+algorithm, and it is encrypted along with the data, so decryption knows
+how to undo it. Payloads that do not compress well are stored as they are
+(flag NONE) to avoid wasting time on them.
+"""
+import bz2
+import lzma
+import zlib
+from typing import Iterable, Iterator
+
+from .rsa import rsa_encrypt, rsa_decrypt
+from .elgamal import elgamal_encrypt, elgamal_decrypt
+
+NONE = 0
+ZLIB = 1
+LZMA = 2
+BZ2 = 3
+
+METHODS = {"none": NONE, "zlib": ZLIB, "lzma": LZMA, "bz2": BZ2}
+
+# Bytes of the payload compressed to decide whether compression pays off,
+# and minimum saving required on them
+SAMPLE_SIZE = 64 * 1024
+MIN_RATIO = 0.9
+CHUNK_SIZE = 64 * 1024
+
+
+def _compressor(flag: int):
+    if flag == ZLIB:
+        return zlib.compressobj(6)
+    if flag == LZMA:
+        return lzma.LZMACompressor()
+    if flag == BZ2:
+        return bz2.BZ2Compressor()
+    raise ValueError("Unknown compression flag {}".format(flag))
+
+
+def _decompressor(flag: int):
+    if flag == ZLIB:
+        return zlib.decompressobj()
+    if flag == LZMA:
+        return lzma.LZMADecompressor()
+    if flag == BZ2:
+        return bz2.BZ2Decompressor()
+    raise ValueError("Unknown compression flag {}".format(flag))
+
+
+def compressible(sample: bytes) -> bool:
+    '''
+    Whether a sample of the payload compresses enough to be worth it. The
+    check uses fast zlib compression whatever the final algorithm
+
+    Parameters
+    ----------
+    sample : bytes
+        First bytes of the payload
+
+    Returns
+    -------
+    bool
+        True if the sample shrinks below MIN_RATIO of its size
+    '''
+    if not sample:
+        return False
+    return len(zlib.compress(sample, 1)) < MIN_RATIO * len(sample)
+
+
+def compress_stream(chunks: Iterable[bytes], method: str = "zlib") -> Iterator[bytes]:
+    '''
+    Compress a stream of chunks, prefixed with the flag byte.
+
+    The first SAMPLE_SIZE bytes are buffered to decide whether the stream
+    is compressible; after that chunks are compressed as they arrive
+
+    Parameters
+    ----------
+    chunks : Iterable[bytes]
+        The payload
+    method : str, optional
+        "zlib", "lzma", "bz2" or "none". The default is "zlib"
+
+    Returns
+    -------
+    Iterator[bytes]
+        The flag byte followed by the (maybe) compressed payload
+    '''
+    flag = METHODS[method]
+    chunks = iter(chunks)
+    head = []
+    buffered = 0
+    for chunk in chunks:
+        head.append(chunk)
+        buffered += len(chunk)
+        if buffered >= SAMPLE_SIZE:
+            break
+    head = (b'').join(head)
+    if flag != NONE and not compressible(head[:SAMPLE_SIZE]):
+        flag = NONE
+    yield bytes([flag])
+    if flag == NONE:
+        yield head
+        yield from chunks
+        return
+    compressor = _compressor(flag)
+    yield compressor.compress(head)
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def decompress_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    '''
+    Undo compress_stream
+
+    Parameters
+    ----------
+    chunks : Iterable[bytes]
+        The flag byte followed by the payload
+
+    Returns
+    -------
+    Iterator[bytes]
+        The original payload
+
+    Raises
+    ------
+    ValueError
+        If the payload is empty, or ends before the compressed stream
+    '''
+    chunks = iter(chunks)
+    flag = None
+    decompressor = None
+    for chunk in chunks:
+        if flag is None:
+            if not chunk:
+                continue
+            flag, chunk = chunk[0], chunk[1:]
+            if flag != NONE:
+                decompressor = _decompressor(flag)
+        if decompressor is None:
+            if chunk:
+                yield chunk
+        else:
+            out = decompressor.decompress(chunk)
+            if out:
+                yield out
+    if flag is None:
+        raise ValueError("Empty payload, the compression flag is missing")
+    if flag == ZLIB:
+        yield decompressor.flush()
+    # A cut off payload would otherwise decompress to a shorter one
+    if decompressor is not None and not decompressor.eof:
+        raise ValueError("Truncated payload, the compressed stream is incomplete")
+
+
+def compress(by: bytes, method: str = "zlib") -> bytes:
+    '''
+    Compress a payload, see compress_stream
+    '''
+    view = memoryview(by)
+    chunks = (view[i:i + CHUNK_SIZE] for i in range(0, len(view), CHUNK_SIZE))
+    return (b'').join(compress_stream(chunks, method))
+
+
+def decompress(by: bytes) -> bytes:
+    '''
+    Undo compress
+    '''
+    return (b'').join(decompress_stream([by]))
+
+
+def rsa_encrypt_compressed(by: bytes, n: int, e: int, method: str = "zlib") -> bytes:
+    '''
+    rsa_encrypt after compressing the message, see compress
+    '''
+    return rsa_encrypt(compress(by, method), n, e)
+
+
+def rsa_decrypt_compressed(by: bytes, n: int, d) -> bytes:
+    '''
+    Undo rsa_encrypt_compressed
+    '''
+    return decompress(rsa_decrypt(by, n, d))
+
+
+def elgamal_encrypt_compressed(by: bytes, g: int, pk_bob: int, p: int,
+                               method: str = "zlib", **kwargs) -> list[tuple[int, bytes]]:
+    '''
+    elgamal_encrypt after compressing the message, see compress. kwargs are
+    passed to elgamal_encrypt
+    '''
+    return elgamal_encrypt(compress(by, method), g, pk_bob, p, **kwargs)
+
+
+def elgamal_decrypt_compressed(by: list, p: int, ai: int) -> bytes:
+    '''
+    Undo elgamal_encrypt_compressed
+    '''
+    return decompress(elgamal_decrypt(by, p, ai))
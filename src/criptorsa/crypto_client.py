@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Pooled client for the local crypto worker daemon (see crypto_daemon.py)
+"""
+import queue
+import socket
+from contextlib import contextmanager
+
+from .crypto_daemon import (
+    OP_ENCRYPT, OP_DECRYPT, OP_SIGN, OP_VERIFY, OP_COMMON_KEY, STATUS_OK,
+    RESPONSE_HEADER, LENGTH_PREFIX, pack_request, recv_exact, int_to_bytes,
+    int_from_bytes
+)
+
+
+class DaemonError(Exception):
+    '''
+    Raised when the daemon reports an error for a request
+    '''
+
+
+class CryptoClient:
+    '''
+    Client that keeps a pool of connections to the daemon so concurrent
+    callers do not pay for a new connection per request
+
+    Parameters
+    ----------
+    path : str
+        Path of the daemon's Unix socket
+    pool_size : int, optional
+        Maximum number of idle connections kept. The default is 4
+    timeout : float, optional
+        Socket timeout in seconds. The default is None (blocking)
+    '''
+
+    def __init__(self, path: str, pool_size: int = 4, timeout: float = None):
+        self.path = path
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=pool_size)
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.path)
+        return sock
+
+    @contextmanager
+    def connection(self):
+        '''
+        Borrow a connection from the pool. Connections that fail are
+        discarded instead of being returned to the pool
+        '''
+        try:
+            sock = self._idle.get_nowait()
+        except queue.Empty:
+            sock = self._connect()
+        try:
+            yield sock
+        except BaseException:
+            sock.close()
+            raise
+        try:
+            self._idle.put_nowait(sock)
+        except queue.Full:
+            sock.close()
+
+    def close(self):
+        '''
+        Close every idle connection
+        '''
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def request(self, op: int, key_id: str, payload: bytes) -> bytes:
+        '''
+        Send a request and wait for its response
+
+        Parameters
+        ----------
+        op : int
+            Operation code
+        key_id : str
+            Key identifier in the daemon
+        payload : bytes
+            Operation payload
+
+        Returns
+        -------
+        bytes
+            The response payload
+        '''
+        with self.connection() as sock:
+            sock.sendall(pack_request(op, key_id, payload))
+            header = recv_exact(sock, RESPONSE_HEADER.size)
+            if not header:
+                raise ConnectionError("Daemon closed the connection")
+            status, length = RESPONSE_HEADER.unpack(header)
+            body = recv_exact(sock, length)
+        if status != STATUS_OK:
+            raise DaemonError(body.decode("utf-8", "replace"))
+        return body
+
+    def encrypt(self, key_id: str, by: bytes) -> bytes:
+        return self.request(OP_ENCRYPT, key_id, by)
+
+    def decrypt(self, key_id: str, by: bytes) -> bytes:
+        return self.request(OP_DECRYPT, key_id, by)
+
+    def sign(self, key_id: str, by: bytes) -> bytes:
+        return self.request(OP_SIGN, key_id, by)
+
+    def verify(self, key_id: str, by: bytes, signature: bytes) -> bool:
+        payload = LENGTH_PREFIX.pack(len(by)) + by + signature
+        return self.request(OP_VERIFY, key_id, payload) == b'\x01'
+
+    def common_key(self, key_id: str, ga: int) -> int:
+        return int_from_bytes(
+            self.request(OP_COMMON_KEY, key_id, int_to_bytes(ga)))
@@ -0,0 +1,494 @@
+# -*- coding: utf-8 -*-
+"""
+Local crypto worker daemon.
+
+Holds the loaded keys and a pool of workers, and serves RSA encryption,
+decryption, signing, verification and Diffie-Hellman common keys over a
+Unix domain socket. Concurrent requests for the same key are grouped in
+batches, and each batch is split across the workers, so that a worker task
+processes several requests without serializing a busy key on one worker.
+
+Wire format (all integers big endian)
+-------------------------------------
+Request:  op (B) | flags (B) | key id length (H) | payload length (I)
+          | key id | payload
+Response: status (B) | payload length (I) | payload
+
+The VERIFY payload is: message length (I) | message | signature.
+The COMMON_KEY payload is the peer public value as a big endian integer,
+and so is its response.
+"""
+import argparse
+import errno
+import json
+import os
+import socket
+import socketserver
+import stat
+import struct
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from .rsa import rsa_encrypt, rsa_decrypt
+from .rsa_signature import rsa_sign, rsa_verify
+from .diffie_hellman import common_key
+from .rsa_keyring import Keyring, MAGIC as KEYRING_MAGIC
+
+OP_ENCRYPT = 1
+OP_DECRYPT = 2
+OP_SIGN = 3
+OP_VERIFY = 4
+OP_COMMON_KEY = 5
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+REQUEST_HEADER = struct.Struct("!BBHI")
+RESPONSE_HEADER = struct.Struct("!BI")
+LENGTH_PREFIX = struct.Struct("!I")
+
+# Keys held by the current worker process. Filled once per process by the
+# pool initializer so they are not sent along with every batch
+_worker_keys = {}
+
+
+def int_to_bytes(value: int) -> bytes:
+    '''
+    Encode a non negative integer as big endian bytes of minimal length
+
+    Parameters
+    ----------
+    value : int
+        The integer
+
+    Returns
+    -------
+    bytes
+        The encoded integer
+    '''
+    return value.to_bytes(max(1, (value.bit_length() + 7) // 8), "big")
+
+
+def int_from_bytes(by: bytes) -> int:
+    '''
+    Decode a big endian integer
+
+    Parameters
+    ----------
+    by : bytes
+        The encoded integer
+
+    Returns
+    -------
+    int
+        The integer
+    '''
+    return int.from_bytes(by, "big")
+
+
+def recv_exact(sock: socket.socket, size: int) -> bytes:
+    '''
+    Read exactly size bytes from sock
+
+    Parameters
+    ----------
+    sock : socket.socket
+        Connected socket
+    size : int
+        Number of bytes to read
+
+    Returns
+    -------
+    bytes
+        The bytes read. Empty if the peer closed the connection before
+        sending anything
+    '''
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = sock.recv(remaining)
+        if not chunk:
+            if remaining == size:
+                return b''
+            raise ConnectionError("Connection closed in the middle of a frame")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return (b'').join(chunks)
+
+
+def pack_request(op: int, key_id: str, payload: bytes) -> bytes:
+    '''
+    Build a request frame
+
+    Parameters
+    ----------
+    op : int
+        Operation code
+    key_id : str
+        Identifier of the key loaded in the daemon
+    payload : bytes
+        Operation payload
+
+    Returns
+    -------
+    bytes
+        The frame
+    '''
+    key = key_id.encode("utf-8")
+    return REQUEST_HEADER.pack(op, 0, len(key), len(payload)) + key + payload
+
+
+def pack_response(status: int, payload: bytes) -> bytes:
+    '''
+    Build a response frame
+
+    Parameters
+    ----------
+    status : int
+        STATUS_OK or STATUS_ERROR
+    payload : bytes
+        Result or utf-8 error message
+
+    Returns
+    -------
+    bytes
+        The frame
+    '''
+    return RESPONSE_HEADER.pack(status, len(payload)) + payload
+
+
+def _init_worker(keys: dict):
+    '''
+    Process pool initializer: store the keys in the worker process
+    '''
+    global _worker_keys
+    _worker_keys = keys
+
+
+def execute(key: dict, op: int, payload: bytes) -> bytes:
+    '''
+    Execute a single operation with a loaded key
+
+    Parameters
+    ----------
+    key : dict
+        Key parameters: n, e and d for RSA, p for Diffie-Hellman
+    op : int
+        Operation code
+    payload : bytes
+        Operation payload
+
+    Returns
+    -------
+    bytes
+        The result of the operation
+    '''
+    if op == OP_ENCRYPT:
+        return rsa_encrypt(payload, key["n"], key["e"])
+    if op == OP_DECRYPT:
+        return rsa_decrypt(payload, key["n"], key["d"])
+    if op == OP_SIGN:
+        return rsa_sign(payload, key["n"], key["d"])
+    if op == OP_VERIFY:
+        (length,) = LENGTH_PREFIX.unpack_from(payload)
+        message = payload[LENGTH_PREFIX.size:LENGTH_PREFIX.size + length]
+        signature = payload[LENGTH_PREFIX.size + length:]
+        return b'\x01' if rsa_verify(message, key["n"], key["e"], signature) else b'\x00'
+    if op == OP_COMMON_KEY:
+        return int_to_bytes(common_key(key["p"], int_from_bytes(payload), key.get("q")))
+    raise ValueError("Unknown operation {}".format(op))
+
+
+def run_batch(key_id: str, requests: list[tuple[int, bytes]], keys=None
+              ) -> list[tuple[int, bytes]]:
+    '''
+    Execute a batch of requests for the same key inside a worker
+
+    Parameters
+    ----------
+    key_id : str
+        Identifier of the key
+    requests : list[tuple[int, bytes]]
+        (op, payload) pairs
+    keys : dict | KeyringKeys, optional
+        Keys of the daemon. The default is None, the keys stored in the
+        worker process by the pool initializer
+
+    Returns
+    -------
+    list[tuple[int, bytes]]
+        (status, payload) pairs in the same order as requests. A failed
+        request gets STATUS_ERROR and does not affect the others
+    '''
+    key = (_worker_keys if keys is None else keys).get(key_id)
+    results = []
+    for op, payload in requests:
+        if key is None:
+            results.append((STATUS_ERROR, "Unknown key {}".format(key_id).encode()))
+            continue
+        try:
+            results.append((STATUS_OK, execute(key, op, payload)))
+        except Exception as err:  # bad payload, wrong key type...
+            results.append((STATUS_ERROR, "{}: {}".format(type(err).__name__, err).encode()))
+    return results
+
+
+class Batcher:
+    '''
+    Groups requests for the same key and hands them to the executor in
+    batches.
+
+    A batch is flushed when it reaches max_batch requests or when window
+    seconds have passed since its first request arrived. A flushed batch is
+    split into at most workers tasks of similar size, so a busy key keeps
+    every worker of the pool busy.
+
+    keys is passed along with every task, for a thread pool whose workers
+    share the daemon keys. Leave it None when the workers hold the keys
+    themselves (see _init_worker).
+    '''
+
+    def __init__(self, executor, max_batch: int = 32, window: float = 0.002,
+                 workers: int = None, keys=None):
+        self.executor = executor
+        self.max_batch = max_batch
+        self.window = window
+        self.workers = workers or os.cpu_count() or 1
+        self.keys = keys
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def submit(self, key_id: str, op: int, payload: bytes) -> Future:
+        '''
+        Queue a request and return a future with its (status, payload)
+        '''
+        future = Future()
+        with self._lock:
+            batch = self._pending.setdefault(key_id, [])
+            batch.append((op, payload, future))
+            if len(batch) >= self.max_batch:
+                batch = self._pending.pop(key_id)
+            elif len(batch) == 1:
+                timer = threading.Timer(self.window, self.flush, (key_id,))
+                timer.daemon = True
+                timer.start()
+                return future
+            else:
+                return future
+        self._dispatch(key_id, batch)
+        return future
+
+    def flush(self, key_id: str):
+        '''
+        Dispatch whatever is pending for key_id
+        '''
+        with self._lock:
+            batch = self._pending.pop(key_id, None)
+        if batch:
+            self._dispatch(key_id, batch)
+
+    def _dispatch(self, key_id: str, batch: list):
+        size = -(-len(batch) // self.workers)
+        for start in range(0, len(batch), size):
+            self._submit(key_id, batch[start:start + size])
+
+    def _submit(self, key_id: str, batch: list):
+        futures = [future for _, _, future in batch]
+        requests = [(op, payload) for op, payload, _ in batch]
+        try:
+            result = self.executor.submit(run_batch, key_id, requests, self.keys)
+        except RuntimeError as err:
+            # Executor already shut down
+            for future in futures:
+                future.set_exception(err)
+            return
+
+        def done(result):
+            # Only a failure of the task itself (a worker died) reaches
+            # every request of the slice, run_batch reports the rest
+            error = result.exception()
+            for i, future in enumerate(futures):
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result.result()[i])
+        result.add_done_callback(done)
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        batcher = self.server.batcher
+        while True:
+            header = recv_exact(self.request, REQUEST_HEADER.size)
+            if not header:
+                return
+            op, _, key_len, payload_len = REQUEST_HEADER.unpack(header)
+            key_id = recv_exact(self.request, key_len).decode("utf-8")
+            payload = recv_exact(self.request, payload_len)
+            try:
+                status, result = batcher.submit(key_id, op, payload).result()
+            except Exception as err:  # worker died, pool shut down...
+                status, result = STATUS_ERROR, str(err).encode()
+            self.request.sendall(pack_response(status, result))
+
+
+def _remove_stale_socket(path: str):
+    '''
+    Remove the socket left at path by a daemon that is no longer running
+
+    Raises
+    ------
+    FileExistsError
+        If path exists and is not a socket
+    OSError
+        With errno EADDRINUSE if a daemon is still listening on path
+    '''
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(errno.EEXIST, "Not a socket", path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+            return
+    raise OSError(errno.EADDRINUSE, "Another daemon is listening", path)
+
+
+class CryptoDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    '''
+    Unix socket server that keeps keys loaded in a worker pool
+
+    A stale socket left at path is replaced, but the daemon refuses to
+    start if path is not a socket or another daemon is listening on it.
+
+    Parameters
+    ----------
+    path : str
+        Path of the Unix socket
+    keys : dict | KeyringKeys
+        Maps key ids to key parameters: {"n", "e", "d"} for RSA keys and
+        {"p"} for Diffie-Hellman groups, plus "q" to check that peer
+        values lie in the subgroup of order q
+    workers : int, optional
+        Number of workers. The default is os.cpu_count()
+    use_processes : bool, optional
+        Use a process pool instead of a thread pool. The default is True
+    max_batch : int, optional
+        Maximum number of requests per batch. The default is 32
+    window : float, optional
+        Seconds to wait for more requests for the same key. The default
+        is 0.002
+    '''
+    daemon_threads = True
+
+    def __init__(self, path: str, keys: dict, workers: int = None,
+                 use_processes: bool = True, max_batch: int = 32,
+                 window: float = 0.002):
+        _remove_stale_socket(path)
+        workers = workers or os.cpu_count() or 1
+        if use_processes:
+            self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                initargs=(keys,))
+            self.batcher = Batcher(self.executor, max_batch, window, workers)
+        else:
+            # Threads share the process, so the keys go with each task instead
+            # of a module global another daemon in the process would overwrite
+            self.executor = ThreadPoolExecutor(max_workers=workers)
+            self.batcher = Batcher(self.executor, max_batch, window, workers, keys)
+        try:
+            super().__init__(path, _RequestHandler)
+        except BaseException:
+            self.executor.shutdown(cancel_futures=True)
+            raise
+        self._inode = os.lstat(path).st_ino
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(cancel_futures=True)
+        # Only remove the socket if it is still ours
+        try:
+            if os.lstat(self.server_address).st_ino == self._inode:
+                os.unlink(self.server_address)
+        except FileNotFoundError:
+            pass
+
+
+class KeyringKeys:
+    '''
+    Keys of a binary keyring by hex fingerprint, each one decoded on first
+    use. Pickled by path, so every worker process maps the keyring itself
+
+    Parameters
+    ----------
+    keyring : Keyring
+        The keyring
+    '''
+
+    def __init__(self, keyring: Keyring):
+        self.keyring = keyring
+
+    def get(self, key_id: str, default=None) -> dict | None:
+        '''
+        Return the parameters of key key_id, or default if it is not in the
+        keyring
+        '''
+        try:
+            n, e, d = self.keyring.get(key_id)
+        except (KeyError, ValueError):  # unknown or not a fingerprint
+            return default
+        return {"n": n, "e": e, "d": d}
+
+
+def load_keys(path: str) -> dict | KeyringKeys:
+    '''
+    Load keys from a JSON file mapping key ids to key parameters, or from
+    a binary keyring (see rsa_keyring.py), whose keys are identified by
+    their hex fingerprint and decoded on first use
+
+    Parameters
+    ----------
+    path : str
+        Path of the JSON file or keyring
+
+    Returns
+    -------
+    dict | KeyringKeys
+        The keys
+    '''
+    with open(path, "rb") as f:
+        is_keyring = f.read(len(KEYRING_MAGIC)) == KEYRING_MAGIC
+    if is_keyring:
+        return KeyringKeys(Keyring(path))
+    with open(path) as f:
+        keys = json.load(f)
+    return {key_id: {name: int(value) for name, value in params.items()}
+            for key_id, params in keys.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local crypto worker daemon")
+    parser.add_argument("socket", help="Path of the Unix socket")
+    parser.add_argument("keys", help="JSON file or keyring with the keys to serve")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--threads", action="store_true",
+                        help="Use a thread pool instead of processes")
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--window", type=float, default=0.002)
+    args = parser.parse_args()
+
+    with CryptoDaemon(args.socket, load_keys(args.keys), args.workers,
+                      not args.threads, args.max_batch, args.window) as server:
+        print("Serving on {}".format(args.socket))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+Diffie-Hellman sessions backed by a pool of precomputed ephemeral keys.
+
+Generating an ephemeral key pair costs a full exponentiation g ** a mod p.
+EphemeralKeyPool computes those pairs in a background thread for every
+registered group, so a handshake only pays for the shared secret
+exponentiation. Each pair is handed out once and then discarded.
+"""
+import logging
+import threading
+from collections import deque
+
+from .funcs import power_mod, refill_forever
+from .diffie_hellman import DHGroup, generate_keypair, validate_public_value
+
+_log = logging.getLogger(__name__)
+
+
+class EphemeralKeyPool:
+    '''
+    Pool of (private exponent, public value) pairs per group
+
+    Parameters
+    ----------
+    groups : list[tuple], optional
+        (p, g) groups, or (p, g, q, exponent_bits) groups such as a
+        diffie_hellman.DHGroup, to keep keys for. More can be added with
+        add_group
+    depth : int, optional
+        Target number of pairs per group. The default is 32
+    '''
+
+    def __init__(self, groups: list[tuple[int, int]] = (), depth: int = 32):
+        self.depth = depth
+        self._pools = {}
+        self._params = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._hits = 0
+        self._misses = 0
+        self._generated = 0
+        self._errors = 0
+        for group in groups:
+            self.add_group(*group)
+
+    def add_group(self, p: int, g: int, q: int = None, exponent_bits: int = None):
+        '''
+        Start keeping keys for the group (p, g). q and exponent_bits enable
+        short exponents, see diffie_hellman.random_exponent
+        '''
+        with self._lock:
+            self._pools.setdefault((p, g), deque())
+            self._params[(p, g)] = (q, exponent_bits)
+        self._wakeup.set()
+
+    @property
+    def groups(self) -> dict[tuple[int, int], DHGroup]:
+        '''
+        The groups keys are kept for, keyed by (p, g)
+        '''
+        with self._lock:
+            return {(p, g): DHGroup(p, g, q, exponent_bits)
+                    for (p, g), (q, exponent_bits) in self._params.items()}
+
+    def take(self, p: int, g: int) -> tuple[int, int]:
+        '''
+        Take a key pair for the group (p, g). If the pool is empty the pair
+        is generated on the spot (a miss)
+
+        Parameters
+        ----------
+        p : int
+            Prime number
+        g : int
+            Generator for G = Z/pZ*
+
+        Returns
+        -------
+        tuple[int, int]
+            Private exponent and public value
+        '''
+        with self._lock:
+            pool = self._pools.get((p, g))
+            pair = pool.popleft() if pool else None
+            if pair is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        self._wakeup.set()
+        return pair or generate_keypair(p, g, *self._params.get((p, g), ()))
+
+    def start(self):
+        '''
+        Start the refill thread
+        '''
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refill, daemon=True,
+                                        name="dh-key-refill")
+        self._thread.start()
+
+    def stop(self):
+        '''
+        Stop the refill thread. The remaining keys are kept in memory
+        '''
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _refill(self):
+        refill_forever(self._stop, self._wakeup, self._next_job, self._failed)
+
+    def _next_job(self):
+        # The emptiest pool is refilled first
+        with self._lock:
+            pending = [(len(pool), group) for group, pool in self._pools.items()
+                       if len(pool) < self.depth]
+        if not pending:
+            return None
+        _, (p, g) = min(pending)
+
+        def job():
+            pair = generate_keypair(p, g, *self._params[(p, g)])
+            with self._lock:
+                self._pools[(p, g)].append(pair)
+                self._generated += 1
+        return job
+
+    def _failed(self, delay: float):
+        _log.exception("Ephemeral key refill failed, retrying in %.1f s", delay)
+        with self._lock:
+            self._errors += 1
+
+    def metrics(self) -> dict:
+        '''
+        Pool depth per group, hits, misses, pairs generated and failed
+        generations
+
+        Returns
+        -------
+        dict
+            The metrics. Groups are identified by (p, g), as in groups
+        '''
+        with self._lock:
+            return {
+                "depth": {group: len(pool) for group, pool in self._pools.items()},
+                "hits": self._hits,
+                "misses": self._misses,
+                "generated": self._generated,
+                "errors": self._errors,
+            }
+
+
+class DHSession:
+    '''
+    One side of a Diffie-Hellman handshake
+
+    Parameters
+    ----------
+    p : int
+        Prime number
+    g : int
+        Generator for G = Z/pZ*
+    pool : EphemeralKeyPool, optional
+        Pool to take the ephemeral key from. Without one the key is
+        generated when the session is created. The pool decides the size of
+        the exponents of its groups
+    q : int, optional
+        Order of the subgroup generated by g
+    exponent_bits : int, optional
+        Size of short exponents, see diffie_hellman.random_exponent
+    '''
+
+    def __init__(self, p: int, g: int, pool: EphemeralKeyPool = None,
+                 q: int = None, exponent_bits: int = None):
+        self.p = p
+        self.g = g
+        if pool is not None:
+            # The pool knows the order of its groups
+            group = pool.groups.get((p, g))
+            q = q if q is not None or group is None else group.q
+            self._private, self.public = pool.take(p, g)
+        else:
+            self._private, self.public = generate_keypair(p, g, q, exponent_bits)
+        self.q = q
+
+    def common_key(self, peer_public: int) -> int:
+        '''
+        Computes the common key with the other party, after validating its
+        public value, see diffie_hellman.validate_public_value
+        Parameters
+        ----------
+        peer_public : int
+            Public value of the other party
+        Returns
+        -------
+        int
+            Common key
+        '''
+        validate_public_value(peer_public, self.p, self.q)
+        return power_mod(peer_public, self._private, self.p)
+
+
+if __name__ == "__main__":
+    from .diffie_hellman import rfc_group
+
+    group = rfc_group(1536)
+    p, g = group.p, group.g
+    with EphemeralKeyPool([group], depth=8) as pool:
+        alice = DHSession(p, g, pool)
+        bob = DHSession(p, g, pool)
+        print("Same key: {}".format(alice.common_key(bob.public) == bob.common_key(alice.public)))
+        print(pool.metrics())
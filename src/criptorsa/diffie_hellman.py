@@ -0,0 +1,504 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Nov  22 13:08:44 2022
+
+@author: Pablo Javier Barrio Navarro
+"""
+# Diffie-Hellman Implementation
+# Implement a function to generate a random prime p of n bits and a random appropriate generator g for G = Z/pZ∗
+
+import math
+from . import small_group
+import threading
+import warnings
+from collections import OrderedDict
+from typing import NamedTuple
+from .funcs import (
+    power_mod, estimate_k, random_probable_prime,
+    random_odd_number_nbits, is_probable_prime, random_in_range, monitor
+)
+
+    # =========================================================================== #
+    #                                   PART a                                    #
+    # =========================================================================== #
+
+def safe_prime(nlen: int, k: int = None, tries : int = 30000,
+               engine: str = "miller_rabin", deadline = None,
+               progress = None) -> tuple[int, int]:
+    '''
+    Generate a prime q of ceil(nlen / 2) bits such that p = 2q + 1 is also
+    prime
+
+    Parameters
+    ----------
+    nlen : int
+        Bit size requested to diffie_primes
+    k : int, optional
+        Number of Miller-Rabin rounds. Only used by the miller_rabin engine.
+    tries : int, optional
+        Maximum number of candidates for each q. The default is 30000
+    engine : str, optional
+        Primality engine, see funcs.is_probable_prime
+    deadline : float | funcs.CancelToken, optional
+        Seconds of budget or a cancellation token, see
+        funcs.random_probable_prime
+    progress : Callable[[funcs.GenerationProgress], None], optional
+        Progress callback, see funcs.GenerationMonitor
+
+    Returns
+    -------
+    tuple[int, int]
+        q and p
+    '''
+    # NIST restrictions to ensure p and q are big enough but not too close
+    q_size = math.ceil(nlen / 2)                                                    # q_size = ???                      
+    
+    watch = monitor(deadline, progress)
+    if k is None and engine == "miller_rabin":
+        k = estimate_k(nlen, 2 ** - 128)
+    if watch is not None and watch is not deadline:
+        watch.set_phase("safe prime")
+
+    while True: #comprobar que es es primo
+
+        q = random_probable_prime(random_odd_number_nbits(q_size),
+                                  k = k,
+                                  limit = tries,
+                                  engine = engine,
+                                  deadline = watch)
+
+        p = (2 * q) + 1 
+        
+        if(is_probable_prime(p, k, engine)):
+            if watch is not None and watch is not deadline:
+                watch.done()
+            return q, p
+
+
+def diffie_primes(nlen: int, tries : int = 30000,
+                  engine: str = "miller_rabin", pool = None,
+                  store = None, deadline = None, progress = None) -> tuple[int, int]:
+    '''
+    Generate a safe prime p = 2q + 1, q of ceil(nlen / 2) bits, and a
+    generator g
+    Parameters
+    ----------
+    nlen : int
+        Bit size of the group, see above
+    tries : int
+        Maximum number of candidates for each q. The default is 30000
+    engine : str
+        Primality engine, see funcs.is_probable_prime
+    pool : prime_pool.PrimePool
+        Pool of pregenerated safe primes, optional
+    store : domain_params.DomainParameterStore
+        Store of domain parameters, optional. Parameters of this size are
+        taken from it, and only generated on a miss. g is still a generator
+        of the whole group
+    deadline : float | funcs.CancelToken
+        Seconds of budget, or a token another thread can cancel, optional.
+        Checked between candidates; raises funcs.GenerationTimeout or
+        funcs.GenerationCancelled
+    progress : Callable[[funcs.GenerationProgress], None]
+        Progress callback, with phases "safe prime", "generator" and
+        "done", optional. See funcs.GenerationMonitor
+    Returns
+    -------
+    tuple[int, int, int]
+        p, g and the Miller-Rabin rounds used (None if not generated)
+    '''
+    # This is a particularity of our implementation, we will see why
+    if nlen < 8:
+        raise ValueError("Number of bits of n must be greater than 8")    
+    
+    if nlen not in [2048, 3072]:
+        warnings.warn("bitlen should be in [2048, 3072], got {}".format(nlen))
+
+    watch = monitor(deadline, progress)
+    # A domain_params.DomainParameterStore gives stored parameters of the
+    # same size, p = 2q + 1 with q of ceil(nlen / 2) bits, generating them
+    # only once. Its g generates the subgroup of order q, and then -g has
+    # order 2q: it generates the whole group, like generate_generator
+    if store is not None:
+        p, q, g = store.get(math.ceil(nlen / 2) + 1, "dh", deadline=watch)
+        if watch is not None and watch is not deadline:
+            watch.done()
+        return p, p - g, None
+
+
+    # Pregenerated safe primes are used when available
+    pooled = pool.take_safe(nlen) if pool is not None else None
+    if pooled is not None:
+        q, p = pooled
+        k = None
+    else:
+        # Ensure we mimimize the probabilities of error in the primality test.
+        # Only random rounds of Miller-Rabin need it
+        k = estimate_k(nlen, 2 ** - 128) if engine == "miller_rabin" else None
+        if watch is not None:
+            watch.set_phase("safe prime")
+        q, p = safe_prime(nlen, k, tries, engine, deadline=watch)
+
+    if watch is not None:
+        watch.set_phase("generator")
+    g = generate_generator(p, deadline=watch)       # Here p is a prime number
+
+    if watch is not None and watch is not deadline:
+        watch.done()
+    return p, g, k
+        
+def generate_generator(p: int, deadline = None) -> int:
+    '''
+    Generates a generator for G = Z/pZ*
+    Parameters
+    ----------
+    p : int
+        Prime number
+    deadline : float | funcs.CancelToken | funcs.GenerationMonitor
+        Checked between candidates, optional. See funcs.random_probable_prime
+    Returns
+    -------
+    int
+        Generator for G = Z/pZ*
+    '''
+    watch = monitor(deadline)
+    if small_group.supports(p):
+        # Check whole batches of candidates at once
+        g = None
+        while g is None:
+            if watch is not None:
+                watch.step()
+            candidates = small_group.random_range(64, 2, p)
+            found = candidates[small_group.generator_mask(candidates, p)]
+            g = int(found[0]) if len(found) else None
+    else:
+        g = random_in_range(2, p)
+        while not is_generator(g, p, watch):
+            if watch is not None:
+                watch.step()
+            g = random_in_range(2, p)
+    return g
+
+def is_generator(g: int, p: int, deadline = None) -> bool:
+    '''
+    Checks if a number is a generator for G = Z/pZ*
+    Parameters
+    ----------
+    g : int
+        Number to be checked
+    p : int
+        Prime number
+    deadline : float | funcs.CancelToken | funcs.GenerationMonitor
+        Checked every 4096 exponents, optional. The check takes up to p
+        exponentiations
+    Returns
+    -------
+    bool
+        True if the number is a generator, False otherwise.
+    '''
+    if g < 2 or g > p - 1:
+        return False
+
+    if small_group.supports(p):
+        return bool(small_group.generator_mask([g], p)[0])
+
+    watch = monitor(deadline)
+    for n in range(1, p - 1):
+        if watch is not None and n % 4096 == 0:
+            watch.check()
+        if power_mod(g, n, p) == 1:
+            return False
+
+    return True
+
+    # =========================================================================== #
+    #                                   PART b                                    #
+    # =========================================================================== #
+
+def Diffie_HellmanRFC(n: int)-> tuple[int, int]:
+
+    if(n != 1536):
+        raise Exception("El número de bits debe ser 1536") 
+
+    # Imported here: only this group needs the digits of pi
+    from . import pi
+
+    # floor(2 ** 1406 * pi) in integer arithmetic. A few more digits of pi
+    # than those of 2 ** 1406 make the truncation exact
+    digits = len(str(2**1406)) + 10
+    p = 2**1536 - 2**1472 - 1 + 2**64 * ( (2 ** 1406 * pi.pi_fixed(digits)) // 10 ** digits  + 741804 )
+
+    g = 2
+
+    return p,g
+
+class DHGroup(NamedTuple):
+    '''
+    Group parameters: g generates a subgroup of prime order q of Z/pZ*.
+    exponent_bits is the size of the private exponents used with the group,
+    None meaning full size exponents in [2, p - 2]
+    '''
+    p: int
+    g: int
+    q: int
+    exponent_bits: int | None = None
+
+def security_strength(nbits: int) -> int:
+    '''
+    Security strength in bits of a finite field group with a prime of nbits
+    bits (NIST SP 800-57, table 2)
+    '''
+    for bound, strength in [(1024, 80), (2048, 112), (3072, 128), (7680, 192)]:
+        if nbits <= bound:
+            return strength
+    return 256
+
+def short_exponent_bits(nbits: int) -> int:
+    '''
+    Size of short private exponents for a prime of nbits bits: twice the
+    security strength, and never less than 256 bits
+    '''
+    return max(256, 2 * security_strength(nbits))
+
+def rfc_group(n: int, short_exponents: bool = True) -> DHGroup:
+    '''
+    The RFC 3526 group of n bits as a DHGroup. p is a safe prime and g = 2
+    generates the subgroup of order q = (p - 1) / 2
+    Parameters
+    ----------
+    n : int
+        Number of bits of p
+    short_exponents : bool
+        Use short private exponents with the group. The default is True
+    Returns
+    -------
+    DHGroup
+        The group
+    '''
+    p, g = Diffie_HellmanRFC(n)
+    return DHGroup(p, g, (p - 1) // 2,
+                   short_exponent_bits(n) if short_exponents else None)
+
+def random_exponent(p: int, q: int = None, exponent_bits: int = None) -> int:
+    '''
+    Draws a private exponent with a CSPRNG.
+
+    Short exponents of exponent_bits bits are only safe if the generator
+    they are used with has prime order q, so q must be given with them.
+    If exponent_bits is not smaller than q the exponent is drawn from
+    [2, q - 1] instead
+    Parameters
+    ----------
+    p : int
+        Prime number
+    q : int
+        Order of the subgroup generated by g, optional
+    exponent_bits : int
+        Size of short exponents, optional
+    Returns
+    -------
+    int
+        The exponent
+    '''
+    low, high = exponent_range(p, q, exponent_bits)
+    return random_in_range(low, high)
+
+def exponent_range(p: int, q: int = None, exponent_bits: int = None) -> tuple[int, int]:
+    '''
+    Range [low, high) random_exponent draws exponents from
+    '''
+    if exponent_bits is None:
+        return 2, p - 1
+    if q is None:
+        raise ValueError("Short exponents need the order q of the subgroup")
+    if exponent_bits >= q.bit_length():
+        return 2, q
+    return 2, 2 ** exponent_bits
+
+class PeerKeyCache:
+    '''
+    Bounded, thread-safe LRU of peer public values already validated, keyed
+    by (p, q, value).
+
+    Checking that a public value lies in the subgroup of order q costs a
+    full exponentiation, as much as the key agreement itself. Peers that
+    reconnect with the same static public value only pay it once. Only
+    valid values are remembered, so rejected ones are checked every time.
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        Maximum number of values remembered. The default is 4096
+    '''
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.evictions = 0
+        self._valid = OrderedDict()
+        self._lock = threading.Lock()
+
+    def validate(self, value: int, p: int, q: int = None) -> int:
+        '''
+        Check a peer public value, see check_public_value, remembering it
+        if it is valid
+
+        Returns
+        -------
+        int
+            The value
+        '''
+        key = (p, q, value)
+        with self._lock:
+            if key in self._valid:
+                self._valid.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+        # Checked outside the lock, so concurrent handshakes do not queue
+        # behind each other's exponentiations
+        try:
+            check_public_value(value, p, q)
+        except ValueError:
+            with self._lock:
+                self.rejected += 1
+            raise
+        with self._lock:
+            self._valid[key] = True
+            if len(self._valid) > self.maxsize:
+                self._valid.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    @property
+    def hit_rate(self) -> float:
+        '''
+        Fraction of validations served from the cache
+        '''
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {"size": len(self._valid), "maxsize": self.maxsize,
+                    "hits": self.hits, "misses": self.misses,
+                    "rejected": self.rejected, "evictions": self.evictions,
+                    "hit_rate": self.hit_rate}
+
+    def clear(self):
+        with self._lock:
+            self._valid.clear()
+            self.hits = self.misses = self.rejected = self.evictions = 0
+
+def check_public_value(value: int, p: int, q: int = None):
+    '''
+    Check a public value received from a peer (NIST SP 800-56A, section
+    5.6.2.3.1): 1 < value < p - 1 and, if the order q of the subgroup is
+    known, value ** q = 1 mod p. Without the second check a peer can force
+    the common key into a small subgroup
+    Parameters
+    ----------
+    value : int
+        Public value of the peer
+    p : int
+        Prime number
+    q : int
+        Order of the subgroup generated by g, optional
+    Raises
+    ------
+    ValueError
+        If the value is not valid
+    '''
+    if not 1 < value < p - 1:
+        raise ValueError("Public value out of range (1, p - 1)")
+    if q is not None and power_mod(value, q, p) != 1:
+        raise ValueError("Public value is not in the subgroup of order q")
+
+# Validated peer values shared by common_key, DHSession and ElGamal
+_peer_keys = PeerKeyCache()
+
+def validate_public_value(value: int, p: int, q: int = None) -> int:
+    '''
+    check_public_value through the shared PeerKeyCache
+    '''
+    return _peer_keys.validate(value, p, q)
+
+def peer_key_metrics() -> dict:
+    '''
+    Metrics of the shared PeerKeyCache, see PeerKeyCache.metrics
+    '''
+    return _peer_keys.metrics()
+
+    # =========================================================================== #
+    #                                   PART c                                    #
+    # =========================================================================== #
+
+def generate_keypair(p: int, g: int, q: int = None,
+                     exponent_bits: int = None) -> tuple[int, int]:
+    '''
+    Generates an ephemeral key pair with a CSPRNG
+    Parameters
+    ----------
+    p : int
+        Prime number
+    g : int
+        Generator for G = Z/pZ*, or of the subgroup of order q
+    q : int
+        Order of the subgroup generated by g, optional
+    exponent_bits : int
+        Size of short exponents, optional. See random_exponent
+    Returns
+    -------
+    tuple[int, int]
+        Private exponent a and public value g ** a mod p
+    '''
+    a = random_exponent(p, q, exponent_bits)
+    return a, power_mod(g, a, p)
+
+def common_key(p: int, ga: int, q: int = None, exponent_bits: int = None,
+               validate: bool = True) -> int:
+    '''
+    Computes the common key for both parties
+    Parameters
+    ----------
+    p : int
+        Prime number
+    ga : int
+        Public key for Alice
+    q : int
+        Order of the subgroup of the group, optional
+    exponent_bits : int
+        Size of short exponents, optional. See random_exponent
+    validate : bool
+        Check ga first, see validate_public_value. The default is True
+    Returns
+    -------
+    int
+        Common key
+    '''
+    if validate:
+        validate_public_value(ga, p, q)
+    aB = random_exponent(p, q, exponent_bits)
+    return power_mod(ga, aB, p)
+
+
+    # =========================================================================== #
+    # =================================== MAIN ================================== #
+    # =========================================================================== #
+
+if __name__ == '__main__':
+    # Part a) Implement a function to generate a random prime p of n bits and a random appropriate generator g for G = Z/pZ∗.
+    p, g, k= diffie_primes(32)
+    print("p: {} g: {}".format(p, g))
+
+    # Part b) Implement a function that returns a pair of p and g obtained from RFC 3526
+    p, g = Diffie_HellmanRFC(1536)
+    print("p: {} g: {}".format(p, g))
+
+    # Part c) Given p = 7883, g = 2 and a user with g^ai ≡ 1876 mod p, form a common key with that user.
+    p = 7883
+    ga = 1876
+    k = common_key(p, ga)
+    print("Common key for User: {}".format(k))
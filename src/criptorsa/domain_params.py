@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent store of Diffie-Hellman and ElGamal domain parameters.
+
+Generating a safe prime takes from seconds to hours depending on its size,
+so nodes should not do it on every start. The store keeps validated
+(p, q, g) triples in a JSON file, keyed by purpose ("dh", "elgamal"...)
+and bit size of p: p = 2q + 1 is a safe prime and g generates the subgroup
+of prime order q. Parameters are only generated on a miss or an explicit
+rotation, and every entry carries a SHA-256 checksum that is verified, with
+the structure of the triple, when the file is loaded.
+
+The file is always rewritten under an exclusive lock, so several processes
+can share it. Generations take a lock of their own entry: when two threads
+or processes miss the same entry, the second one waits and then takes the
+parameters generated by the first, while lookups and generations of other
+entries go on.
+
+Run with:
+    python -m criptorsa.domain_params generate 1024 --purpose elgamal
+    python -m criptorsa.domain_params list
+"""
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+import warnings
+from contextlib import contextmanager
+
+from .funcs import (
+    power_mod, is_probable_prime, random_in_range, random_probable_prime,
+    estimate_k, sieve_primes, CandidateSampler, monitor
+)
+from .diffie_hellman import DHGroup, short_exponent_bits
+
+VERSION = 1
+PATH_ENV_VAR = "CRIPTORSA_DOMAIN_PARAMS"
+DEFAULT_PATH = os.path.join("~", ".cache", "criptorsa", "domain_params.json")
+
+
+def _entry_key(purpose: str, nbits: int) -> str:
+    return "{}:{}".format(purpose, nbits)
+
+
+def checksum(purpose: str, nbits: int, p: int, q: int, g: int) -> str:
+    '''
+    SHA-256, in hex, of an entry of the store. It detects corrupted or
+    hand edited entries, it is not a signature
+    '''
+    text = "{}:{}:{:x}:{:x}:{:x}".format(purpose, nbits, p, q, g)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def check_params(nbits: int, p: int, q: int, g: int, deep: bool = False):
+    '''
+    Check the structure of a triple: p of nbits bits, p = 2q + 1 and g of
+    order q (1 < g < p - 1 and g ** q = 1 mod p, which for a prime q means
+    order exactly q)
+
+    Parameters
+    ----------
+    nbits : int
+        Bit size of p
+    p, q, g : int
+        The parameters
+    deep : bool, optional
+        Also test p and q for primality. The default is False
+
+    Raises
+    ------
+    ValueError
+        If the triple is not valid
+    '''
+    if p.bit_length() != nbits or p != 2 * q + 1:
+        raise ValueError("p is not a safe prime 2q + 1 of {} bits".format(nbits))
+    if not 1 < g < p - 1 or power_mod(g, q, p) != 1:
+        raise ValueError("g does not generate the subgroup of order q")
+    if deep and not (is_probable_prime(q) and is_probable_prime(p)):
+        raise ValueError("p or q is not prime")
+
+
+def generate_params(nbits: int, engine: str = "miller_rabin", pool=None,
+                    deadline=None, progress=None) -> tuple[int, int, int]:
+    '''
+    Generate a safe prime p of nbits bits and a generator of its subgroup
+    of order q = (p - 1) / 2
+
+    Parameters
+    ----------
+    nbits : int
+        Bit size of p
+    engine : str, optional
+        Primality engine, see funcs.is_probable_prime
+    pool : prime_pool.PrimePool, optional
+        Pool to take the safe prime from. It keeps the safe primes of
+        diffie_primes(nlen), which have q of nlen / 2 bits
+    deadline : float | funcs.CancelToken, optional
+        Seconds of budget or a cancellation token, see
+        funcs.random_probable_prime
+    progress : Callable[[funcs.GenerationProgress], None], optional
+        Progress callback, see funcs.GenerationMonitor
+
+    Returns
+    -------
+    tuple[int, int, int]
+        p, q and g
+    '''
+    # diffie_primes(nlen) gives q of ceil(nlen / 2) bits, at most
+    pooled = pool.take_safe(2 * (nbits - 1)) if pool is not None else None
+    if pooled is not None and pooled[1].bit_length() == nbits:
+        q, p = pooled
+    else:
+        watch = monitor(deadline, progress)
+        q, p = _safe_prime(nbits, engine, watch)
+        if watch is not None and watch is not deadline:
+            watch.done()
+    # Squares generate the subgroup of order q. Only h = +-1 gives g = 1,
+    # and they are out of the range
+    g = power_mod(random_in_range(2, p - 1), 2, p)
+    return p, q, g
+
+
+def _safe_prime(nbits: int, engine: str, watch=None) -> tuple[int, int]:
+    # Unlike diffie_hellman.safe_prime, q has exactly nbits - 1 bits and its
+    # candidates are sieved, for q and for 2q + 1
+    k = estimate_k(nbits, 2 ** -128) if engine == "miller_rabin" else None
+    small_primes = sieve_primes(2048)
+    sampler = CandidateSampler(nbits - 1, low=2 ** (nbits - 2))
+
+    def safe_candidate(q):
+        return all((2 * q + 1) % r for r in small_primes if r < q)
+
+    if watch is not None:
+        watch.set_phase("safe prime")
+    while True:
+        q = random_probable_prime(sampler, k=k, test_func=safe_candidate,
+                                  limit=None, engine=engine, deadline=watch)
+        if is_probable_prime(2 * q + 1, k, engine):
+            return q, 2 * q + 1
+
+
+class DomainParameterStore:
+    '''
+    (p, q, g) triples keyed by purpose and bit size of p, persisted in a
+    JSON file. The file is read once, when the store is created, so every
+    lookup after that is a dict access
+
+    Parameters
+    ----------
+    path : str, optional
+        File of the store. The default is the CRIPTORSA_DOMAIN_PARAMS
+        environment variable, or ~/.cache/criptorsa/domain_params.json
+    engine : str, optional
+        Primality engine used to generate parameters
+    pool : prime_pool.PrimePool, optional
+        Pool of safe primes used to generate parameters
+    '''
+
+    def __init__(self, path: str = None, engine: str = "miller_rabin", pool=None):
+        path = path or os.environ.get(PATH_ENV_VAR) or DEFAULT_PATH
+        self.path = os.path.expanduser(path)
+        self.engine = engine
+        self.pool = pool
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._generated = 0
+        self._params, rejected = self._read()
+        for key, error in rejected.items():
+            warnings.warn("Dropping domain parameters {}: {}".format(key, error))
+        self._rejected = len(rejected)
+
+    def _read(self) -> tuple[dict, dict]:
+        # Entries that fail their checks are dropped, so they are generated
+        # again on their next use
+        try:
+            with open(self.path) as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return {}, {}
+        except json.JSONDecodeError:
+            return {}, {self.path: "corrupted file"}
+        params = {}
+        rejected = {}
+        for key, entry in stored.get("params", {}).items():
+            purpose, _, nbits = key.rpartition(":")
+            try:
+                p, q, g = (int(entry[name], 16) for name in "pqg")
+                if entry["sha256"] != checksum(purpose, int(nbits), p, q, g):
+                    raise ValueError("checksum mismatch")
+                check_params(int(nbits), p, q, g)
+            except (KeyError, ValueError) as error:
+                rejected[key] = error
+                continue
+            params[key] = (p, q, g, entry.get("created"))
+        return params, rejected
+
+    @contextmanager
+    def _file_lock(self, path: str):
+        # flock locks belong to the open file, so they exclude the other
+        # threads of this process as well as other processes
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _store(self, key: str, params: tuple):
+        # Adds an entry and rewrites the file. Only held for the write
+        with self._file_lock(self.path + ".lock"), self._lock:
+            # Other processes may have written since we last read
+            self._params.update(self._read()[0])
+            self._params[key] = params
+            self._generated += 1
+            stored = {"version": VERSION, "params": {}}
+            for entry, (p, q, g, created) in sorted(self._params.items()):
+                purpose, _, nbits = entry.rpartition(":")
+                stored["params"][entry] = {
+                    "p": "{:x}".format(p), "q": "{:x}".format(q), "g": "{:x}".format(g),
+                    "created": created,
+                    "sha256": checksum(purpose, int(nbits), p, q, g)}
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(stored, f, indent=1)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+
+    def _generate(self, purpose: str, nbits: int, deadline=None, progress=None) -> tuple:
+        p, q, g = generate_params(nbits, self.engine, self.pool, deadline, progress)
+        check_params(nbits, p, q, g, deep=True)
+        params = (p, q, g, int(time.time()))
+        self._store(_entry_key(purpose, nbits), params)
+        return params
+
+    def get(self, nbits: int, purpose: str = "dh", deadline=None,
+            progress=None, generate: bool = True) -> tuple[int, int, int]:
+        '''
+        The parameters of nbits bits for purpose, generated and saved on a
+        miss. Only the generation of this entry waits for a generation in
+        progress, other lookups are not blocked
+
+        Parameters
+        ----------
+        nbits : int
+            Bit size of p
+        purpose : str, optional
+            Use of the parameters, so that they can be rotated separately.
+            The default is "dh"
+        deadline : float | funcs.CancelToken, optional
+            Bounds the generation on a miss, see funcs.random_probable_prime.
+            Nothing is saved if it expires
+        progress : Callable[[funcs.GenerationProgress], None], optional
+            Progress callback of the generation on a miss
+        generate : bool, optional
+            Generate the parameters on a miss. If False a miss raises a
+            LookupError instead. The default is True
+
+        Returns
+        -------
+        tuple[int, int, int]
+            p, q and g
+        '''
+        key = _entry_key(purpose, nbits)
+        with self._lock:
+            if key in self._params:
+                self._hits += 1
+                return self._params[key][:3]
+            self._misses += 1
+        with self._file_lock(self._entry_lock_path(key)):
+            # Another thread or process may have generated it meanwhile
+            fresh = self._read()[0]
+            with self._lock:
+                self._params.update(fresh)
+                found = self._params.get(key)
+            if found is None:
+                if not generate:
+                    raise LookupError(
+                        "No {} domain parameters of {} bits in {}, generate them with "
+                        "python -m criptorsa.domain_params generate {} --purpose {}"
+                        .format(purpose, nbits, self.path, nbits, purpose))
+                found = self._generate(purpose, nbits, deadline, progress)
+        return found[:3]
+
+    def _entry_lock_path(self, key: str) -> str:
+        return "{}.{}.lock".format(self.path, key.replace(":", "-"))
+
+    def group(self, nbits: int, purpose: str = "dh", short_exponents: bool = True,
+              generate: bool = True) -> DHGroup:
+        '''
+        get as a DHGroup, with short exponents like diffie_hellman.rfc_group
+        '''
+        p, q, g = self.get(nbits, purpose, generate=generate)
+        return DHGroup(p, g, q, short_exponent_bits(nbits) if short_exponents else None)
+
+    def rotate(self, nbits: int, purpose: str = "dh", deadline=None,
+               progress=None) -> tuple[int, int, int]:
+        '''
+        Replace the parameters of nbits bits for purpose with new ones.
+        deadline and progress as in get
+
+        Returns
+        -------
+        tuple[int, int, int]
+            The new p, q and g
+        '''
+        with self._file_lock(self._entry_lock_path(_entry_key(purpose, nbits))):
+            return self._generate(purpose, nbits, deadline, progress)[:3]
+
+    def entries(self) -> list[tuple[str, int, int | None]]:
+        '''
+        Purpose, bit size and creation time of every stored triple
+        '''
+        with self._lock:
+            return [(key.rpartition(":")[0], int(key.rpartition(":")[2]), created)
+                    for key, (_, _, _, created) in sorted(self._params.items())]
+
+    def metrics(self) -> dict:
+        '''
+        Entries, hits and misses of get and parameters generated, plus
+        entries dropped because they failed their checks
+        '''
+        with self._lock:
+            return {"entries": len(self._params), "hits": self._hits,
+                    "misses": self._misses, "generated": self._generated,
+                    "rejected": self._rejected}
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def default_store() -> DomainParameterStore:
+    '''
+    Store shared by diffie_primes and elgamal_keygen when asked to use one,
+    created on first use at the default path
+    '''
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = DomainParameterStore()
+        return _default_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default=None, help="File of the store")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, text in [("generate", "Generate parameters if missing"),
+                       ("rotate", "Replace parameters with new ones")]:
+        command = commands.add_parser(name, help=text)
+        command.add_argument("nbits", type=int)
+        command.add_argument("--purpose", default="dh")
+    commands.add_parser("list", help="List the stored parameters")
+    commands.add_parser("verify", help="Check the primality of every stored triple")
+    args = parser.parse_args()
+
+    store = DomainParameterStore(args.path)
+    if args.command in ("generate", "rotate"):
+        start = time.perf_counter()
+        if args.command == "generate":
+            p, q, g = store.get(args.nbits, args.purpose)
+        else:
+            p, q, g = store.rotate(args.nbits, args.purpose)
+        print("{}:{} g = {} ({:.2f} s)".format(args.purpose, args.nbits, g,
+                                                time.perf_counter() - start))
+    elif args.command == "list":
+        for purpose, nbits, created in store.entries():
+            print("{:>10} {:>6} bits  created {}".format(
+                purpose, nbits, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created or 0))))
+    else:
+        failed = 0
+        for purpose, nbits, _ in store.entries():
+            try:
+                check_params(nbits, *store.get(nbits, purpose), deep=True)
+                status = "ok"
+            except ValueError as error:
+                failed += 1
+                status = str(error)
+            print("{:>10} {:>6} bits  {}".format(purpose, nbits, status))
+        if failed:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,500 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Nov  22 13:08:44 2022
+
+@author: Pablo Javier Barrio Navarro
+"""
+#ElGamal Implementation
+from typing import Iterable
+from .funcs import (block_from_bytes, blocks_from_bytes, compute_block_size, power_mod, multiplicative_inverse,
+                   iter_blocks, map_ordered, random_many)
+from .diffie_hellman import (DHGroup, random_exponent, exponent_range,
+                             validate_public_value)
+from . import small_group
+
+def generate_public_key(p: int, g: int, ai: int) -> int:
+    '''
+    Generates a public key for ElGamal
+    Parameters
+    ----------
+    p : int
+        Prime number
+    g : int
+        Generator for G = Z/pZ*
+    ai : int
+        Private key
+    Returns
+    -------
+    int
+        Public key
+    '''
+    return power_mod(g, ai, p)
+
+def elgamal_domain(nbits: int = 2048, store = None, generate: bool = False) -> DHGroup:
+    '''
+    Domain parameters of nbits bits for ElGamal from a store of domain
+    parameters. Generating a safe prime of 2048 bits takes minutes, so it
+    is only done on a miss if asked to with generate; otherwise the
+    parameters must be generated beforehand, for example with
+    python -m criptorsa.domain_params generate 2048 --purpose elgamal
+    Parameters
+    ----------
+    nbits : int
+        Bit size of p. The default is 2048
+    store : domain_params.DomainParameterStore
+        Store of the parameters, optional. The default is
+        domain_params.default_store()
+    generate : bool
+        Generate and save the parameters if they are not in the store.
+        The default is False, raise a LookupError
+    Returns
+    -------
+    DHGroup
+        p, g of prime order q and the size of short exponents
+    '''
+    if store is None:
+        from .domain_params import default_store
+        store = default_store()
+    return store.group(nbits, "elgamal", generate=generate)
+
+def elgamal_keygen(p: int = None, g: int = None, q: int = None, exponent_bits: int = None,
+                   nbits: int = 2048, store = None, generate: bool = False) -> tuple:
+    '''
+    Generates a public and private key for ElGamal
+    Parameters
+    ----------
+    p : int
+        Prime number. If None, the group is elgamal_domain(nbits, store)
+    g : int
+        Generator for G = Z/pZ*, or of the subgroup of order q
+    q : int
+        Order of the subgroup generated by g, optional
+    exponent_bits : int
+        Size of short private keys, optional. See diffie_hellman.random_exponent
+    nbits : int
+        Bit size of p when it is taken from the store. The default is 2048
+    store : domain_params.DomainParameterStore
+        Store of domain parameters used when p is None, optional
+    generate : bool
+        Generate the parameters of the store on a miss, see elgamal_domain.
+        The default is False
+    Returns
+    -------
+    tuple
+        Public and private key
+    '''
+    if p is None:
+        p, g, q, exponent_bits = elgamal_domain(nbits, store, generate)
+    ai = random_exponent(p, q, exponent_bits)
+    my_pk = generate_public_key(p, g, ai)
+    return my_pk, ai
+
+def elgamal_encrypt(by: bytes, g: int, pk_bob: int, p: int, q: int = None,
+                    exponent_bits: int = None, executor=None, workers: int = None,
+                    mode: str = None) -> list[tuple[int, bytes]]:
+    '''
+    Encrypts a message using ElGamal
+    Parameters
+    ----------
+    by : bytes
+        Message to be encrypted
+    g : int
+        Generator for G = Z/pZ*
+    k : int
+        Random number
+    pk_bob : int
+        Public key of Bob. It is validated first, see
+        diffie_hellman.validate_public_value
+    p : int
+        Prime number
+    q : int
+        Order of the subgroup generated by g, optional
+    exponent_bits : int
+        Size of the short ephemeral keys, optional.
+        See diffie_hellman.random_exponent
+    executor : concurrent.futures.Executor
+        Pool to run the exponentiations in, optional, see funcs.map_ordered
+    workers : int
+        Size of the pool created when no executor is given, optional
+    mode : str
+        Kind of pool created, optional, see funcs.execution_mode
+    Returns 
+    -------
+    tuple[int, bytes]
+        Encrypted message
+    '''
+    validate_public_value(pk_bob, p, q)
+    block_size = compute_block_size(p)
+    encrypted_block_size = block_size + 1
+    
+    last_size = len(by) % block_size    
+    last_size = last_size or block_size
+    encrypted = elgamal_encryption(by, g, pk_bob, p, block_size, q, exponent_bits,
+                                   executor, workers, mode)
+
+    #print("Encrypted block: "+str(encrypted))
+    encryptedC1 = []
+    encryptedC2 = []
+    
+    for block in encrypted:
+        encryptedC1.append(block[0])
+        encryptedC2.append(block[1].to_bytes(encrypted_block_size, 'big'))
+
+    #print("encrypted C1: "+str(encryptedC1))
+    #print("encrypted C2: "+str(encryptedC2))
+    
+    #print("Encrypted block bytes: "+str(encrypted))
+
+    
+    # We add an additional block with size of the last one.
+    # This is necessary to properly decrypt leading null bytes
+    padding_block = elgamal_encryption(
+        last_size.to_bytes(block_size, byteorder="big"), g, pk_bob, p, block_size,
+        q, exponent_bits)
+    
+    for block in padding_block:
+        encryptedC1.append(block[0])
+        encryptedC2.append(block[1].to_bytes(encrypted_block_size, 'big'))
+
+    #print("padding_block C1: "+str(padding_blockC1))
+    #print("padding_block C2: "+str(padding_blockC2))
+
+    list = []
+    for elementC1, elementC2 in zip(encryptedC1, encryptedC2):
+        list.append((elementC1, elementC2))
+    
+    return list
+
+def elgamal_encryption(by: bytes, g: int, pk_bob: int, p: int, extract_blocks_size: int,
+                   q: int = None, exponent_bits: int = None, executor=None,
+                   workers: int = None, mode: str = None) -> list[tuple[int, int]]:
+    '''
+    Encrypts a message using ElGamal
+    Parameters
+    ----------
+    by : bytes
+        Message to be encrypted
+    g : int
+        Generator for G = Z/pZ*
+    pk_bob : int
+        Public key of Bob
+    p : int
+        Prime number
+    extract_blocks_size : int
+        Size of the blocks to be extracted from the message
+    q : int
+        Order of the subgroup generated by g, optional
+    exponent_bits : int
+        Size of the short ephemeral keys, optional
+    executor : concurrent.futures.Executor
+        Pool to run the exponentiations in, optional, see funcs.map_ordered
+    workers : int
+        Size of the pool created when no executor is given, optional
+    mode : str
+        Kind of pool created, optional, see funcs.execution_mode
+    Returns
+    -------
+    list[tuple[int, int]]
+        Encrypted message
+    '''
+
+    if small_group.supports(p):
+        return small_group.elgamal_encryption(
+            by, g, pk_bob, p, extract_blocks_size, *exponent_range(p, q, exponent_bits))
+
+    blocks = blocks_from_bytes(by, extract_blocks_size)
+    return _encrypt_blocks(blocks, g, pk_bob, p, q, exponent_bits, executor, workers, mode)
+
+def _encrypt_blocks(blocks: list[int], g: int, pk_bob: int, p: int, q: int = None,
+                    exponent_bits: int = None, executor=None, workers: int = None,
+                    mode: str = None, chunk_size: int = 16) -> list[tuple[int, int]]:
+    # Ephemeral keys for every block in a single draw, always in the
+    # calling thread
+    keys = random_many(*exponent_range(p, q, exponent_bits), len(blocks))
+    if executor is None and (workers is None or workers <= 1):
+        return _encrypt_chunk((blocks, keys, g, pk_bob, p))
+    jobs = [(blocks[start:start + chunk_size], keys[start:start + chunk_size], g, pk_bob, p)
+            for start in range(0, len(blocks), chunk_size)]
+    results = map_ordered(_encrypt_chunk, jobs, executor, workers, mode)
+    return [pair for chunk in results for pair in chunk]
+
+def _encrypt_chunk(job: tuple) -> list[tuple[int, int]]:
+    blocks, keys, g, pk_bob, p = job
+    encryptions = []
+    for block, key in zip(blocks, keys):
+        C1 = power_mod(g, key, p)
+        C2 = (block*power_mod(pk_bob, key, p))%p
+        encryptions.append((C1, C2))
+
+    return encryptions
+
+def elgamal_decrypt(by: bytes, p: int, ai: int, executor=None, workers: int = None,
+                    mode: str = None) -> bytes:
+    '''
+    Decrypts a message using ElGamal
+    Parameters
+    ----------
+    by : bytes
+        Message to be decrypted
+    p : int
+        Prime number
+    ai : int
+        Private key
+    executor : concurrent.futures.Executor
+        Pool to run the exponentiations in, optional, see funcs.map_ordered
+    workers : int
+        Size of the pool created when no executor is given, optional
+    mode : str
+        Kind of pool created, optional, see funcs.execution_mode
+    Returns
+    -------
+    bytes
+        Decrypted message
+    Raises
+    ------
+    ValueError
+        If the size block does not hold a valid size
+    '''
+    decryptedC1 = []
+    decryptedC2 = []
+    for block in by:
+        decryptedC1.append(block[0])
+        decryptedC2.append(block[1])
+    
+    encrypted_block_size = compute_block_size(p) + 1
+
+    block_size = encrypted_block_size - 1
+    if not decryptedC1:
+        raise ValueError("Not a message encrypted with this key")
+    decrypted = elgamal_decryption(decryptedC1, decryptedC2, ai, p, executor, workers, mode)
+    # An empty message is only the size block
+    if len(decrypted) == 1:
+        return b''
+    last_size = decrypted[-1]
+    # A wrong key or a corrupted message gives a meaningless size
+    if not 0 < last_size <= block_size:
+        raise ValueError("Not a message encrypted with this key")
+    
+    # Each block is written at its fixed offset of the output
+    size = (len(decrypted) - 2) * block_size + last_size
+    out = bytearray(size)
+    offset = 0
+    try:
+        for block in decrypted[:-2]:
+            out[offset:offset + block_size] = block.to_bytes(block_size, 'big')
+            offset += block_size
+
+        # decrypt the last block independently
+        out[offset:size] = decrypted[-2].to_bytes(last_size, 'big')
+    except OverflowError:
+        # A block larger than its size, same cause as a bad size
+        raise ValueError("Not a message encrypted with this key") from None
+    return bytes(out)
+
+def elgamal_decryption(listC1: list, listC2: list, ai: int, p: int, executor=None,
+                   workers: int = None, mode: str = None, chunk_size: int = 16
+                   ) -> list[int]:
+    '''
+    Decrypts a message using ElGamal
+    Parameters
+    ----------
+    listC1 : list
+        List of C1
+    listC2 : list
+        List of C2
+    ai : int
+        Private key
+    p : int 
+        Prime number
+    executor : concurrent.futures.Executor
+        Pool to run the exponentiations in, optional, see funcs.map_ordered
+    workers : int
+        Size of the pool created when no executor is given, optional
+    mode : str
+        Kind of pool created, optional, see funcs.execution_mode
+    chunk_size : int
+        Blocks per job handed to a worker, optional. The default is 16
+    Returns 
+    -------     
+    list[int]
+        Decrypted message
+    '''
+    if small_group.supports(p):
+        return small_group.elgamal_decryption(list(listC1), list(listC2), ai, p)
+
+    blocksC1 = []
+    blocksC2 = []
+
+    for elementC1, elementC2 in zip(listC1, listC2):
+        blocksC1.append(elementC1)
+        blocksC2.append(block_from_bytes(elementC2))        
+
+    if executor is None and (workers is None or workers <= 1):
+        return _decrypt_chunk((blocksC1, blocksC2, ai, p))
+    jobs = [(blocksC1[start:start + chunk_size], blocksC2[start:start + chunk_size], ai, p)
+            for start in range(0, len(blocksC1), chunk_size)]
+    results = map_ordered(_decrypt_chunk, jobs, executor, workers, mode)
+    return [block for chunk in results for block in chunk]
+
+def _decrypt_chunk(job: tuple) -> list[int]:
+    blocksC1, blocksC2, ai, p = job
+    return [blockC2*multiplicative_inverse(power_mod(blockC1, ai, p), p)%p for blockC1, blockC2 in zip(blocksC1, blocksC2)]
+
+def _framed(by: bytes, block_size: int) -> bytes:
+    # The message with its last block left padded to block_size and the
+    # size block appended: it splits into whole blocks with the same values
+    # elgamal_encrypt encrypts
+    last_size = len(by) % block_size or block_size
+    if not by:
+        return last_size.to_bytes(block_size, "big")
+    tail = by[len(by) - last_size:]
+    return (by[:len(by) - last_size] + tail.rjust(block_size, b'\x00')
+            + last_size.to_bytes(block_size, "big"))
+
+def _to_pairs(encrypted: list[tuple[int, int]], block_size: int) -> list[tuple[int, bytes]]:
+    return [(C1, C2.to_bytes(block_size + 1, 'big')) for C1, C2 in encrypted]
+
+def _encrypt_messages(job: tuple) -> list[list[tuple[int, bytes]]]:
+    messages, g, pk_bob, p, block_size, q, exponent_bits = job
+    # One call for the whole chunk, so the vectorized engine sees all blocks
+    framed = [_framed(by, block_size) for by in messages]
+    encrypted = _to_pairs(elgamal_encryption((b'').join(framed), g, pk_bob, p, block_size,
+                                             q, exponent_bits), block_size)
+    results = []
+    start = 0
+    for data in framed:
+        end = start + len(data) // block_size
+        results.append(encrypted[start:end])
+        start = end
+    return results
+
+def _encrypt_for_keys(job: tuple) -> list[list[tuple[int, bytes]]]:
+    framed, g, keys, p, block_size, q, exponent_bits = job
+    if small_group.supports(p):
+        return [_to_pairs(elgamal_encryption(framed, g, pk_bob, p, block_size, q, exponent_bits),
+                          block_size) for pk_bob in keys]
+    blocks = blocks_from_bytes(framed, block_size)
+    return [_to_pairs(_encrypt_blocks(blocks, g, pk_bob, p, q, exponent_bits), block_size)
+            for pk_bob in keys]
+
+def elgamal_encrypt_many(messages: Iterable[bytes], g: int, pk_bob: int, p: int,
+                         q: int = None, exponent_bits: int = None, executor=None,
+                         workers: int = None, chunk_size: int = 64
+                         ) -> list[list[tuple[int, bytes]]]:
+    '''
+    Encrypts several messages for the same receiver. Same format as calling
+    elgamal_encrypt for each message, but the blocks of a chunk of messages
+    are encrypted in one call
+    Parameters
+    ----------
+    messages : Iterable[bytes]
+        Messages to be encrypted
+    g : int
+        Generator for G = Z/pZ*
+    pk_bob : int
+        Public key of Bob
+    p : int
+        Prime number
+    q : int
+        Order of the subgroup generated by g, optional
+    exponent_bits : int
+        Size of the short ephemeral keys, optional
+    executor : concurrent.futures.Executor
+        Pool to run the encryptions in, optional. See funcs.map_ordered
+    workers : int
+        Size of the process pool created when no executor is given, optional
+    chunk_size : int
+        Messages per job handed to a worker. The default is 64
+    Returns
+    -------
+    list[list[tuple[int, bytes]]]
+        Encrypted messages, in the same order
+    '''
+    validate_public_value(pk_bob, p, q)
+    block_size = compute_block_size(p)
+    jobs = [(chunk, g, pk_bob, p, block_size, q, exponent_bits)
+            for chunk in iter_blocks(messages, chunk_size)]
+    results = map_ordered(_encrypt_messages, jobs, executor, workers)
+    return [encrypted for chunk in results for encrypted in chunk]
+
+def elgamal_encrypt_for_recipients(by: bytes, g: int, keys: Iterable[int], p: int,
+                                   q: int = None, exponent_bits: int = None, executor=None,
+                                   workers: int = None, chunk_size: int = 16
+                                   ) -> list[list[tuple[int, bytes]]]:
+    '''
+    Encrypts the same message for several receivers of the group (p, g).
+    Same format as calling elgamal_encrypt for each key, but the message is
+    split into blocks once
+    Parameters
+    ----------
+    by : bytes
+        Message to be encrypted
+    g : int
+        Generator for G = Z/pZ*
+    keys : Iterable[int]
+        Public keys of the receivers
+    p : int
+        Prime number
+    q : int
+        Order of the subgroup generated by g, optional
+    exponent_bits : int
+        Size of the short ephemeral keys, optional
+    executor : concurrent.futures.Executor
+        Pool to run the encryptions in, optional. See funcs.map_ordered
+    workers : int
+        Size of the process pool created when no executor is given, optional
+    chunk_size : int
+        Keys per job handed to a worker. The default is 16
+    Returns
+    -------
+    list[list[tuple[int, bytes]]]
+        Encrypted messages, in the same order as the keys
+    '''
+    keys = [validate_public_value(pk_bob, p, q) for pk_bob in keys]
+    block_size = compute_block_size(p)
+    framed = _framed(by, block_size)
+    jobs = [(framed, g, chunk, p, block_size, q, exponent_bits)
+            for chunk in iter_blocks(keys, chunk_size)]
+    results = map_ordered(_encrypt_for_keys, jobs, executor, workers)
+    return [encrypted for chunk in results for encrypted in chunk]
+
+def main():
+    # Generate p, g and public key
+    #p, g, k= diffie_primes(32)
+    #my_pk, ai = elgamal_keygen(p, g)
+
+    # Public key
+    p = 28499
+    g = 14249
+    my_pk = 14249
+
+    # My Private key
+    ai = 44637
+    
+    print("p: {}".format(p))
+    print("g: {}".format(g))
+    print("My Public Key: {}".format(my_pk))
+    print("My Private Key: {}".format(ai))
+
+    # Bob's public key
+    p_bob = 68507
+    g_bob = 64136
+    pk_bob = 44370
+    
+    # Message and encoded message
+    my_message = "Hola muy buenas. Saludos desde mi casa"
+    print("My message: {}".format(my_message))
+    my_message_encoded = my_message.encode('utf-8')
+    
+    bob_encoded_message = [(9724, b'\x01\x02\xeb'), (65831, b'\x00\xa1('), (46342, b'\x00\xf1\x02'), (64677, b'\x00\x944'), (48420, b'\x00x\xcd'), (41638, b'\x00\x03\xe8'), (58577, b'\x00}\xd8'), (38141, b'\x00\x7f\xa0'), (38872, b'\x00\x98\x8f'), (29880, b'\x00\x82\xd1'), (33541, b'\x00\xb6\x00'), (51857, b'\x00\x14\xd7'), (45537, b'\x00\x7f\xb5'), (28820, b'\x00\xd2\xf4'), (48484, b'\x01\x04\xc8'), (23053, b'\x00 R'), (37668, b'\x00\x18\xab'), (37723, b'\x00\xf7:'), (23084, b'\x00\xae\xa5')]
+    
+    # Encrypt and decrypt a message
+    encrypted = elgamal_encrypt(my_message_encoded, g_bob, pk_bob, p_bob)
+    print("Encrypted: "+str(encrypted))
+
+    decrypted = elgamal_decrypt(bob_encoded_message, p_bob, ai)
+    message = decrypted.decode('utf-8')
+    print("Bob Message Decrypted: "+str(message))
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
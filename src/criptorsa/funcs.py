@@ -0,0 +1,1482 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Nov  8 12:08:58 2022
+
+@author: David
+"""
+from typing import Iterable, Callable, NamedTuple
+from functools import lru_cache, partial
+import hashlib
+import math
+import os
+import sys
+import threading
+import time
+import weakref
+
+
+class Backend(NamedTuple):
+    '''
+    Big integer arithmetic implementation used by power_mod, product_mod
+    and multiplicative_inverse. Every function must return builtin ints.
+    '''
+    name: str
+    power_mod: Callable[[int, int, int], int]
+    product_mod: Callable[[int, int, int], int]
+    inverse: Callable[[int, int], int]
+
+
+def _python_backend() -> Backend:
+    return Backend("python", pow, lambda a, b, m: (a * b) % m,
+                   lambda number, m: pow(number, -1, m))
+
+
+def _gmpy2_backend() -> Backend:
+    import gmpy2
+    mpz = gmpy2.mpz
+
+    def inverse(number, m):
+        try:
+            return int(gmpy2.invert(number, m))
+        except ZeroDivisionError:
+            # Same error as the builtin pow
+            raise ValueError("base is not invertible for the given modulus")
+
+    def gmpy2_power_mod(base, exp, m):
+        if exp < 0:
+            return int(gmpy2.powmod(inverse(base, m), -exp, m))
+        return int(gmpy2.powmod(base, exp, m))
+
+    return Backend("gmpy2", gmpy2_power_mod,
+                   lambda a, b, m: int(mpz(a) * b % m), inverse)
+
+
+# Loaders in order of preference. A loader raises ImportError if the
+# implementation is not installed
+BACKEND_LOADERS = {
+    "gmpy2": _gmpy2_backend,
+    "python": _python_backend,
+}
+BACKEND_ENV_VAR = "CRIPTORSA_BACKEND"
+# Serializes the selection of the backend, so that the lazy placeholder
+# loads it once even if the first operations come from several threads
+_backend_lock = threading.Lock()
+
+
+def register_backend(name: str, loader: Callable[[], Backend]):
+    '''
+    Register a new arithmetic backend, with the lowest preference
+
+    Parameters
+    ----------
+    name : str
+        Name of the backend
+    loader : Callable[[], Backend]
+        Function that builds the backend. Raises ImportError if it is not
+        available
+    '''
+    BACKEND_LOADERS[name] = loader
+
+
+def available_backends() -> list[str]:
+    '''
+    Names of the backends that can be loaded, in order of preference
+    '''
+    names = []
+    for name, loader in BACKEND_LOADERS.items():
+        try:
+            loader()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def set_backend(name: str = None) -> Backend:
+    '''
+    Select the arithmetic backend.
+
+    Parameters
+    ----------
+    name : str, optional
+        Name of the backend. If None, the one in the CRIPTORSA_BACKEND
+        environment variable is used, or the first available one if it is
+        not set.
+
+    Returns
+    -------
+    Backend
+        The selected backend
+    '''
+    global _backend
+    name = name or os.environ.get(BACKEND_ENV_VAR)
+    if name is not None and name not in BACKEND_LOADERS:
+        raise ValueError("Unknown backend {}, expected one of {}"
+                         .format(name, list(BACKEND_LOADERS)))
+    with _backend_lock:
+        if name is not None:
+            _backend = BACKEND_LOADERS[name]()
+            return _backend
+        for loader in BACKEND_LOADERS.values():
+            try:
+                _backend = loader()
+            except ImportError:
+                continue
+            return _backend
+    raise ImportError("No arithmetic backend available")
+
+
+def get_backend() -> Backend:
+    '''
+    Return the arithmetic backend in use
+    '''
+    if _backend is _LAZY_BACKEND:
+        return set_backend()
+    return _backend
+
+
+def _lazy_backend() -> Backend:
+    # Placeholder installed at import time, so that gmpy2 is only imported
+    # by the first operation. It selects the backend and forwards the call
+    def forward(field):
+        def call(*args):
+            # Another thread may have selected the backend in the meantime
+            backend = _backend if _backend is not _LAZY_BACKEND else set_backend()
+            return getattr(backend, field)(*args)
+        return call
+    return Backend("lazy", forward("power_mod"), forward("product_mod"), forward("inverse"))
+
+
+def coprimes(a: int, b: int) -> bool:
+    '''
+    Tests whether a and b are coprimes
+
+    Parameters
+    ----------
+    a : int
+        A number.
+    b : int
+        Another number.
+
+    Returns
+    -------
+    bool
+        True if a and b are coprimes, False otherwise.
+    '''
+    return math.gcd(a, b) == 1
+
+def iter_blocks(iterable: Iterable, n: int):
+    '''
+    Generator that returns blocks of size n from iterable. The last block may
+    be truncated if the length of the iterable is not divisible by n
+
+    Parameters
+    ----------
+    iterable : Iterable
+        An iterable
+    n : int
+        Block size.
+
+    Returns
+    -------
+    A generator that produces the blocks.
+
+    '''
+    if n <= 0:
+        raise ValueError("n must be greater than 0")
+    acum = []
+    for elem in iterable:
+        acum.append(elem)
+        if len(acum) == n:
+            yield acum
+            acum = []
+    if acum:
+        yield acum
+
+
+# Kinds of pool created by parallel_executor
+EXECUTION_MODES = ("threads", "processes")
+EXECUTION_ENV_VAR = "CRIPTORSA_EXECUTION"
+
+
+def free_threaded() -> bool:
+    '''
+    Whether the interpreter runs without the GIL (free-threaded build of
+    Python 3.13+ with the GIL actually disabled), so that threads can run
+    Python code in parallel
+    '''
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    # The GIL can be enabled again at run time (PYTHON_GIL=1, or an
+    # extension module not marked as free-threading safe)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+def execution_mode(mode: str = None) -> str:
+    '''
+    Kind of pool used to parallelize the operations.
+
+    Parameters
+    ----------
+    mode : str, optional
+        "threads" or "processes". If None, the one in the
+        CRIPTORSA_EXECUTION environment variable is used, or "threads" on a
+        free-threaded interpreter and "processes" elsewhere if it is not set
+
+    Returns
+    -------
+    str
+        The selected mode
+    '''
+    mode = mode or os.environ.get(EXECUTION_ENV_VAR)
+    if mode is None:
+        return "threads" if free_threaded() else "processes"
+    if mode not in EXECUTION_MODES:
+        raise ValueError("Unknown execution mode {}, expected one of {}"
+                         .format(mode, list(EXECUTION_MODES)))
+    return mode
+
+
+def parallel_executor(workers: int = None, mode: str = None):
+    '''
+    Create a pool of workers of the kind selected by execution_mode.
+
+    Threads share the memory of the caller and start immediately, but only
+    run Python code in parallel without the GIL. Processes do it with the
+    GIL too, at the cost of starting them and pickling every job and
+    result
+
+    Parameters
+    ----------
+    workers : int, optional
+        Number of workers. The default is os.cpu_count()
+    mode : str, optional
+        "threads" or "processes", see execution_mode
+
+    Returns
+    -------
+    concurrent.futures.Executor
+        The pool, to be shut down by the caller
+    '''
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+    if execution_mode(mode) == "threads":
+        return ThreadPoolExecutor(max_workers=workers)
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+def map_ordered(func: Callable, jobs: Iterable, executor=None, workers: int = None,
+                mode: str = None) -> list:
+    '''
+    list(map(func, jobs)), run across a pool of workers. Results keep the
+    order of the jobs
+
+    Parameters
+    ----------
+    func : Callable
+        Function applied to each job. It must be picklable (defined at
+        module level) when run in a process pool
+    jobs : Iterable
+        Arguments of each call
+    executor : concurrent.futures.Executor, optional
+        Pool to run the jobs in. The default is None
+    workers : int, optional
+        Without an executor, number of workers of a pool created for this
+        call. The default is None, run the jobs in the calling thread
+    mode : str, optional
+        Kind of pool created for this call, see execution_mode. The default
+        is None, threads on a free-threaded interpreter and processes
+        elsewhere
+
+    Returns
+    -------
+    list
+        The results
+    '''
+    if executor is not None:
+        return list(executor.map(func, jobs))
+    if workers is None or workers <= 1:
+        return list(map(func, jobs))
+    with parallel_executor(workers, mode) as pool:
+        return list(pool.map(func, jobs))
+    
+
+def power_mod(base: int, exp: int, m: int) -> int:
+    '''
+    Compute (base ** exp) % m
+
+    Parameters
+    ----------
+    base : int
+        Base
+    power : int
+        Exponent
+    m : int
+        Modulo
+
+    Returns
+    -------
+    int
+        Result
+    '''
+    return _backend.power_mod(base, exp, m)
+
+def product_mod(a: int, b: int, m:int) -> int:
+    '''
+    Returns (a * b) % m
+
+    Parameters
+    ----------
+    a : int
+        Factor 1.
+    b : int
+        Factor 2.
+    m : int
+        Modulo.
+
+    Returns
+    -------
+    int
+        The product of a and b modulo m
+
+    '''
+    return _backend.product_mod(a, b, m)
+
+def multiplicative_inverse(number: int, m: int = None) -> int:
+    '''
+    Computes (number ** -1) % modulo
+
+    Parameters
+    ----------
+    number : int
+        Number.
+    modulo : int, optional
+        The modulo. The default is None.
+
+    Returns
+    -------
+    int
+        The multiplicative inverse of number in modulo m
+
+    '''
+    return _backend.inverse(number, m)
+
+def blocks_from_bytes(by: bytes, block_size: int) -> list:
+    '''
+    Transform text to a list of numeric blocks, based on number of bits in the
+    key in order to encrypted.
+
+    Parameters
+    ----------
+    by : bytes
+        Plain text
+    block_size : int
+        Number of bytes per block
+
+    Returns
+    -------
+    list
+        A list of numeric blocks in which the plain text is encoded
+    '''
+    if block_size <= 0:
+        raise ValueError("Block size must be an integer greater than zero")
+        
+    return [block_from_bytes(byte_block) 
+            for byte_block in iter_blocks(by, block_size)]
+    
+
+def bitlength(n: int) -> int:
+    '''
+    Return the number of bits required to represent n
+
+    Parameters
+    ----------
+    n : int
+        number
+
+    Returns
+    -------
+    int
+        Number of bits to represent n
+    '''
+    return n.bit_length()
+
+
+def compute_block_size(n: int) -> int:
+    '''
+    Computes the block size in bytes to be encrypted by RSA given the public
+    modulus n.
+    
+    We want to compute blocks bytewise for simplicity, but RSA demands that the
+    message be lower than n so the blocks to be encrypted must be of byte size
+    such that the maximum representable value is lower than n.
+    
+    Conversely, the size of the already encrypted blocks in bytes must be such
+    that it should accomodate any possible value in modulo n.
+    
+    In addition, we cannot use bytes_from_block since we want all blocks to be
+    of the same size to make decryption more convenient
+    
+    For example in the length in bits of n is 12:
+        Maximum representable value: 2 ** 12 - 1
+        Minimum value: 2 ** 11 (The length in bits accounts for active bits)
+        
+        Since we want to work with bytes the blocks to be encoded as integers
+        must have a maximum value lower than the minumum value. Therefore we select
+        a block (byte) size of 1 since 2 ** 8 - 1 < 2 ** 11
+        
+        Once we have encrypted the blocks, they hold any value up to n - 1
+        since we are working modulo n.
+        We need an amount of bytes that can hold such a value. In this case
+        it would be 2, since 2 ** 16 - 1 > n
+        
+    The size of the encrypted blocks will be block_size(n) + 1
+    
+    Parameters
+    ----------
+    n : int
+        Public modulus
+
+    Returns
+    -------
+    int
+        The block size in bytes
+    '''
+    quotient, remainder = divmod(bitlength(n), 8)
+    # If the bitlength of n is divisible by 8 we get an exact number of bytes
+    # But there still is a possibility of getting a block value greater than n
+    # so we restrict the block size to be a byte lower
+    if remainder == 0:
+        quotient -= 1
+    return quotient
+
+
+def miller_rabin(w: int, k: int = 10) -> bool:
+    '''
+    Computes the Miller-Rabin primality test for n. k is the number of rounds
+    to be executed, a greater number increases the probability that n is actually
+    prime is the test is positive.
+
+    Parameters
+    ----------
+    w : int
+        Number to be tested for primality.
+    k : int, optional
+        Number of rounds of the algorithm. The default is 32.
+
+    Returns
+    -------
+    bool: whether n passes the test
+    '''
+    if w in [2, 3, 5, 7]:
+        return True
+    # If n is divisible by two do not bother with the algorithm: it is not prime
+    if w % 2 == 0:
+        return False
+    a, m = _decompose(w)
+
+    # Witnesses in [2, w - 2]
+    for b in random_many(2, w - 1, k):
+        if not _strong_witness(b, w, a, m):
+            return False
+    return True
+
+
+def _decompose(w: int) -> tuple[int, int]:
+    '''
+    Write w - 1 as 2 ** a * m with m odd and return (a, m)
+    '''
+    a = 0
+    m = w - 1
+    while m % 2 == 0:
+        a += 1
+        m //= 2
+    return a, m
+
+
+def _strong_witness(b: int, w: int, a: int, m: int) -> bool:
+    '''
+    One round of Miller-Rabin: whether the odd number w = 2 ** a * m + 1 is
+    a strong probable prime to base b
+    '''
+    z = power_mod(b, m, w)
+    if z == 1 or z == w - 1:
+        return True
+    i = 0
+    while i < a - 1 and z != 1:
+        z = power_mod(z, 2, w)
+        if z == w - 1:
+            return True
+        i += 1
+    return False
+
+
+# Bounds below which testing the bases is a deterministic primality proof
+# (Jaeschke; Jiang and Deng; Sorenson and Webster)
+DETERMINISTIC_BASES = [
+    (2047, (2,)),
+    (1373653, (2, 3)),
+    (25326001, (2, 3, 5)),
+    (3215031751, (2, 3, 5, 7)),
+    (2152302898747, (2, 3, 5, 7, 11)),
+    (3474749660383, (2, 3, 5, 7, 11, 13)),
+    (341550071728321, (2, 3, 5, 7, 11, 13, 17)),
+    (3825123056546413051, (2, 3, 5, 7, 11, 13, 17, 19, 23)),
+    (318665857834031151167461, (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)),
+    (3317044064679887385961981, (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)),
+]
+
+SMALL_PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53,
+                59, 61, 67, 71, 73, 79, 83, 89, 97, 101, 103, 107, 109, 113,
+                127, 131, 137, 139, 149, 151, 157, 163, 167, 173, 179, 181,
+                191, 193, 197, 199, 211, 223, 227, 229, 233, 239, 241, 251)
+
+
+def deterministic_miller_rabin(w: int) -> bool:
+    '''
+    Miller-Rabin test with a fixed set of bases that makes the result exact
+    for w < 3317044064679887385961981 (about 3.3e24)
+
+    Parameters
+    ----------
+    w : int
+        Odd number greater than 2 to be tested for primality
+
+    Returns
+    -------
+    bool: whether w is prime
+    '''
+    for bound, bases in DETERMINISTIC_BASES:
+        if w < bound:
+            break
+    else:
+        raise ValueError("No deterministic set of bases for {}".format(w))
+    a, m = _decompose(w)
+    return all(b % w == 0 or _strong_witness(b, w, a, m) for b in bases)
+
+
+def jacobi(a: int, n: int) -> int:
+    '''
+    Compute the Jacobi symbol (a / n) for an odd positive n
+
+    Parameters
+    ----------
+    a : int
+        Numerator
+    n : int
+        Odd positive denominator
+
+    Returns
+    -------
+    int
+        -1, 0 or 1
+    '''
+    a %= n
+    result = 1
+    while a:
+        while a % 2 == 0:
+            a //= 2
+            if n % 8 in (3, 5):
+                result = -result
+        a, n = n, a
+        if a % 4 == 3 and n % 4 == 3:
+            result = -result
+        a %= n
+    return result if n == 1 else 0
+
+
+def strong_lucas(w: int) -> bool:
+    '''
+    Strong Lucas probable prime test with Selfridge's parameters
+    (method A: P = 1, Q = (1 - D) / 4 with D the first of 5, -7, 9, -11, ...
+    such that (D / w) = -1)
+
+    Parameters
+    ----------
+    w : int
+        Odd number greater than 2 to be tested for primality
+
+    Returns
+    -------
+    bool: whether w is a strong Lucas probable prime
+    '''
+    # No valid D exists for perfect squares
+    if math.isqrt(w) ** 2 == w:
+        return False
+    D = 5
+    while True:
+        j = jacobi(D, w)
+        if j == -1:
+            break
+        if j == 0 and abs(D) != w:
+            return False
+        D = -D - 2 if D > 0 else -D + 2
+    P = 1
+    Q = (1 - D) // 4
+
+    # w + 1 = 2 ** s * d with d odd
+    s = 0
+    d = w + 1
+    while d % 2 == 0:
+        s += 1
+        d //= 2
+
+    def half(x):
+        # x / 2 mod w
+        return (x if x % 2 == 0 else x + w) // 2 % w
+
+    # Left to right binary computation of U_d, V_d and Q ** d
+    U, V, Qk = 1, P, Q % w
+    for bit in bin(d)[3:]:
+        U, V = product_mod(U, V, w), (V * V - 2 * Qk) % w
+        Qk = product_mod(Qk, Qk, w)
+        if bit == "1":
+            U, V = half(P * U + V), half(D * U + P * V)
+            Qk = product_mod(Qk, Q, w)
+    if U == 0 or V == 0:
+        return True
+    for _ in range(s - 1):
+        V = (V * V - 2 * Qk) % w
+        if V == 0:
+            return True
+        Qk = product_mod(Qk, Qk, w)
+    return False
+
+
+def baillie_psw(w: int) -> bool:
+    '''
+    Baillie-PSW primality test: a strong probable prime test to base 2
+    followed by a strong Lucas test. No composite passing it is known.
+
+    Parameters
+    ----------
+    w : int
+        Odd number greater than 2 to be tested for primality
+
+    Returns
+    -------
+    bool: whether w passes the test
+    '''
+    a, m = _decompose(w)
+    return _strong_witness(2, w, a, m) and strong_lucas(w)
+
+
+PRIMALITY_ENGINES = ("miller_rabin", "bpsw", "deterministic")
+
+
+def is_probable_prime(w: int, k: int = 10, engine: str = "miller_rabin") -> bool:
+    '''
+    Primality test with a selectable engine. Every engine first discards
+    multiples of small primes by trial division.
+
+    Engines:
+        miller_rabin: k rounds of Miller-Rabin with random bases.
+        bpsw: Baillie-PSW, which replaces the k rounds by one strong test to
+            base 2 and a strong Lucas test.
+        deterministic: deterministic bases for w < 3.3e24, which give an
+            exact answer. Larger numbers use Baillie-PSW.
+
+    Parameters
+    ----------
+    w : int
+        Number to be tested for primality.
+    k : int, optional
+        Number of rounds for the miller_rabin engine. The default is 10.
+    engine : str, optional
+        Name of the engine. The default is "miller_rabin".
+
+    Returns
+    -------
+    bool: whether w passes the test
+    '''
+    if engine not in PRIMALITY_ENGINES:
+        raise ValueError("Unknown primality engine {}, expected one of {}"
+                         .format(engine, PRIMALITY_ENGINES))
+    if w < 2:
+        return False
+    for prime in SMALL_PRIMES:
+        if w % prime == 0:
+            return w == prime
+    if w < SMALL_PRIMES[-1] ** 2:
+        return True
+    if engine == "miller_rabin":
+        return miller_rabin(w, k)
+    if engine == "deterministic" and w < DETERMINISTIC_BASES[-1][0]:
+        return deterministic_miller_rabin(w)
+    return baillie_psw(w)
+
+
+@lru_cache(maxsize=None)
+def estimate_k(bits: int, error : float = 2 ** -128) -> int:
+    '''
+    Compute the number of iterations of Miller-Rabin necessary to get a 
+    probability of having a composite number with bits bits 
+    passing the test lower than error.
+
+    Parameters
+    ----------
+    bits : int
+        Number of bits of the number to be tested
+    error : TYPE, optional
+        Upper bound on the probability of a composite number passing the test.
+        The default is 2 ** -128.
+
+    Returns
+    -------
+    int
+        Number of iterations of Miller-Rabin.
+    '''
+    # Only needed here, so it stays out of the import time of the package
+    from decimal import Decimal
+
+    max_t = math.ceil(- math.log2(error) / 2)
+    max_m = math.floor(2 * math.sqrt(bits - 1) - 1)
+    first = Decimal(2.00743 * math.log(2) * bits) * pow(Decimal(2), -bits)
+    factor = (
+        Decimal(8 * (math.pi ** 2 - 6) / 3) * pow(Decimal(2), bits - 2)
+    )
+    # The sums over j only depend on m, and the sum over m for M + 1 is the
+    # one for M plus a term, so nothing is computed twice. Same terms added
+    # in the same order as the plain formula, so the results are identical
+    inner = {
+        m: sum(
+            Decimal(1 / Decimal(2) ** Decimal(j + (bits - 1) / j))
+            for j in range(2, m + 1)
+        )
+        for m in range(3, max_m)
+    }
+    for t in range(1, max_t):
+        summatory = 0
+        for M in range(3, max_m):
+            summatory += Decimal(2 ** (M - (M - 1) * t)) * inner[M]
+            summand = pow(Decimal(2), bits - 2 - M * t) 
+            
+            estimate = first * (summand + factor * summatory)
+            if estimate < error:
+                return t
+    return max_t
+
+class RandomSource:
+    '''
+    CSPRNG serving random integers from large os.urandom buffers, so that
+    drawing candidates, witnesses and ephemeral keys does not cost one
+    system call each. It is thread safe, and a forked child discards the
+    buffer it inherited so it never repeats the parent's numbers.
+
+    With a seed it becomes a deterministic generator (SHAKE-256 of the seed
+    and a counter), meant for reproducible benchmarks only: the stream is
+    fully determined by the seed.
+
+    Parameters
+    ----------
+    buffer_size : int, optional
+        Bytes read from the OS at a time. The default is 4096
+    seed : bytes | int | str, optional
+        Seed of the deterministic mode. The default is None, os.urandom
+    '''
+
+    def __init__(self, buffer_size: int = 4096, seed=None):
+        self.buffer_size = buffer_size
+        self._lock = threading.Lock()
+        self.seed(seed)
+        _random_sources.add(self)
+
+    def seed(self, seed=None):
+        '''
+        Switch to the deterministic mode with the given seed, or back to
+        os.urandom if seed is None
+        '''
+        if isinstance(seed, int):
+            seed = seed.to_bytes((seed.bit_length() + 8) // 8, "big", signed=True)
+        elif isinstance(seed, str):
+            seed = seed.encode()
+        with self._lock:
+            self._seed = seed
+            self._counter = 0
+            self._buffer = b''
+            self._position = 0
+
+    def _refill(self, n: int):
+        size = max(n, self.buffer_size)
+        if self._seed is None:
+            self._buffer = os.urandom(size)
+        else:
+            self._counter += 1
+            self._buffer = hashlib.shake_256(
+                self._seed + self._counter.to_bytes(8, "big")).digest(size)
+        self._position = 0
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        if self._seed is None:
+            self._buffer = b''
+            self._position = 0
+
+    def randbytes(self, n: int) -> bytes:
+        '''
+        n random bytes
+        '''
+        with self._lock:
+            start = self._position
+            end = start + n
+            if end > len(self._buffer):
+                self._refill(n)
+                start, end = 0, n
+            self._position = end
+            return self._buffer[start:end]
+
+    def randbits(self, k: int) -> int:
+        '''
+        Random integer with k random bits
+        '''
+        if k <= 0:
+            return 0
+        nbytes = (k + 7) >> 3
+        # Same as randbytes, inlined since this is the hot path
+        with self._lock:
+            start = self._position
+            end = start + nbytes
+            if end > len(self._buffer):
+                self._refill(nbytes)
+                start, end = 0, nbytes
+            self._position = end
+            chunk = self._buffer[start:end]
+        return int.from_bytes(chunk, "big") >> ((nbytes << 3) - k)
+
+    def randbelow(self, n: int) -> int:
+        '''
+        Uniform random integer in [0, n)
+        '''
+        if n <= 0:
+            raise ValueError("n must be greater than 0")
+        k = (n - 1).bit_length()
+        # Rejection sampling, fewer than two draws on average
+        r = self.randbits(k)
+        while r >= n:
+            r = self.randbits(k)
+        return r
+
+    def randrange(self, low: int, high: int) -> int:
+        '''
+        Uniform random integer in [low, high)
+        '''
+        return low + self.randbelow(high - low)
+
+    def randrange_many(self, low: int, high: int, count: int) -> list[int]:
+        '''
+        count uniform random integers in [low, high), cut from a single
+        draw of bytes. Much cheaper per value than calling randrange
+        '''
+        n = high - low
+        if n <= 0:
+            raise ValueError("Empty range")
+        k = (n - 1).bit_length()
+        nbytes = (k + 7) >> 3
+        shift = (nbytes << 3) - k
+        data = self.randbytes(nbytes * count)
+        values = [int.from_bytes(data[i:i + nbytes], "big") >> shift
+                  for i in range(0, nbytes * count, nbytes)]
+        # Rejected values are drawn again one by one
+        return [low + (r if r < n else self.randbelow(n)) for r in values]
+
+
+_random_sources = weakref.WeakSet()
+
+
+def _reset_random_after_fork():
+    for source in list(_random_sources):
+        source._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_random_after_fork)
+
+# Randomness used by every module of the portfolio
+_random = RandomSource()
+
+
+def seed_random(seed=None):
+    '''
+    Make the shared random source deterministic (for benchmarks), or back
+    to os.urandom with seed None. See RandomSource
+    '''
+    _random.seed(seed)
+
+
+def random_bytes(n: int) -> bytes:
+    '''
+    n random bytes from the shared random source
+    '''
+    return _random.randbytes(n)
+
+
+def random_bits(k: int) -> int:
+    '''
+    Random integer with k bits from the shared random source
+    '''
+    return _random.randbits(k)
+
+
+def random_below(n: int) -> int:
+    '''
+    Uniform random integer in [0, n) from the shared random source
+    '''
+    return _random.randbelow(n)
+
+
+def random_in_range(low: int, high: int) -> int:
+    '''
+    Uniform random integer in [low, high) from the shared random source
+    '''
+    return _random.randrange(low, high)
+
+
+def random_many(low: int, high: int, count: int) -> list[int]:
+    '''
+    count uniform random integers in [low, high) from the shared random
+    source, see RandomSource.randrange_many
+    '''
+    return _random.randrange_many(low, high, count)
+
+
+def random_odd_number_nbits(nbits: int) -> Callable[[], int]:
+    '''
+    Returns a function that takes no arguments and returns a random odd number
+    with nbits number of bits
+
+    Parameters
+    ----------
+    nbits : int
+        Number of bits
+
+    Returns
+    -------
+    (Callable[[], int])
+        Function that returns a random number
+    '''
+    return lambda: random_bits(nbits) | 1
+
+def random_number_range(low : int , high : int = None) -> Callable[[], int]:
+    '''
+    Returns a function that takes no arguments and returns a random number
+    in a range.
+    
+    if only low is passed the range is [0, low)
+    if low and high are passed the range is [low, high)
+
+    Parameters
+    ----------
+    low : TYPE, optional
+        The minimum value or the max if high is not passed. The default is None.
+    high : TYPE, optional
+        The high value. The default is None.
+
+    Returns
+    -------
+    (Callable[[], int])
+        The function that returns the random odd number in range
+    '''
+    if high is None:
+        high = low
+        low = 0
+    return lambda: random_in_range(low, high)
+
+
+def prime_lower_bound(nbits: int) -> int:
+    '''
+    Smallest integer not lower than 2 ** (nbits - 1) * sqrt(2), the lower
+    bound of NIST (FIPS 186-5, A.1.3) for the primes of a RSA modulus
+
+    Parameters
+    ----------
+    nbits : int
+        Number of bits of the prime
+
+    Returns
+    -------
+    int
+        The bound, computed exactly with integers
+    '''
+    # 2 ** (2 * nbits - 1) has an odd exponent, so it is never a square
+    return math.isqrt(2 ** (2 * nbits - 1)) + 1
+
+
+@lru_cache(maxsize=None)
+def sieve_primes(limit: int) -> tuple[int, ...]:
+    '''
+    Odd primes lower than limit (sieve of Eratosthenes)
+    '''
+    sieve = bytearray([1]) * limit
+    sieve[:2] = b'\x00\x00'
+    for i in range(2, math.isqrt(limit - 1) + 1):
+        if sieve[i]:
+            sieve[i * i::i] = bytes(len(range(i * i, limit, i)))
+    return tuple(i for i in range(3, limit) if sieve[i])
+
+
+class CandidateSampler:
+    '''
+    Callable returning odd prime candidates in [low, 2 ** nbits), to be used
+    as the generator_func of random_probable_prime.
+
+    Candidates are walked incrementally from a random start through a
+    window of odd numbers sieved with the small primes, so only one random
+    number is drawn per window and most composites never reach the
+    primality test. When a window is exhausted the walk goes on with the
+    next one, and restarts from a new random point at the end of the range.
+
+    Parameters
+    ----------
+    nbits : int
+        Number of bits of the candidates
+    low : int, optional
+        Lower bound of the candidates. The default is None,
+        prime_lower_bound(nbits)
+    e : int, optional
+        Candidates c with c - 1 not coprime with e are skipped. For a prime
+        e that is the residue constraint c % e != 1, applied in the sieve.
+        The default is None
+    window : int, optional
+        Number of odd numbers per window. The default is 4096
+    sieve_limit : int, optional
+        Small primes lower than this value are sieved. The default is 8192
+    '''
+
+    def __init__(self, nbits: int, low: int = None, e: int = None,
+                 window: int = 4096, sieve_limit: int = 8192):
+        self.low = prime_lower_bound(nbits) if low is None else low
+        self.high = 2 ** nbits
+        if self.low >= self.high:
+            raise ValueError("Empty range of candidates")
+        self.e = e
+        # Only a prime e turns the gcd into a single residue
+        self.e_residue = e is not None and e > 2 and is_probable_prime(e, engine="bpsw")
+        self.window = window
+        self.small_primes = sieve_primes(sieve_limit)
+        self.start = None
+        self._pending = iter(())
+
+    def _sieve(self, start: int) -> list[int]:
+        size = min(self.window, (self.high - start + 1) // 2)
+        sieve = bytearray([1]) * size
+        constraints = [(q, 0) for q in self.small_primes if q < start]
+        if self.e_residue:
+            constraints.append((self.e, 1))
+        for q, residue in constraints:
+            # First i with start + 2 * i = residue (mod q), using that the
+            # inverse of 2 is (q + 1) / 2
+            i = (residue - start) * ((q + 1) // 2) % q
+            if i < size:
+                sieve[i::q] = bytes(len(range(i, size, q)))
+        return [start + 2 * i for i in range(size) if sieve[i]]
+
+    def __call__(self) -> int:
+        while True:
+            for candidate in self._pending:
+                if self.e is None or self.e_residue or coprimes(candidate - 1, self.e):
+                    return candidate
+            if self.start is None or self.start >= self.high:
+                self.start = random_in_range(self.low, self.high) | 1
+            self._pending = iter(self._sieve(self.start))
+            self.start += 2 * self.window
+
+
+class GenerationCancelled(Exception):
+    '''
+    A generation was cancelled through its CancelToken
+    '''
+
+
+class GenerationTimeout(GenerationCancelled, TimeoutError):
+    '''
+    A generation ran past its deadline
+    '''
+
+
+class CancelToken:
+    '''
+    Cancellation token for key and parameter generation. Any thread can
+    cancel it, and it also expires at its deadline. Generators check it
+    between candidates
+
+    Parameters
+    ----------
+    timeout : float, optional
+        Seconds from now to the deadline. The default is None, no deadline
+    event : threading.Event | multiprocessing.Event, optional
+        Event that cancels the token when set. A multiprocessing one lets a
+        process cancel generations running in others. The default is None,
+        a new threading.Event
+    '''
+
+    def __init__(self, timeout: float = None, event=None):
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        self._cancelled = event if event is not None else threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def remaining(self) -> float | None:
+        '''
+        Seconds left to the deadline, None without deadline
+        '''
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def check(self):
+        '''
+        Raise GenerationCancelled if the token was cancelled, or
+        GenerationTimeout if its deadline has passed
+        '''
+        if self._cancelled.is_set():
+            raise GenerationCancelled("Generation cancelled")
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise GenerationTimeout("Generation ran past its deadline")
+
+
+class GenerationProgress(NamedTuple):
+    '''
+    What a progress callback receives: the current phase of the generation,
+    candidates tried so far (over every phase), seconds since it started
+    and candidates per second
+    '''
+    phase: str
+    candidates: int
+    elapsed: float
+    rate: float
+
+
+class GenerationMonitor:
+    '''
+    Deadline, cancellation and progress reporting of one generation, shared
+    by the functions it calls so that the candidates add up
+
+    Parameters
+    ----------
+    deadline : float | CancelToken, optional
+        Seconds of budget, or a token. The default is None
+    progress : Callable[[GenerationProgress], None], optional
+        Called when the phase changes, at most every interval seconds in
+        between and once more at the end, with phase "done"
+    interval : float, optional
+        Minimum seconds between progress reports. The default is 0.5
+    '''
+
+    def __init__(self, deadline: float | CancelToken = None,
+                 progress: Callable[[GenerationProgress], None] = None,
+                 interval: float = 0.5):
+        self.token = deadline if isinstance(deadline, CancelToken) or deadline is None \
+            else CancelToken(deadline)
+        self.progress = progress
+        self.interval = interval
+        self.phase = None
+        self.candidates = 0
+        self.start = time.monotonic()
+        self._reported = self.start
+
+    def set_phase(self, phase: str):
+        self.phase = phase
+        self.report()
+
+    def step(self):
+        '''
+        Count a candidate, check the token and report if it is time
+        '''
+        self.candidates += 1
+        self.check()
+        if self.progress is not None and time.monotonic() - self._reported >= self.interval:
+            self.report()
+
+    def check(self):
+        if self.token is not None:
+            self.token.check()
+
+    def report(self):
+        if self.progress is None:
+            return
+        now = time.monotonic()
+        self._reported = now
+        elapsed = now - self.start
+        self.progress(GenerationProgress(self.phase, self.candidates, elapsed,
+                                         self.candidates / elapsed if elapsed else 0.0))
+
+    def done(self):
+        self.set_phase("done")
+
+
+def monitor(deadline=None, progress: Callable[[GenerationProgress], None] = None
+            ) -> GenerationMonitor | None:
+    '''
+    The GenerationMonitor for the deadline and progress arguments of a
+    generator: deadline itself if it already is one (the generation was
+    called by another one), None if there is nothing to monitor
+    '''
+    if isinstance(deadline, GenerationMonitor):
+        return deadline
+    if deadline is None and progress is None:
+        return None
+    return GenerationMonitor(deadline, progress)
+
+
+# Seconds a background refill waits after a failed job, doubled after every
+# consecutive failure up to the maximum
+RETRY_DELAY = 1.0
+MAX_RETRY_DELAY = 60.0
+
+
+def refill_forever(stop: threading.Event, wakeup: threading.Event,
+                   next_job: Callable[[], Callable[[], None] | None],
+                   on_error: Callable[[float], None]):
+    '''
+    Body of a background refill thread, such as the ones of
+    prime_pool.PrimePool and dh_session.EphemeralKeyPool. Runs the jobs
+    given by next_job until stop is set, and waits for wakeup when there
+    is none. A failed job does not end the loop, or the pool would never
+    be refilled again: the next one is retried after a delay that backs
+    off from RETRY_DELAY to MAX_RETRY_DELAY. A job failing once stop is
+    set, for example cancelled by it, just ends the loop
+
+    Parameters
+    ----------
+    stop : threading.Event
+        Ends the loop when set
+    wakeup : threading.Event
+        Set when a job may be pending again, for example after a take
+    next_job : Callable[[], Callable[[], None] | None]
+        Returns the next job, which generates a value and stores it, or
+        None if everything is full
+    on_error : Callable[[float], None]
+        Called from the except block of a failed job, with the seconds
+        before the next try
+    '''
+    delay = RETRY_DELAY
+    while not stop.is_set():
+        job = next_job()
+        if job is None:
+            wakeup.wait()
+            wakeup.clear()
+            continue
+        try:
+            job()
+        except Exception:
+            if stop.is_set():
+                # The job was interrupted to stop the loop
+                break
+            on_error(delay)
+            stop.wait(delay)
+            delay = min(delay * 2, MAX_RETRY_DELAY)
+            continue
+        delay = RETRY_DELAY
+
+
+def random_probable_prime(generator_func: Callable[[], int], k: int = 50, 
+                          test_func: Callable[[int], bool] = None,
+                          limit: int = 30000,
+                          engine: str = "miller_rabin",
+                          deadline = None,
+                          progress: Callable[[GenerationProgress], None] = None,
+                          executor = None, workers: int = None, mode: str = None) -> int:
+    '''
+    Generate a random prime number with a set number of bits 
+
+    Parameters
+    ----------
+    bits : int
+        Number of bits of the number
+    k: int
+        Number of iterations of Miller-Rabin test for primality
+    test_func : Callable[[int], bool], optional
+        Defines other criteria for acceptance of the random number.
+        If the returned value is False the number is discarded
+    limit : int
+        Maximum number of randomly generated numbers to be tested.
+        If no number satisfies the criteria, raise a ValueError
+    engine : str
+        Primality engine, see is_probable_prime. The default is
+        "miller_rabin"; "bpsw" and "deterministic" replace the k rounds.
+    deadline : float | CancelToken | GenerationMonitor, optional
+        Seconds of budget or a CancelToken, checked before each candidate.
+        A GenerationMonitor continues the count of an enclosing generation
+    progress : Callable[[GenerationProgress], None], optional
+        Progress callback, see GenerationMonitor
+    executor : concurrent.futures.Executor, optional
+        Pool to test the candidates in, see map_ordered. Candidates are
+        still drawn and filtered by test_func in the calling thread, and
+        the first prime in the order they were drawn is returned
+    workers : int, optional
+        Without an executor, number of workers of a pool created for this
+        call, also the number of candidates tested at once. The default is
+        None, test them one by one in the calling thread
+    mode : str, optional
+        Kind of pool created for this call, see execution_mode
+
+    Returns
+    -------
+    A random prime number of the desired number of bits
+
+    '''
+    test_func = (lambda x: True) if test_func is None else test_func
+    watch = monitor(deadline, progress)
+    if watch is not None and watch is not deadline:
+        watch.set_phase("prime")
+
+    if executor is not None or (workers is not None and workers > 1):
+        check = partial(is_probable_prime, k=k, engine=engine)
+        batch = workers or os.cpu_count() or 1
+        if executor is not None:
+            prime = _first_prime(executor, batch, generator_func, test_func, check,
+                                 limit, watch)
+        else:
+            with parallel_executor(workers, mode) as pool:
+                prime = _first_prime(pool, batch, generator_func, test_func, check,
+                                     limit, watch)
+        if watch is not None and watch is not deadline:
+            watch.done()
+        return prime
+
+    i = 0     
+    while True:
+        if watch is not None:
+            watch.step()
+        random_number = generator_func()
+        
+        if (test_func(random_number)
+                and is_probable_prime(random_number, k=k, engine=engine)):
+            if watch is not None and watch is not deadline:
+                watch.done()
+            return random_number
+        if limit is not None:
+            i += 1
+            if i > limit:
+                raise ValueError("Could not find a random number satisfying properties")
+            
+            
+
+def _first_prime(pool, batch: int, generator_func: Callable[[], int],
+                 test_func: Callable[[int], bool], check: Callable[[int], bool],
+                 limit: int, watch: GenerationMonitor) -> int:
+    # Draws batch candidates at a time and tests them in the pool
+    drawn = 0
+    while True:
+        candidates = []
+        while len(candidates) < batch and (limit is None or drawn <= limit):
+            if watch is not None:
+                watch.step()
+            candidate = generator_func()
+            drawn += 1
+            if test_func(candidate):
+                candidates.append(candidate)
+        for candidate, prime in zip(candidates, pool.map(check, candidates)):
+            if prime:
+                return candidate
+        if limit is not None and drawn > limit:
+            raise ValueError("Could not find a random number satisfying properties")
+
+
+def to_base_factors(original: int, base: int = 2 ** 8) -> list[int]:
+    '''
+    Compute the coefficients of the decomposition of original in the selected
+    base. Original is assumed to be decimal.
+    
+    The result is a list with the coefficients such that
+    original = l[0] * base ** n + l[1] * base ** (n - 1), ..., l[n] * base ** 0
+
+    Parameters
+    ----------
+    original : int
+        The decimal value to transform
+    base : int, optional
+        The target base to convert original. The default is 2 ** 8.
+
+    Returns
+    -------
+    list[int]
+        The factors
+    '''
+    factors = []
+    while original > 0:
+        original, remainder = divmod(original, base)
+        factors.insert(0, remainder)
+    return factors
+
+def from_base_factors(factors: Iterable[int], base: int = 2 ** 8) -> int:
+    '''
+    Compute decimal value from coefficients located in factors in the selected
+    base.
+    
+    The result is an integer whose value is
+    factors[0] * base ** 0 + factors[1] * base ** 1, ..., factors[n] * base ** n
+
+    Parameters
+    ----------
+    factors : Iterable[int]
+        The coefficients in the base
+    base : int, optional
+        The base of the factors. The default is 2 ** 8.
+
+    Returns
+    -------
+    int
+        The decimal value
+
+    '''
+    total = 0
+    nfactors = len(factors)
+    for i, factor in enumerate(factors):
+        total += factor * base ** (nfactors - i - 1)
+    return total
+
+
+def bytes_from_block(block: int, blocksize : int = None) -> bytes:
+    '''
+    Extract the original bytes from a numeric block.
+    Bytes are in big endian.
+
+    Parameters
+    ----------
+    block : int
+        Numeric value of a block
+    blocksize: int
+        The number of bytes in the block. Optional, default: None.
+
+    Returns
+    -------
+    bytes
+        The original bytes
+    '''
+    factors = to_base_factors(block, 2 ** 8)
+    # deal with the null byte \x00 in the leftmost byte
+    if blocksize is not None:
+        factors = [0] * (blocksize - len(factors)) + factors
+    return bytes(factors)
+
+
+def block_from_bytes(byt: bytes) -> int:
+    '''
+    Translate the bytes to a numeric value in base 2 ** 8.
+    Bytes are taken in little endian.
+    
+    Parameters
+    ----------
+    byt : bytes
+        Bytes to transform
+    base: 
+    Returns
+    -------
+    int
+        Numeric value of the bytes
+
+    '''
+    return from_base_factors(byt, 2 ** 8)
+
+_LAZY_BACKEND = _lazy_backend()
+_backend = _LAZY_BACKEND
+
+if __name__ == "__main__":
+    by = b"\x00\x00\x01"
+    b = block_from_bytes(by)
+    by2 = bytes_from_block(b)
+    by2 = bytes_from_block(b, 3)
\ No newline at end of file
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+Concurrent load generator for capacity planning.
+
+Simulates N clients, each doing a weighted mix of operations (Diffie-Hellman
+handshakes, RSA encryption/decryption, signing/verification and ElGamal),
+over threads, processes or asyncio tasks. Reports latency percentiles and
+throughput per operation and the CPU used, optionally as JSON.
+
+Run with:
+    python -m criptorsa.load_test --clients 8 --mode processes --requests 50 \\
+        --mix dh=2,rsa_encrypt=1,rsa_decrypt=1 --output results.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .rsa import rsa_keygen, rsa_encrypt, rsa_decrypt
+from .rsa_signature import rsa_sign, rsa_verify
+from .diffie_hellman import rfc_group, generate_keypair, common_key
+from .elgamal import elgamal_keygen, elgamal_encrypt, elgamal_decrypt
+
+OPERATIONS = ("dh", "rsa_encrypt", "rsa_decrypt", "rsa_sign", "rsa_verify",
+              "elgamal_encrypt", "elgamal_decrypt")
+MODES = ("threads", "processes", "asyncio")
+
+
+def prepare(nlen: int = 2048, group_bits: int = 1536, payload_size: int = 256) -> dict:
+    '''
+    Keys, groups and inputs shared by every client. Everything is made of
+    ints and bytes so it can be sent to worker processes
+
+    Parameters
+    ----------
+    nlen : int, optional
+        Bit size of the RSA modulus. The default is 2048
+    group_bits : int, optional
+        Bit size of the RFC 3526 group used by Diffie-Hellman and ElGamal.
+        The default is 1536, the only one available
+    payload_size : int, optional
+        Bytes of the messages. The default is 256
+
+    Returns
+    -------
+    dict
+        The context of the operations
+    '''
+    (n, e), d = rsa_keygen(nlen, crt=True)
+    group = rfc_group(group_bits)
+    pk, ai = elgamal_keygen(group.p, group.g, group.q, group.exponent_bits)
+    message = os.urandom(payload_size)
+    return {
+        "n": n, "e": e, "d": d, "group": tuple(group), "pk": pk, "ai": ai,
+        "message": message,
+        "encrypted": rsa_encrypt(message, n, e),
+        "signature": rsa_sign(message, n, d),
+        "peer": generate_keypair(*group)[1],
+        "elgamal": elgamal_encrypt(message, group.g, pk, group.p, group.q,
+                                   group.exponent_bits),
+    }
+
+
+def run_operation(name: str, context: dict):
+    '''
+    Run one operation of the mix with the keys of the context
+    '''
+    n, e, d = context["n"], context["e"], context["d"]
+    p, g, q, exponent_bits = context["group"]
+    message = context["message"]
+    if name == "dh":
+        # Both halves of a handshake: own public value and common key
+        generate_keypair(p, g, q, exponent_bits)
+        return common_key(p, context["peer"], q, exponent_bits)
+    if name == "rsa_encrypt":
+        return rsa_encrypt(message, n, e)
+    if name == "rsa_decrypt":
+        return rsa_decrypt(context["encrypted"], n, d)
+    if name == "rsa_sign":
+        return rsa_sign(message, n, d)
+    if name == "rsa_verify":
+        return rsa_verify(message, n, e, context["signature"])
+    if name == "elgamal_encrypt":
+        return elgamal_encrypt(message, g, context["pk"], p, q, exponent_bits)
+    if name == "elgamal_decrypt":
+        return elgamal_decrypt(context["elgamal"], p, context["ai"])
+    raise ValueError("Unknown operation {}".format(name))
+
+
+def _schedule(mix: dict, requests: int, seed: int) -> list[str]:
+    # Operations of one client, drawn with the weights of the mix.
+    # Reproducible on purpose, this is workload shape, not key material
+    names = sorted(mix)
+    return random.Random(seed).choices(names, [mix[name] for name in names], k=requests)
+
+
+def run_client(job: tuple) -> list[tuple[str, float]]:
+    '''
+    Run the operations of one client one after the other
+
+    Parameters
+    ----------
+    job : tuple
+        context, mix, number of requests, seed and deadline (a time.time()
+        value, or None)
+
+    Returns
+    -------
+    list[tuple[str, float]]
+        Operation name and latency in seconds of each request
+    '''
+    context, mix, requests, seed, deadline = job
+    samples = []
+    for name in _schedule(mix, requests, seed):
+        if deadline is not None and time.time() >= deadline:
+            break
+        start = time.perf_counter()
+        run_operation(name, context)
+        samples.append((name, time.perf_counter() - start))
+    return samples
+
+
+async def _run_async(jobs: list[tuple]) -> list[list[tuple[str, float]]]:
+    async def client(job):
+        context, mix, requests, seed, deadline = job
+        samples = []
+        for name in _schedule(mix, requests, seed):
+            if deadline is not None and time.time() >= deadline:
+                break
+            start = time.perf_counter()
+            await asyncio.to_thread(run_operation, name, context)
+            samples.append((name, time.perf_counter() - start))
+        return samples
+
+    return await asyncio.gather(*(client(job) for job in jobs))
+
+
+def percentile(values: list[float], q: float) -> float:
+    '''
+    Nearest rank percentile q (0 to 100) of sorted values
+    '''
+    if not values:
+        return math.nan
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+def _cpu_seconds() -> float:
+    usage = [resource.getrusage(who) for who in (resource.RUSAGE_SELF,
+                                                 resource.RUSAGE_CHILDREN)]
+    return sum(u.ru_utime + u.ru_stime for u in usage)
+
+
+def run_load(context: dict, mix: dict, clients: int = 8, requests: int = 20,
+             mode: str = "threads", duration: float = None) -> dict:
+    '''
+    Drive the library with concurrent clients and summarize the latencies
+
+    Parameters
+    ----------
+    context : dict
+        Keys and inputs, see prepare
+    mix : dict
+        Relative weight of each operation, for example {"dh": 2,
+        "rsa_decrypt": 1}
+    clients : int, optional
+        Number of concurrent clients. The default is 8
+    requests : int, optional
+        Requests per client. The default is 20
+    mode : str, optional
+        "threads", "processes" (one process per client) or "asyncio" (one
+        task per client, operations run with asyncio.to_thread). The
+        default is "threads"
+    duration : float, optional
+        Stop the clients after this many seconds even if they have requests
+        left. The default is None
+
+    Returns
+    -------
+    dict
+        Configuration, wall time, CPU usage and, per operation, count,
+        throughput and p50/p95/p99/max latency in milliseconds
+    '''
+    unknown = set(mix) - set(OPERATIONS)
+    if unknown:
+        raise ValueError("Unknown operations {}, expected some of {}"
+                         .format(sorted(unknown), OPERATIONS))
+    if mode not in MODES:
+        raise ValueError("Unknown mode {}, expected one of {}".format(mode, MODES))
+
+    cpu_start = _cpu_seconds()
+    start = time.perf_counter()
+    deadline = None if duration is None else time.time() + duration
+    jobs = [(context, mix, requests, seed, deadline) for seed in range(clients)]
+    if mode == "asyncio":
+        results = asyncio.run(_run_async(jobs))
+    elif mode == "processes":
+        with ProcessPoolExecutor(max_workers=clients) as executor:
+            results = list(executor.map(run_client, jobs))
+    else:
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            results = list(executor.map(run_client, jobs))
+    wall = time.perf_counter() - start
+    cpu = _cpu_seconds() - cpu_start
+
+    latencies = {}
+    for samples in results:
+        for name, latency in samples:
+            latencies.setdefault(name, []).append(latency)
+    operations = {}
+    for name, values in sorted(latencies.items()):
+        values.sort()
+        operations[name] = {
+            "count": len(values),
+            "throughput": len(values) / wall,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "max_ms": values[-1] * 1000,
+        }
+    total = sum(op["count"] for op in operations.values())
+    return {
+        "mode": mode,
+        "clients": clients,
+        "requests_per_client": requests,
+        "mix": mix,
+        "cpus": os.cpu_count(),
+        "wall_seconds": wall,
+        "cpu_seconds": cpu,
+        # 100 means one core fully busy
+        "cpu_percent": 100 * cpu / wall,
+        "throughput": total / wall,
+        "operations": operations,
+    }
+
+
+def parse_mix(text: str) -> dict:
+    '''
+    Parse a mix given as "name=weight,name=weight". A name without weight
+    has weight 1
+    '''
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.strip().partition("=")
+        mix[name] = float(weight) if weight else 1.0
+    return mix
+
+
+def print_report(report: dict):
+    print("{} clients over {}, {:.2f} s, CPU {:.0f}% ({} cores), {:.1f} ops/s".format(
+        report["clients"], report["mode"], report["wall_seconds"],
+        report["cpu_percent"], report["cpus"], report["throughput"]))
+    print("{:>16} {:>7} {:>9} {:>9} {:>9} {:>9}".format(
+        "operation", "count", "ops/s", "p50 ms", "p95 ms", "p99 ms"))
+    for name, op in report["operations"].items():
+        print("{:>16} {:>7} {:>9.1f} {:>9.2f} {:>9.2f} {:>9.2f}".format(
+            name, op["count"], op["throughput"], op["p50_ms"], op["p95_ms"], op["p99_ms"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=20,
+                        help="Requests per client")
+    parser.add_argument("--duration", type=float, default=None,
+                        help="Stop after this many seconds")
+    parser.add_argument("--mode", choices=MODES, default="threads")
+    parser.add_argument("--mix", default=",".join(OPERATIONS),
+                        help="Weighted operations, e.g. dh=2,rsa_decrypt=1")
+    parser.add_argument("--nlen", type=int, default=2048)
+    parser.add_argument("--group-bits", type=int, default=1536)
+    parser.add_argument("--payload", type=int, default=256, help="Bytes per message")
+    parser.add_argument("--output", default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    context = prepare(args.nlen, args.group_bits, args.payload)
+    report = run_load(context, parse_mix(args.mix), args.clients, args.requests,
+                      args.mode, args.duration)
+    report.update(nlen=args.nlen, group_bits=args.group_bits, payload=args.payload)
+    print_report(report)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
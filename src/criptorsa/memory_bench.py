@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+Peak memory regression suite for the public encryption entry points.
+
+Runs rsa_encrypt, rsa_decrypt, elgamal_encrypt, elgamal_decrypt and
+rsa_sign over payloads of increasing size, each measurement in a fresh
+process, and records the tracemalloc peak and the RSS high-water mark of
+the operation alone (inputs are prepared before measuring). Reports the
+bytes of overhead per plaintext byte and exits with status 1 when an
+operation goes over its budget in memory_budgets.json.
+
+Run with:
+    python -m criptorsa.memory_bench --sizes 1K,64K,1M
+    python -m criptorsa.memory_bench --sizes 1G --ops rsa_encrypt
+    python -m criptorsa.memory_bench --update-budgets
+"""
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import sys
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+from .rsa import rsa_keygen, rsa_encrypt, rsa_decrypt
+from .rsa_signature import rsa_sign
+from .elgamal import elgamal_keygen, elgamal_encrypt, elgamal_decrypt
+
+OPERATIONS = ("rsa_encrypt", "rsa_decrypt", "elgamal_encrypt", "elgamal_decrypt", "rsa_sign")
+BUDGETS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "memory_budgets.json")
+# Below this size fixed costs dominate the overhead per byte, so budgets are
+# only enforced from here on
+BUDGET_MIN_SIZE = 64 * 1024
+# Margin added to the measurements by --update-budgets
+HEADROOM = 1.25
+# ElGamal group of the demos: small enough to run large payloads
+ELGAMAL_GROUP = (68507, 64136)
+
+UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+def parse_size(text: str) -> int:
+    '''
+    Parse a size such as 512, 64K, 1M or 1G (powers of 1024)
+    '''
+    text = text.strip().upper().rstrip("B")
+    unit = text[-1] if text and text[-1] in UNITS else ""
+    return int(float(text[:len(text) - len(unit)]) * UNITS[unit])
+
+
+def _status_kb(field: str) -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def _reset_rss_peak():
+    # Writing 5 to clear_refs resets VmHWM to the current RSS (Linux)
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _prepare(op: str, size: int, keys: dict):
+    # Inputs of the operation and the function to measure
+    (n, e), d = keys["rsa"]
+    p, g = ELGAMAL_GROUP
+    pk, ai = keys["elgamal"]
+    # One-off costs of a fresh process (importing the arithmetic backend,
+    # and NumPy for the small ElGamal group) are paid before measuring
+    rsa_encrypt(b"\0", n, e)
+    elgamal_encrypt(b"\0", g, pk, p)
+    message = os.urandom(size)
+    if op == "rsa_encrypt":
+        return lambda: rsa_encrypt(message, n, e)
+    if op == "rsa_decrypt":
+        encrypted = rsa_encrypt(message, n, e)
+        return lambda: rsa_decrypt(encrypted, n, d)
+    if op == "rsa_sign":
+        return lambda: rsa_sign(message, n, d)
+    if op == "elgamal_encrypt":
+        return lambda: elgamal_encrypt(message, g, pk, p)
+    if op == "elgamal_decrypt":
+        encrypted = elgamal_encrypt(message, g, pk, p)
+        return lambda: elgamal_decrypt(encrypted, p, ai)
+    raise ValueError("Unknown operation {}".format(op))
+
+
+def measure(job: tuple) -> int:
+    '''
+    Peak memory of one operation, run in a worker process
+
+    Parameters
+    ----------
+    job : tuple
+        Operation name, payload size, keys and what to measure:
+        "tracemalloc" (peak of Python allocations) or "rss" (growth of the
+        resident set high-water mark). They are measured in separate runs
+        since tracemalloc inflates the RSS
+
+    Returns
+    -------
+    int
+        Peak bytes
+    '''
+    op, size, keys, kind = job
+    run = _prepare(op, size, keys)
+    gc.collect()
+    if kind == "tracemalloc":
+        tracemalloc.start()
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+    _reset_rss_peak()
+    before = _status_kb("VmRSS")
+    run()
+    return max(0, _status_kb("VmHWM") - before) * 1024
+
+
+def load_budgets(path: str = BUDGETS_PATH) -> dict:
+    '''
+    Budgets per operation: maximum tracemalloc peak per plaintext byte
+    '''
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def run_suite(ops: list[str], sizes: list[int], budgets: dict = None) -> list[dict]:
+    '''
+    Measure every operation at every size
+
+    Parameters
+    ----------
+    ops : list[str]
+        Operations, see OPERATIONS
+    sizes : list[int]
+        Payload sizes in bytes
+    budgets : dict, optional
+        Budgets per operation, see load_budgets. The default is None
+
+    Returns
+    -------
+    list[dict]
+        One row per operation and size, with the peaks, the overhead per
+        plaintext byte and whether the budget is exceeded
+    '''
+    budgets = budgets or {}
+    keys = {"rsa": rsa_keygen(2048, crt=True, engine="bpsw")}
+    keys["elgamal"] = elgamal_keygen(*ELGAMAL_GROUP)
+    rows = []
+    # A fresh process per measurement, so earlier runs do not raise the
+    # high-water mark or leave freed memory around
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context,
+                             max_tasks_per_child=1) as executor:
+        for op in ops:
+            for size in sizes:
+                traced = executor.submit(measure, (op, size, keys, "tracemalloc")).result()
+                rss = executor.submit(measure, (op, size, keys, "rss")).result()
+                per_byte = traced / size
+                budget = budgets.get(op)
+                rows.append({
+                    "op": op,
+                    "size": size,
+                    "tracemalloc_peak": traced,
+                    "tracemalloc_per_byte": per_byte,
+                    "rss_peak": rss,
+                    "rss_per_byte": rss / size,
+                    "budget": budget,
+                    "over_budget": (budget is not None and size >= BUDGET_MIN_SIZE
+                                    and per_byte > budget),
+                })
+                print_row(rows[-1])
+    return rows
+
+
+def print_row(row: dict):
+    print("{:>16} {:>12} {:>14} {:>9.2f} {:>14} {:>9.2f} {:>8}".format(
+        row["op"], row["size"], row["tracemalloc_peak"], row["tracemalloc_per_byte"],
+        row["rss_peak"], row["rss_per_byte"],
+        "OVER" if row["over_budget"] else "-" if row["budget"] is None else "ok"))
+    sys.stdout.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", default=",".join(OPERATIONS))
+    parser.add_argument("--sizes", default="1K,64K,1M",
+                        help="Payload sizes, e.g. 1K,1M,1G")
+    parser.add_argument("--budgets", default=BUDGETS_PATH)
+    parser.add_argument("--update-budgets", action="store_true",
+                        help="Store the measured peaks (plus headroom) as the new budgets")
+    parser.add_argument("--output", default=None, help="Write the rows as JSON")
+    args = parser.parse_args()
+
+    ops = [op.strip() for op in args.ops.split(",")]
+    unknown = set(ops) - set(OPERATIONS)
+    if unknown:
+        parser.error("unknown operations {}".format(sorted(unknown)))
+    sizes = [parse_size(size) for size in args.sizes.split(",")]
+    budgets = load_budgets(args.budgets)
+
+    print("{:>16} {:>12} {:>14} {:>9} {:>14} {:>9} {:>8}".format(
+        "operation", "bytes", "traced peak", "per byte", "RSS peak", "per byte", "budget"))
+    rows = run_suite(ops, sizes, None if args.update_budgets else budgets)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
+
+    if args.update_budgets:
+        for op in ops:
+            measured = [row["tracemalloc_per_byte"] for row in rows
+                        if row["op"] == op and row["size"] >= BUDGET_MIN_SIZE]
+            if measured:
+                budgets[op] = round(max(measured) * HEADROOM, 2)
+        with open(args.budgets, "w") as f:
+            json.dump(budgets, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print("Budgets written to {}".format(args.budgets))
+        return
+    over = [row for row in rows if row["over_budget"]]
+    for row in over:
+        print("{} over budget at {} bytes: {:.2f} > {:.2f} bytes per plaintext byte".format(
+            row["op"], row["size"], row["tracemalloc_per_byte"], row["budget"]))
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
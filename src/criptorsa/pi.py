@@ -0,0 +1,110 @@
+
+import math
+import threading
+from functools import lru_cache
+from decimal import Decimal, localcontext
+
+# 640320 ** 3 / 24
+_C3_OVER_24 = 10939058860032000
+# Decimal digits of pi added by each term of the series
+_DIGITS_PER_TERM = 14.181647462725477
+# Extra digits computed to absorb the truncation errors
+_GUARD_DIGITS = 10
+
+# Sums of the series already computed, extended in place when more digits
+# are requested, and the largest value of pi computed from them
+_cache = {"terms": 0, "P": 1, "Q": 1, "T": 0, "digits": 0, "value": 0}
+_cache_lock = threading.Lock()
+
+
+def _binary_split(a: int, b: int) -> tuple[int, int, int]:
+    """Binary splitting of the terms [a, b) of the Chudnovsky series.
+
+    Returns
+    -------
+    tuple[int, int, int]
+        P(a, b), Q(a, b) and T(a, b)
+    """
+    if b - a == 1:
+        if a == 0:
+            P = Q = 1
+        else:
+            P = (6 * a - 5) * (2 * a - 1) * (6 * a - 1)
+            Q = a * a * a * _C3_OVER_24
+        T = P * (13591409 + 545140134 * a)
+        if a % 2:
+            T = -T
+        return P, Q, T
+    m = (a + b) // 2
+    P_am, Q_am, T_am = _binary_split(a, m)
+    P_mb, Q_mb, T_mb = _binary_split(m, b)
+    return P_am * P_mb, Q_am * Q_mb, Q_mb * T_am + P_am * T_mb
+
+
+def pi_fixed(digits: int) -> int:
+    """Compute floor(pi * 10 ** digits) with the Chudnovsky series.
+
+    Results are cached: a request for fewer digits than already computed is
+    answered from the cache, and a request for more digits only computes
+    the missing terms of the series.
+
+    Arguments
+    ---------
+    digits: int
+        Number of decimals
+
+    Returns
+    -------
+    int
+        pi * 10 ** digits, truncated
+    """
+    if digits < 0:
+        raise ValueError("digits must be non negative")
+    with _cache_lock:
+        if digits > _cache["digits"]:
+            total = digits + _GUARD_DIGITS
+            terms = math.ceil(total / _DIGITS_PER_TERM) + 1
+            if terms > _cache["terms"]:
+                P1, Q1, T1 = _binary_split(_cache["terms"], terms)
+                P0, Q0, T0 = _cache["P"], _cache["Q"], _cache["T"]
+                _cache.update(terms=terms, P=P0 * P1, Q=Q0 * Q1, T=Q1 * T0 + P0 * T1)
+            one = 10 ** total
+            sqrt_c = math.isqrt(10005 * one * one)
+            value = (_cache["Q"] * 426880 * sqrt_c) // _cache["T"]
+            _cache.update(digits=digits, value=value // 10 ** _GUARD_DIGITS)
+        return _cache["value"] // 10 ** (_cache["digits"] - digits)
+
+
+def clear_cache():
+    """Forget every value of pi computed so far."""
+    with _cache_lock:
+        _cache.update(terms=0, P=1, Q=1, T=0, digits=0, value=0)
+    approximate_pi.cache_clear()
+
+
+# Converting a large integer to Decimal is not cheap either, so the last
+# few results are kept too (Decimal values are immutable)
+@lru_cache(maxsize=8)
+def approximate_pi(precision: int) -> Decimal:
+    """Compute Pi to precision number of decimals.
+
+    Uses the Chudnovsky series with binary splitting over integers (see
+    pi_fixed). Only a local Decimal context is used, so the precision of
+    the caller's context is left untouched and it is safe to call from
+    several threads.
+
+    Arguments
+    ---------
+    precision: int
+        Number of decimals
+
+    Returns
+    -------
+    Decimal
+        The approximation of the value of pi, with precision + 1
+        significant digits
+    """
+    digits = precision + _GUARD_DIGITS
+    with localcontext() as ctx:
+        ctx.prec = precision + 1
+        return +Decimal(pi_fixed(digits)).scaleb(-digits)
@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+"""
+Background prime pool with a persistent on-disk reserve.
+
+A refill thread keeps generating RSA primes (for the configured bit sizes
+and public exponent) and safe primes (for the configured diffie_primes
+sizes) until every pool reaches its target depth. rsa_keygen and
+diffie_primes take primes from the pool through their pool argument, and
+generate them live when it is empty.
+
+Every prime is handed out exactly once: take removes it from the pool,
+load claims the whole on-disk reserve (emptying the file) and save moves
+the primes in memory to the reserve. The reserve is always accessed under
+an exclusive lock, so several processes can share it. It holds private
+key material, so it is only readable by its owner.
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import contextmanager
+
+from .funcs import (
+    CandidateSampler, CancelToken, GenerationCancelled, estimate_k,
+    random_probable_prime, refill_forever
+)
+from .diffie_hellman import safe_prime
+
+_log = logging.getLogger(__name__)
+
+
+def rsa_prime(size: int, e: int = 2 ** 16 + 1, engine: str = "miller_rabin",
+              tries: int = 30000, deadline = None) -> int:
+    '''
+    Generate a prime of size bits suitable for rsa_keygen: not lower than
+    2 ** (size - 1) * sqrt(2) and with p - 1 coprime with e
+
+    Parameters
+    ----------
+    size : int
+        Number of bits of the prime
+    e : int, optional
+        Public exponent. The default is 2 ** 16 + 1
+    engine : str, optional
+        Primality engine, see funcs.is_probable_prime
+    tries : int, optional
+        Maximum number of candidates. The default is 30000
+    deadline : float | funcs.CancelToken, optional
+        Seconds of budget or a cancellation token, see
+        funcs.random_probable_prime
+
+    Returns
+    -------
+    int
+        The prime
+    '''
+    k = estimate_k(size, 2 ** -128) if engine == "miller_rabin" else None
+    return random_probable_prime(CandidateSampler(size, e=e), k=k, limit=tries,
+                                 engine=engine, deadline=deadline)
+
+
+class PrimePool:
+    '''
+    Pool of pregenerated primes refilled in the background
+
+    Parameters
+    ----------
+    sizes : list[int], optional
+        Bit sizes of the RSA primes to keep. A 2048 bits two-prime key
+        needs primes of 1024 bits
+    safe_sizes : list[int], optional
+        Values of nlen passed to diffie_primes for which safe primes are
+        kept
+    depth : int, optional
+        Target number of primes per size. The default is 8
+    e : int, optional
+        Public exponent the RSA primes are generated for. The default is
+        2 ** 16 + 1
+    path : str, optional
+        File of the on-disk reserve. None disables persistence
+    engine : str, optional
+        Primality engine used by the refill, see funcs.is_probable_prime
+    executor : concurrent.futures.Executor, optional
+        If given, primes are generated by this executor (for example a
+        ProcessPoolExecutor, to keep the refill off the GIL) instead of in
+        the refill thread itself. stop() cancels a generation in progress,
+        except in a process pool, where it is abandoned and its prime lost
+    '''
+
+    def __init__(self, sizes: list[int] = (), safe_sizes: list[int] = (),
+                 depth: int = 8, e: int = 2 ** 16 + 1, path: str = None,
+                 engine: str = "miller_rabin", executor: Executor = None):
+        self.depth = depth
+        self.e = e
+        self.path = path
+        self.engine = engine
+        self.executor = executor
+        self._rsa = {size: deque() for size in sizes}
+        self._safe = {nlen: deque() for nlen in safe_sizes}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._token = CancelToken()
+        self._thread = None
+        self._started = time.monotonic()
+        self._generated = 0
+        self._generation_time = 0.0
+        self._hits = 0
+        self._misses = 0
+        self._errors = 0
+
+    # ------------------------------------------------------------------ #
+    # Consumers
+    # ------------------------------------------------------------------ #
+
+    def take(self, size: int, e: int = None) -> int | None:
+        '''
+        Take an RSA prime of size bits, or None if there is none available
+
+        Parameters
+        ----------
+        size : int
+            Number of bits of the prime
+        e : int, optional
+            Public exponent the prime will be used with. The pool only has
+            primes for its own exponent
+
+        Returns
+        -------
+        int | None
+            The prime
+        '''
+        pool = self._rsa.get(size) if e is None or e == self.e else None
+        return self._pop(pool)
+
+    def take_safe(self, nlen: int) -> tuple[int, int] | None:
+        '''
+        Take a safe prime for diffie_primes(nlen), or None if there is none
+        available
+
+        Returns
+        -------
+        tuple[int, int] | None
+            q and p = 2q + 1
+        '''
+        return self._pop(self._safe.get(nlen))
+
+    def _pop(self, pool: deque):
+        with self._lock:
+            if pool:
+                self._hits += 1
+                value = pool.popleft()
+            else:
+                self._misses += 1
+                value = None
+        self._wakeup.set()
+        return value
+
+    # ------------------------------------------------------------------ #
+    # Refill
+    # ------------------------------------------------------------------ #
+
+    def start(self):
+        '''
+        Load the on-disk reserve and start the refill thread
+        '''
+        self.load()
+        self._stop.clear()
+        self._token = CancelToken()
+        self._thread = threading.Thread(target=self._refill, daemon=True,
+                                        name="prime-pool-refill")
+        self._thread.start()
+
+    def stop(self, save: bool = True):
+        '''
+        Stop the refill thread, cancelling the generation in progress, and,
+        if save, move the pool to the reserve
+        '''
+        self._stop.set()
+        self._token.cancel()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if save:
+            self.save()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _next_job(self):
+        # The emptiest pool is refilled first
+        with self._lock:
+            jobs = [(len(pool), rsa_prime, (size, self.e, self.engine), pool)
+                    for size, pool in self._rsa.items()]
+            jobs += [(len(pool), safe_prime, (nlen, None, 30000, self.engine), pool)
+                     for nlen, pool in self._safe.items()]
+        jobs = [job for job in jobs if job[0] < self.depth]
+        if not jobs:
+            return None
+        _, func, args, pool = min(jobs, key=lambda job: job[0])
+        token = self._token
+
+        def job():
+            start = time.monotonic()
+            if self.executor is None:
+                value = func(*args, deadline=token)
+            elif isinstance(self.executor, ProcessPoolExecutor):
+                # The token cannot reach another process
+                value = self._result(self.executor.submit(func, *args), token)
+            else:
+                value = self._result(self.executor.submit(func, *args, deadline=token),
+                                     token)
+            with self._lock:
+                pool.append(value)
+                self._generated += 1
+                self._generation_time += time.monotonic() - start
+        return job
+
+    def _result(self, future, token: CancelToken) -> int | tuple[int, int]:
+        # Wait for a generation in the executor, giving up on it on stop()
+        while True:
+            try:
+                return future.result(timeout=0.1)
+            except TimeoutError:
+                if future.done():
+                    raise
+                if token.cancelled:
+                    future.cancel()
+                    raise GenerationCancelled("Generation cancelled") from None
+
+    def _refill(self):
+        refill_forever(self._stop, self._wakeup, self._next_job, self._failed)
+
+    def _failed(self, delay: float):
+        # Out of tries, or a broken executor
+        _log.exception("Prime pool refill failed, retrying in %.1f s", delay)
+        with self._lock:
+            self._errors += 1
+
+    # ------------------------------------------------------------------ #
+    # Persistence
+    # ------------------------------------------------------------------ #
+
+    @contextmanager
+    def _locked_reserve(self):
+        with open(self.path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.path) as f:
+                        reserve = json.load(f)
+                except (FileNotFoundError, json.JSONDecodeError):
+                    reserve = {}
+                reserve.setdefault("rsa", {})
+                reserve.setdefault("safe", {})
+                yield reserve
+                tmp = self.path + ".tmp"
+                fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                # A temporary file left by a crash keeps its old mode
+                os.fchmod(fd, 0o600)
+                with os.fdopen(fd, "w") as f:
+                    json.dump(reserve, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def load(self) -> int:
+        '''
+        Claim the primes of the on-disk reserve that this pool can hold.
+        They are removed from the file so no other process can use them
+
+        Returns
+        -------
+        int
+            Number of primes loaded
+        '''
+        if self.path is None:
+            return 0
+        loaded = 0
+        with self._locked_reserve() as reserve, self._lock:
+            for size, pool in self._rsa.items():
+                primes = reserve["rsa"].pop("{}:{}".format(size, self.e), [])
+                pool.extend(primes)
+                loaded += len(primes)
+            for nlen, pool in self._safe.items():
+                pairs = reserve["safe"].pop(str(nlen), [])
+                pool.extend(tuple(pair) for pair in pairs)
+                loaded += len(pairs)
+        return loaded
+
+    def save(self) -> int:
+        '''
+        Move the primes in memory to the on-disk reserve
+
+        Returns
+        -------
+        int
+            Number of primes saved
+        '''
+        if self.path is None:
+            return 0
+        saved = 0
+        with self._locked_reserve() as reserve, self._lock:
+            for size, pool in self._rsa.items():
+                reserve["rsa"].setdefault("{}:{}".format(size, self.e), []).extend(pool)
+                saved += len(pool)
+                pool.clear()
+            for nlen, pool in self._safe.items():
+                reserve["safe"].setdefault(str(nlen), []).extend(pool)
+                saved += len(pool)
+                pool.clear()
+        return saved
+
+    # ------------------------------------------------------------------ #
+    # Metrics
+    # ------------------------------------------------------------------ #
+
+    def metrics(self) -> dict:
+        '''
+        Pool depth per size, hits and misses of take/take_safe, failed
+        generations and refill rate
+
+        Returns
+        -------
+        dict
+            The metrics
+        '''
+        with self._lock:
+            elapsed = time.monotonic() - self._started
+            return {
+                "depth": {size: len(pool) for size, pool in self._rsa.items()},
+                "safe_depth": {nlen: len(pool) for nlen, pool in self._safe.items()},
+                "hits": self._hits,
+                "misses": self._misses,
+                "generated": self._generated,
+                "errors": self._errors,
+                # Primes per second since the pool was created, and per
+                # second of generation time
+                "refill_rate": self._generated / elapsed if elapsed else 0.0,
+                "generation_rate": (self._generated / self._generation_time
+                                    if self._generation_time else 0.0),
+            }
+
+
+if __name__ == "__main__":
+    import warnings
+    from .rsa import rsa_keygen
+
+    with PrimePool(sizes=[256], safe_sizes=[32], depth=4,
+                   path="prime_pool.json", engine="bpsw") as pool:
+        time.sleep(2)
+        print(pool.metrics())
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            print(rsa_keygen(512, engine="bpsw", pool=pool))
+        print(pool.metrics())
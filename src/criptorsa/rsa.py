@@ -0,0 +1,942 @@
+"""
+Created on Wed Nov  9 12:54:13 2022
+
+@author: David
+"""
+import itertools
+import math
+import threading
+import warnings
+from collections import OrderedDict
+from typing import Iterable, Iterator, NamedTuple
+from .funcs import (
+    blocks_from_bytes, power_mod, product_mod, compute_block_size,
+    estimate_k, bitlength, coprimes, random_probable_prime,
+    multiplicative_inverse, iter_blocks, map_ordered, prime_lower_bound, CandidateSampler,
+    monitor
+)
+
+class CRTKey(NamedTuple):
+    '''
+    RSA private key with the parameters needed for CRT private operations
+    (RFC 8017, section 3.2, second representation).
+
+    primes are the prime factors r_1, ..., r_u of n, exponents the values
+    d mod (r_i - 1) and coefficients the CRT coefficients
+    (r_1 * ... * r_(i-1)) ** -1 mod r_i. The first coefficient is unused and
+    stored as 1 to keep the three tuples aligned.
+    '''
+    d: int
+    primes: tuple[int, ...]
+    exponents: tuple[int, ...]
+    coefficients: tuple[int, ...]
+
+
+def max_primes(nlen: int) -> int:
+    '''
+    Maximum number of prime factors allowed for a modulus of nlen bits, so
+    that every prime stays large enough to resist ECM factorization.
+
+    Parameters
+    ----------
+    nlen : int
+        Number of bits of n
+
+    Returns
+    -------
+    int
+        The maximum number of primes
+    '''
+    if nlen < 1024:
+        return 2
+    if nlen < 4096:
+        return 3
+    if nlen < 8192:
+        return 4
+    return 5
+
+
+def crt_key(d: int, primes: Iterable[int]) -> CRTKey:
+    '''
+    Compute the CRT representation of a private key
+
+    Parameters
+    ----------
+    d : int
+        Private exponent
+    primes : Iterable[int]
+        Prime factors of n
+
+    Returns
+    -------
+    CRTKey
+        The private key with its CRT parameters
+    '''
+    primes = tuple(primes)
+    exponents = tuple(d % (r - 1) for r in primes)
+    coefficients = [1]
+    product = primes[0]
+    for r in primes[1:]:
+        coefficients.append(multiplicative_inverse(product, r))
+        product *= r
+    return CRTKey(d, primes, exponents, tuple(coefficients))
+
+
+def rsa_keygen(nlen: int = 2048, e: int = 2 ** 16 + 1, tries : int = 30000,
+               nprimes: int = 2, crt: bool = False,
+               engine: str = "miller_rabin", pool = None,
+               deadline = None, progress = None
+               ) -> tuple[tuple[int, int], int | CRTKey]:
+    '''
+    Compute public and private keys for RSA
+
+    Parameters
+    ----------
+    nlen : int
+        Number of bits of n
+    e: int
+        Public exponent.
+    tries : int. Default is 30000
+        The number of randomly generated numbers to be tested for each prime
+        in each iteration.
+        If a number of random numbers equal to tries is generated, raise an
+        error.
+    nprimes : int. Default is 2
+        Number of prime factors of n (multi-prime RSA, RFC 8017). It is
+        limited by the size of n, see max_primes.
+    crt : bool. Default is False
+        Return the private key as a CRTKey. Multi-prime keys (nprimes > 2)
+        are always returned as a CRTKey, since their private operations
+        only pay off with the CRT.
+    engine : str. Default is "miller_rabin"
+        Primality engine used for the primes, see funcs.is_probable_prime.
+    pool : prime_pool.PrimePool. Default is None
+        Pool of pregenerated primes. Primes are taken from it while it has
+        primes of the right size, and generated otherwise.
+    deadline : float | funcs.CancelToken. Default is None
+        Seconds of budget, or a token another thread can cancel. Checked
+        between candidates; raises funcs.GenerationTimeout or
+        funcs.GenerationCancelled when it expires or is cancelled.
+    progress : Callable[[funcs.GenerationProgress], None]. Default is None
+        Progress callback, with phases "prime 1/2", "prime 2/2"... and
+        "done". See funcs.GenerationMonitor
+
+    Returns
+    -------
+    (n, e), d:
+        (n, e) is the public key and d the private key
+    '''
+    # This is a particularity of our implementation, we will see why
+    if nlen < 8:
+        raise ValueError("Number of bits of n must be greater than 8")
+    # Why?
+    if e % 2 != 1:
+        raise ValueError("e should be odd")
+    if nprimes < 2 or nprimes > max_primes(nlen):
+        raise ValueError("A modulus of {} bits must have between 2 and {} primes, got {}"
+                         .format(nlen, max_primes(nlen), nprimes))
+
+    # We are not going to enforce these limits, but they are NIST's recommendations
+    if e <= 2 ** 16 or e >= 2 ** 256:
+        warnings.warn("exponent e should be an odd integer between 2 ** 16 and 2 ** 256, got {}".format(e))
+    if nlen not in [2048, 3072]:
+        warnings.warn("bitlen should be in [2048, 3072], got {}".format(nlen))
+
+    # NIST restrictions to ensure the primes are big enough but not too close.
+    # The first primes take the remaining bits if nlen is not divisible
+    sizes = [nlen // nprimes + (i < nlen % nprimes) for i in range(nprimes)]
+    # Why these values?
+    min_primes = [prime_lower_bound(size) for size in sizes]
+    min_d = 2 ** (nlen // 2)
+    prime_diff = 2 ** (sizes[-1] - 100)
+
+    # Started before estimate_k, which takes seconds the first time for
+    # each size and cannot be interrupted, so the budget accounts for it
+    watch = monitor(deadline, progress)
+    # Ensure we mimimize the probabilities of error in the primality test.
+    # Only random rounds of Miller-Rabin need it
+    k = estimate_k(nlen, 2 ** - 128) if engine == "miller_rabin" else None
+
+    valid_d = False
+    # d must not be too small and the number of bits of n must be exactly nlen
+    # in accordance to NIST specifications
+    while not valid_d:
+        primes = []
+        for i, (size, min_prime) in enumerate(zip(sizes, min_primes)):
+            if watch is not None:
+                watch.set_phase("prime {}/{}".format(i + 1, nprimes))
+
+            def far_enough(candidate):
+                return all(abs(r - candidate) >= prime_diff for r in primes)
+
+            pooled = pool.take(size, e) if pool is not None else None
+            if (pooled is not None and pooled >= min_prime
+                    and coprimes(pooled - 1, e) and far_enough(pooled)):
+                primes.append(pooled)
+                continue
+            # The sampler only yields candidates above min_prime with
+            # candidate - 1 coprime with e. A new one per prime, so each
+            # walk starts from its own random point
+            primes.append(random_probable_prime(CandidateSampler(size, min_prime, e),
+                                                k = k, test_func = far_enough,
+                                                limit = tries,
+                                                engine = engine,
+                                                deadline = watch))
+
+        # Preserves properties of RSA and gives smaller values of d,
+        # which accelerates computations
+        carmichael_lambda = math.lcm(*(r - 1 for r in primes))
+        d = multiplicative_inverse(e, carmichael_lambda)
+        n = math.prod(primes)
+
+        # Check loop conditions. With more than two primes the lower bounds
+        # alone no longer guarantee that n has exactly nlen bits
+        valid_d = d > min_d and bitlength(n) == nlen
+    if watch is not None and watch is not deadline:
+        watch.done()
+    if crt or nprimes > 2:
+        return (n, e), crt_key(d, primes)
+    return (n, e), d
+
+
+def rsa_power(block: int, ex: int | CRTKey, n: int) -> int:
+    '''
+    Compute (block ** ex) % n, with the CRT if ex is a CRTKey
+
+    Parameters
+    ----------
+    block : int
+        Base
+    ex : int | CRTKey
+        Exponent, or a private key with its CRT parameters
+    n : int
+        Public modulus
+
+    Returns
+    -------
+    int
+        Result
+    '''
+    if not isinstance(ex, CRTKey):
+        return power_mod(block, ex, n)
+    # One exponentiation per prime with exponents and moduli of a fraction
+    # of the size, then Garner's recombination (RFC 8017, section 5.1.2)
+    residues = [power_mod(block, d_i, r)
+                for r, d_i in zip(ex.primes, ex.exponents)]
+    result = residues[0]
+    product = ex.primes[0]
+    for r, m_i, t_i in zip(ex.primes[1:], residues[1:], ex.coefficients[1:]):
+        result += product * product_mod(m_i - result, t_i, r)
+        product *= r
+    return result
+
+
+
+class BlockMemo:
+    '''
+    Bounded LRU memo of exponentiated blocks for one key (n, ex).
+
+    ONLY VALID FOR THE CURRENT DETERMINISTIC (TEXTBOOK) SCHEME: the same
+    plaintext block always encrypts to the same ciphertext block, and the
+    other way round, only because blocks are exponentiated without any
+    randomized padding. If padding is ever added, memoized results would be
+    wrong and this memo must not be used.
+
+    It also reveals which blocks repeat through timing, so only enable it
+    for data where that does not matter (zero filled regions, padded
+    records...).
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        Maximum number of blocks remembered. The default is 4096
+    '''
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self.key = None
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def power(self, block: int, ex: int | CRTKey, n: int) -> int:
+        '''
+        rsa_power(block, ex, n), remembering the result
+        '''
+        with self._lock:
+            if self.key is None:
+                self.key = (n, ex)
+            elif self.key != (n, ex):
+                raise ValueError("BlockMemo is bound to another key")
+            result = self._results.get(block)
+            if result is not None:
+                self._results.move_to_end(block)
+                self.hits += 1
+                return result
+            self.misses += 1
+        result = rsa_power(block, ex, n)
+        with self._lock:
+            self._results[block] = result
+            if len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+        return result
+
+    @property
+    def hit_rate(self) -> float:
+        '''
+        Fraction of blocks served from the memo
+        '''
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self.hits = self.misses = 0
+
+
+def _power_blocks(job: tuple) -> list[int]:
+    blocks, ex, n, memo = job
+    if memo is not None:
+        return [memo.power(block, ex, n) for block in blocks]
+    return [rsa_power(block, ex, n) for block in blocks]
+
+
+def _power_all(blocks: Iterable[int], ex: int | CRTKey, n: int, memo: BlockMemo = None,
+               executor=None, workers: int = None, mode: str = None,
+               chunk_size: int = 16) -> Iterable[int]:
+    # Lazily in the calling thread without a pool, else chunk_size blocks
+    # per job handed to the pool, see funcs.map_ordered
+    if executor is None and (workers is None or workers <= 1):
+        power = memo.power if memo is not None else rsa_power
+        return (power(block, ex, n) for block in blocks)
+    if memo is not None:
+        # The memo and its lock only live in this process
+        from concurrent.futures import ProcessPoolExecutor
+        if isinstance(executor, ProcessPoolExecutor):
+            raise ValueError("A BlockMemo cannot be used with a process pool")
+        mode = "threads"
+    jobs = [(chunk, ex, n, memo) for chunk in iter_blocks(blocks, chunk_size)]
+    results = map_ordered(_power_blocks, jobs, executor, workers, mode)
+    return (block for chunk in results for block in chunk)
+
+
+def rsa_conversion(by: bytes, n: int, ex: int | CRTKey, extract_blocks_size: int,
+                   memo: BlockMemo = None, executor=None, workers: int = None,
+                   mode: str = None, chunk_size: int = 16) -> list[int]:
+    '''
+    Executes RSA exponentiation on bytes and returns the blocks
+
+    Parameters
+    ----------
+    by : bytes
+        Message to be processed
+    n : int
+        Public modulus
+    ex : int | CRTKey
+        The exponent, or a private key with its CRT parameters
+    extract_blocks_size : int
+        Size of the blocks to be extracted from the message
+    memo : BlockMemo, optional
+        Memo of already exponentiated blocks for this key. Only valid for
+        the current deterministic scheme, see BlockMemo. It lives in this
+        process, so with a memo the pool created for the call is always a
+        thread pool, and a ProcessPoolExecutor is rejected with a
+        ValueError
+    executor : concurrent.futures.Executor, optional
+        Pool to run the exponentiations in, see funcs.map_ordered
+    workers : int, optional
+        Size of the pool created when no executor is given, see
+        funcs.map_ordered. The default is None, no pool
+    mode : str, optional
+        Kind of pool created, see funcs.execution_mode
+    chunk_size : int, optional
+        Blocks per job handed to a worker. The default is 16
+
+    Returns
+    -------
+    list[int]
+        Exponentiated blocks.
+
+    '''
+    blocks = blocks_from_bytes(by, extract_blocks_size)
+    return list(_power_all(blocks, ex, n, memo, executor, workers, mode, chunk_size))
+    
+
+
+def rsa_encrypted_size(length: int, n: int) -> int:
+    '''
+    Size of the result of rsa_encrypt for a message of length bytes
+
+    Parameters
+    ----------
+    length : int
+        Bytes of the message
+    n: int
+        Public modulus of receiver
+
+    Returns
+    -------
+    int
+        Bytes of the encrypted message
+    '''
+    block_size = compute_block_size(n)
+    # One block per started block of the message, plus the size block
+    return (-(-length // block_size) + 1) * (block_size + 1)
+
+
+
+def rsa_encrypt_into(buf, by: bytes, n: int, e: int, memo: BlockMemo = None,
+                     executor=None, workers: int = None, mode: str = None,
+                     chunk_size: int = 16) -> int:
+    '''
+    Encrypt a message using RSA, writing each encrypted block straight into
+    a caller supplied buffer at its fixed offset
+
+    Parameters
+    ----------
+    buf : writable buffer
+        Destination, for example a bytearray or a writable mmap. It must
+        hold at least rsa_encrypted_size(len(by), n) bytes
+    by : bytes
+        Message to encrypt
+    n: int
+        Public modulus of receiver
+    e : int
+        Public exponent of receiver
+    memo : BlockMemo, optional
+        Opt-in memo of encrypted blocks for this key, see BlockMemo
+    executor : concurrent.futures.Executor, optional
+        Pool to run the exponentiations in, see funcs.map_ordered. A memo
+        cannot be used with a ProcessPoolExecutor
+    workers : int, optional
+        Size of the pool created when no executor is given, see
+        funcs.map_ordered. The default is None, no pool
+    mode : str, optional
+        Kind of pool created, see funcs.execution_mode
+    chunk_size : int, optional
+        Blocks per job handed to a worker. The default is 16
+    Returns
+    -------
+    int
+        Number of bytes written
+    '''
+    block_size = compute_block_size(n)
+    encrypted_block_size = block_size + 1
+    size = rsa_encrypted_size(len(by), n)
+    out = memoryview(buf).cast("B")
+    if len(out) < size:
+        raise ValueError("Buffer too small, {} bytes needed".format(size))
+    message = memoryview(by).cast("B")
+    blocks = (int.from_bytes(message[start:start + block_size], "big")
+              for start in range(0, len(message), block_size))
+    # We add an additional block with size of the last one.
+    # This is necessary to properly decrypt leading null bytes
+    last_size = len(message) % block_size or block_size
+    results = _power_all(itertools.chain(blocks, (last_size,)), e, n, memo,
+                         executor, workers, mode, chunk_size)
+
+    for offset, result in zip(range(0, size, encrypted_block_size), results):
+        out[offset:offset + encrypted_block_size] = result.to_bytes(
+            encrypted_block_size, "big")
+    return size
+
+
+
+def rsa_encrypt(by: bytes, n: int, e: int, memo: BlockMemo = None, executor=None,
+                workers: int = None, mode: str = None) -> bytes:
+    '''
+    Encrypt a message using RSA
+
+    Parameters
+    ----------
+    text : bytes
+        Message to encrypt
+    n: int
+        Public modulus of receiver
+    e : int
+        Public exponent of receiver
+    memo : BlockMemo, optional
+        Opt-in memo of encrypted blocks for this key, see BlockMemo
+    executor : concurrent.futures.Executor, optional
+        Pool to run the exponentiations in, see funcs.map_ordered. A memo
+        cannot be used with a ProcessPoolExecutor
+    workers : int, optional
+        Size of the pool created when no executor is given, see
+        funcs.map_ordered. The default is None, no pool
+    mode : str, optional
+        Kind of pool created, see funcs.execution_mode
+    Returns
+    -------
+    bytes
+        The encrypted message
+    '''
+    encrypted = bytearray(rsa_encrypted_size(len(by), n))
+    rsa_encrypt_into(encrypted, by, n, e, memo, executor, workers, mode)
+    return bytes(encrypted)
+
+
+
+def _block_bytes(block: int, length: int) -> bytes:
+    # A decrypted block wider than its slot means a wrong key or corrupted data
+    try:
+        return block.to_bytes(length, "big")
+    except OverflowError:
+        raise ValueError("Not a message encrypted with this key") from None
+
+
+
+def rsa_decrypt_into(buf, by: bytes, n: int, d: int | CRTKey, memo: BlockMemo = None,
+                     executor=None, workers: int = None, mode: str = None,
+                     chunk_size: int = 16) -> int:
+    '''
+    Decrypt en encrypted message with RSA, writing each decrypted block
+    straight into a caller supplied buffer at its fixed offset
+
+    The size block is decrypted first, so the length of the message is
+    known before anything is written
+
+    Parameters
+    ----------
+    buf : writable buffer
+        Destination, for example a bytearray or a writable mmap. It must
+        hold the whole message, at most
+        (len(by) // (compute_block_size(n) + 1) - 1) * compute_block_size(n)
+        bytes
+    by : bytes
+        Encrypted message, any object supporting the buffer protocol
+    n : int
+        Receiver public modulus
+    d : int | CRTKey
+        Receiver private key. A CRTKey uses the faster CRT private operation
+    memo : BlockMemo, optional
+        Opt-in memo of decrypted blocks for this key, see BlockMemo
+    executor : concurrent.futures.Executor, optional
+        Pool to run the exponentiations in, see funcs.map_ordered. A memo
+        cannot be used with a ProcessPoolExecutor
+    workers : int, optional
+        Size of the pool created when no executor is given, see
+        funcs.map_ordered. The default is None, no pool
+    mode : str, optional
+        Kind of pool created, see funcs.execution_mode
+    chunk_size : int, optional
+        Blocks per job handed to a worker. The default is 16
+
+    Returns
+    -------
+    int
+        Number of bytes written, the length of the message
+    '''
+    block_size = compute_block_size(n)
+    encrypted_block_size = block_size + 1
+    encrypted = memoryview(by).cast("B")
+    nblocks, remainder = divmod(len(encrypted), encrypted_block_size)
+    if remainder or nblocks < 1:
+        raise ValueError("Not a message encrypted with this key")
+    power = memo.power if memo is not None else rsa_power
+
+    def encrypted_block(i):
+        start = i * encrypted_block_size
+        return int.from_bytes(encrypted[start:start + encrypted_block_size], "big")
+
+    # An empty message is only the size block
+    if nblocks == 1:
+        return 0
+    last_size = power(encrypted_block(nblocks - 1), d, n)
+    # A wrong key or a corrupted message gives a meaningless size
+    if not 0 < last_size <= block_size:
+        raise ValueError("Not a message encrypted with this key")
+    size = (nblocks - 2) * block_size + last_size
+    out = memoryview(buf).cast("B")
+    if len(out) < size:
+        raise ValueError("Buffer too small, {} bytes needed".format(size))
+
+    results = _power_all((encrypted_block(i) for i in range(nblocks - 1)), d, n, memo,
+                         executor, workers, mode, chunk_size)
+    for i, result in enumerate(results):
+        # decrypt the last block independently
+        length = block_size if i < nblocks - 2 else last_size
+        offset = i * block_size
+        out[offset:offset + length] = _block_bytes(result, length)
+    return size
+
+
+
+def rsa_decrypt(by: bytes, n: int, d: int | CRTKey, memo: BlockMemo = None, executor=None,
+                workers: int = None, mode: str = None) -> bytes:
+    '''
+    Decrypt en encrypted message with RSA
+
+    Parameters
+    ----------
+    text : str
+        Encrypted text
+    n : int
+        Receiver public modulus
+    d : int | CRTKey
+        Receiver private key. A CRTKey uses the faster CRT private operation
+    memo : BlockMemo, optional
+        Opt-in memo of decrypted blocks for this key, see BlockMemo
+    executor : concurrent.futures.Executor, optional
+        Pool to run the exponentiations in, see funcs.map_ordered. A memo
+        cannot be used with a ProcessPoolExecutor
+    workers : int, optional
+        Size of the pool created when no executor is given, see
+        funcs.map_ordered. The default is None, no pool
+    mode : str, optional
+        Kind of pool created, see funcs.execution_mode
+
+    Returns
+    -------
+    str.
+        The original message
+    '''
+    nblocks = len(by) // (compute_block_size(n) + 1)
+    decrypted = bytearray(max(nblocks - 1, 0) * compute_block_size(n))
+    size = rsa_decrypt_into(decrypted, by, n, d, memo, executor, workers, mode)
+    del decrypted[size:]
+    return bytes(decrypted)
+
+
+
+def rsa_encrypt_stream(chunks: Iterable[bytes], n: int, e: int,
+                       memo: BlockMemo = None) -> Iterator[bytes]:
+    '''
+    Encrypt a message given in chunks of any size, yielding the encrypted
+    blocks as they are ready. The concatenation of the output is exactly
+    rsa_encrypt of the concatenation of the chunks, so it can be decrypted
+    either way
+
+    Parameters
+    ----------
+    chunks : Iterable[bytes]
+        Message, for example the chunks read from a file
+    n: int
+        Public modulus of receiver
+    e : int
+        Public exponent of receiver
+    memo : BlockMemo, optional
+        Opt-in memo of encrypted blocks for this key, see BlockMemo
+
+    Yields
+    ------
+    bytes
+        Encrypted blocks, one or more per chunk
+    '''
+    block_size = compute_block_size(n)
+    encrypted_block_size = block_size + 1
+    power = memo.power if memo is not None else rsa_power
+    pending = bytearray()
+    for chunk in chunks:
+        pending += chunk
+        full = len(pending) - len(pending) % block_size
+        if not full:
+            continue
+        out = bytearray(full // block_size * encrypted_block_size)
+        offset = 0
+        for start in range(0, full, block_size):
+            block = int.from_bytes(pending[start:start + block_size], "big")
+            out[offset:offset + encrypted_block_size] = power(block, e, n).to_bytes(
+                encrypted_block_size, "big")
+            offset += encrypted_block_size
+        del pending[:full]
+        yield bytes(out)
+
+    # Same tail as rsa_encrypt: the partial block, if any, and the size block
+    last_size = len(pending) or block_size
+    tail = b""
+    if pending:
+        tail = power(int.from_bytes(pending, "big"), e, n).to_bytes(encrypted_block_size, "big")
+    yield tail + power(last_size, e, n).to_bytes(encrypted_block_size, "big")
+
+
+
+def rsa_decrypt_stream(chunks: Iterable[bytes], n: int, d: int | CRTKey,
+                       memo: BlockMemo = None) -> Iterator[bytes]:
+    '''
+    Decrypt a message encrypted with rsa_encrypt given in chunks of any
+    size, yielding the decrypted bytes as they are ready.
+
+    The last two blocks, the last one of the message and the size block,
+    are held back until the end of the input, since only then the length
+    of the last one is known
+
+    Parameters
+    ----------
+    chunks : Iterable[bytes]
+        Encrypted message, for example the chunks read from a file
+    n : int
+        Receiver public modulus
+    d : int | CRTKey
+        Receiver private key. A CRTKey uses the faster CRT private operation
+    memo : BlockMemo, optional
+        Opt-in memo of decrypted blocks for this key, see BlockMemo
+
+    Yields
+    ------
+    bytes
+        The original message, in pieces
+    '''
+    block_size = compute_block_size(n)
+    encrypted_block_size = block_size + 1
+    power = memo.power if memo is not None else rsa_power
+
+    def decrypt_block(start):
+        return power(int.from_bytes(pending[start:start + encrypted_block_size], "big"), d, n)
+
+    pending = bytearray()
+    for chunk in chunks:
+        pending += chunk
+        ready = len(pending) // encrypted_block_size - 2
+        if ready <= 0:
+            continue
+        out = bytearray(ready * block_size)
+        for i in range(ready):
+            out[i * block_size:(i + 1) * block_size] = decrypt_block(
+                i * encrypted_block_size).to_bytes(block_size, "big")
+        del pending[:ready * encrypted_block_size]
+        yield bytes(out)
+
+    nblocks, remainder = divmod(len(pending), encrypted_block_size)
+    if remainder or nblocks < 1:
+        raise ValueError("Not a message encrypted with this key")
+    # An empty message is only the size block
+    if nblocks == 2:
+        last_size = decrypt_block(encrypted_block_size)
+        if not 0 < last_size <= block_size:
+            raise ValueError("Not a message encrypted with this key")
+        yield decrypt_block(0).to_bytes(last_size, "big")
+
+
+
+def rsa_decrypt_range(by: bytes, n: int, d: int | CRTKey, offset: int,
+                      length: int = None) -> bytes:
+    '''
+    Decrypt only the bytes [offset, offset + length) of a message encrypted
+    with rsa_encrypt.
+
+    Every block is encrypted independently at a fixed width, so only the
+    blocks covering the range are decrypted. The trailing size block is
+    only decrypted if the range reaches the last block of the message.
+
+    Parameters
+    ----------
+    by : bytes
+        Encrypted message. Any object supporting the buffer protocol works,
+        for example an mmap of an encrypted file, and it is not copied
+    n : int
+        Receiver public modulus
+    d : int | CRTKey
+        Receiver private key
+    offset : int
+        Position of the first byte of the range in the original message
+    length : int, optional
+        Number of bytes of the range. The default is None, up to the end of
+        the message. Like slicing, the range is clipped to the message
+
+    Returns
+    -------
+    bytes
+        The bytes of the range
+    '''
+    if offset < 0 or (length is not None and length < 0):
+        raise ValueError("offset and length must be non negative")
+    block_size = compute_block_size(n)
+    encrypted_block_size = block_size + 1
+    view = memoryview(by).cast("B")
+    nblocks, remainder = divmod(len(view), encrypted_block_size)
+    if remainder or nblocks < 1:
+        raise ValueError("Not a message encrypted with this key")
+    # An empty message is only the size block
+    if nblocks == 1:
+        return b''
+    # The last data block is the one before the size block
+    last_index = nblocks - 2
+
+    def decrypt_block(i):
+        block = int.from_bytes(
+            view[i * encrypted_block_size:(i + 1) * encrypted_block_size], "big")
+        return rsa_power(block, d, n)
+
+    first = offset // block_size
+    if length is None:
+        last = last_index
+    elif length == 0:
+        return b''
+    else:
+        last = min((offset + length - 1) // block_size, last_index)
+    if first > last_index:
+        return b''
+
+    decrypted = [_block_bytes(decrypt_block(i), block_size)
+                 for i in range(first, min(last + 1, last_index))]
+    if last == last_index:
+        last_size = decrypt_block(nblocks - 1)
+        if not 0 < last_size <= block_size:
+            raise ValueError("Not a message encrypted with this key")
+        decrypted.append(_block_bytes(decrypt_block(last_index), last_size))
+    decrypted = (b'').join(decrypted)
+
+    start = offset - first * block_size
+    end = None if length is None else start + length
+    return decrypted[start:end]
+
+
+
+def _encrypt_blocks(blocks: list[int], last_size: int, n: int, e: int,
+                    block_size: int, padding: bytes = None) -> bytes:
+    # Same output as rsa_encrypt, from the already extracted blocks
+    encrypted_block_size = block_size + 1
+    if padding is None:
+        padding = power_mod(last_size, e, n).to_bytes(encrypted_block_size, "big")
+    encrypted = [power_mod(block, e, n).to_bytes(encrypted_block_size, "big")
+                 for block in blocks]
+    encrypted.append(padding)
+    return (b'').join(encrypted)
+
+
+def _encrypt_messages(job: tuple) -> list[bytes]:
+    messages, n, e, block_size, paddings = job
+    return [_encrypt_blocks(blocks_from_bytes(by, block_size), None, n, e, block_size,
+                            paddings[len(by) % block_size or block_size])
+            for by in messages]
+
+
+def _encrypt_for_keys(job: tuple) -> list[bytes]:
+    blocks, last_size, block_size, keys = job
+    return [_encrypt_blocks(blocks, last_size, n, e, block_size) for n, e in keys]
+
+
+def rsa_encrypt_many(messages: Iterable[bytes], key: tuple[int, int], executor=None,
+                     workers: int = None, chunk_size: int = 64) -> list[bytes]:
+    '''
+    Encrypt several messages for the same receiver. Same result as calling
+    rsa_encrypt for each message, but the block size is computed once and
+    the size blocks are encrypted once per distinct size
+
+    Parameters
+    ----------
+    messages : Iterable[bytes]
+        Messages to encrypt
+    key : tuple[int, int]
+        Public modulus and exponent (n, e) of the receiver
+    executor : concurrent.futures.Executor, optional
+        Pool to run the encryptions in, see funcs.map_ordered
+    workers : int, optional
+        Size of the process pool created when no executor is given, see
+        funcs.map_ordered. The default is None, no pool
+    chunk_size : int, optional
+        Messages per job handed to a worker. The default is 64
+
+    Returns
+    -------
+    list[bytes]
+        The encrypted messages, in the same order
+    '''
+    n, e = key
+    block_size = compute_block_size(n)
+    messages = list(messages)
+    # The size block only depends on the length of the last block
+    paddings = {}
+    for by in messages:
+        last_size = len(by) % block_size or block_size
+        if last_size not in paddings:
+            paddings[last_size] = power_mod(last_size, e, n).to_bytes(block_size + 1, "big")
+    jobs = [(chunk, n, e, block_size, paddings)
+            for chunk in iter_blocks(messages, chunk_size)]
+    results = map_ordered(_encrypt_messages, jobs, executor, workers)
+    return [encrypted for chunk in results for encrypted in chunk]
+
+
+def rsa_encrypt_for_recipients(by: bytes, keys: Iterable[tuple[int, int]], executor=None,
+                               workers: int = None, chunk_size: int = 16) -> list[bytes]:
+    '''
+    Encrypt the same message for several receivers. Same result as calling
+    rsa_encrypt for each key, but the message is split into blocks once per
+    distinct block size instead of once per key
+
+    Parameters
+    ----------
+    by : bytes
+        Message to encrypt
+    keys : Iterable[tuple[int, int]]
+        Public modulus and exponent (n, e) of each receiver
+    executor : concurrent.futures.Executor, optional
+        Pool to run the encryptions in, see funcs.map_ordered
+    workers : int, optional
+        Size of the process pool created when no executor is given, see
+        funcs.map_ordered. The default is None, no pool
+    chunk_size : int, optional
+        Keys per job handed to a worker. The default is 16
+
+    Returns
+    -------
+    list[bytes]
+        The encrypted messages, in the same order as the keys
+    '''
+    keys = list(keys)
+    # Keys sharing a block size share the blocks of the message
+    groups = {}
+    for index, (n, e) in enumerate(keys):
+        groups.setdefault(compute_block_size(n), []).append((index, (n, e)))
+    jobs = []
+    order = []
+    for block_size, members in groups.items():
+        blocks = blocks_from_bytes(by, block_size)
+        last_size = len(by) % block_size or block_size
+        for chunk in iter_blocks(members, chunk_size):
+            order.extend(index for index, _ in chunk)
+            jobs.append((blocks, last_size, block_size, [key for _, key in chunk]))
+    results = map_ordered(_encrypt_for_keys, jobs, executor, workers)
+    encrypted = [None] * len(keys)
+    for index, result in zip(order, (r for chunk in results for r in chunk)):
+        encrypted[index] = result
+    return encrypted
+
+if __name__ == "__main__":
+
+    # =========================================================================== #
+    # ================================= RSA KEYS ================================ #
+    # =========================================================================== #
+     # My keys
+    barrio_n = 26048554081918254772402396727078703502465630597557533117266018789540485475780747197584786190583271659321248729334208524047445737010919616936750858444125060319935027986793977486364471226442713933107427185696864514440603036987197122052742572277872232336254534169638265140240086157981444129651777094261637305372368382906823741917018463938809736866185156571482505798855621207493962046944957554996630201900999421476673956674245683880443049677156075409792647550985559524417635425479290915851823838059536484410257318950869021661885086295099873576476184621848777021277715499350226940503299366676306029946602286741170650381573
+    barrio_e = 1048577
+    barrio_d = 8218963619372557692910370685173757588806314476154927055346147062692628868106979050480147553042701294258555913965003579706731615304872009497402570357690150038548569994847074692005125073514891887001582620296057436250940461209132130711806558338852162323715363906602146812469387546685152118712836305956216115513645166176160379367790213854735464555181558968349118536807805876492651728335836742969901477132995724698537002827984322378797787447850240094657238846651355786074423434055493367106343372549149380884766894995811542324153769768606840351719414615414942624596654342120645031125422052336590868754335171446733398575793
+    
+    # de la Hera's keys
+    delahera_n = 102177145502170449647535015823292055188749752771393005649892105979200067597554948297407387457859709511918845152650987194391543702482122356296402530264892095093397819813676815413255338683528599712279533202539803336778869663204648825602128229440285623432111299318482515655843275628377999479423128550587755875503
+    delahera_e = 65537
+
+    #(n, e), d = rsa_keygen(1024)
+    print("===========================================================")
+    print("n:", barrio_n)
+    print("e:", barrio_e)
+    print("d:", barrio_d)
+    print("")
+    print("===========================================================")
+    print("")
+
+    # =========================================================================== #
+    # ============================ RSA ENCRYPTION =============================== #
+    # =========================================================================== #
+
+    message_barrio = "Hello, De La Hero! How are you?"
+    enc_barrio = message_barrio.encode("utf-16") 
+    encrypted_barrio = rsa_encrypt(enc_barrio, delahera_n, delahera_e)
+
+    print("Mi mensaje en claro: ", message_barrio)
+    print("\nMi mensaje encriptado: ", encrypted_barrio)
+    print("")
+    print("===========================================================")
+
+    # =========================================================================== #
+    # ============================ RSA DECRYPTION =============================== #
+    # =========================================================================== #
+    
+    encrypted_delahera = b'CR\x9d"\x9d\x9c\x02d\xdeq)\x1a\xbc\x97\xe6\xd0\xea^!\xf1\xdet\xe2\xf5\xfbz\xa81\xe6\x06\xfd\x91\xd5q\xed\x0e&"\xf4{Uq%z1\xfa\xaf9\xaf\x85\xe9}%\xb5hH\xf3\x94\xc3\xaf}\r\xb9\x19\x9ff\x1d4\x0bc\xe1.\xff>XF9v\x08\x04\xdb\x04\xcd\x1f\x95BoP\xa3\x0c6\xb9\xadW\xb0~i\n\xe8\x8a\xe2\x02\x84+\xfb|\x97\x0f\x81\xf6\xd7\x92\xb3\x1f\xb7\xbe\x91\x9d*\xba\x119\xf1\x08`G\xe9\xa2|\xa8\x88\xc1\xb6\xd2\x1b\xd6\xd3IV\x9b\xeco\xff\x01H\xd08O\xb8\xe7n\xf1[2\x98\xf6-\x07/\x13\\\xb4$\xf7\xc1]2A\xbaR\xe3\xb4\xac\xb3w\x93\xed\x12~\xbbv\xf5$\xcb\xa0/\xcf\xe8\xcb\xcc\xec\xca\xf2\xf2\x95\xe6F\x9d\xec\xfd\xa1wA\x11\x980\x9f\x7fw\xa3\r\xa8\x15\xcb\xa1h\xae=R\xe8R\xee70z?\xe2\xd6=\xa2\xd986\xa6\x92j\x06\xb8w\xe9\xf1UI\x04\xaa\xff\x1c\x03\x05;!8\xe9\xe3\\\x93\x1f\x16=\xfb\x1e\xecT\x87\xbeP\x85\xa7\x90\xcc\x8a\x10\xb4\x03\xef\xfa\x0f\xac\xf2\xd7Ii@X\n\xb44\x9d*h\xc1\xd64`\xda\xd1\xa3\xe5\xac\x00Hrc\xc3\xb9Q\x1eCs\x80n\xc6\x86{\xdf\xa6\x8f\xf9\xe8\xa1`\xafV>\x98\\\xe2\xbb\xd4\xde\xfb%\x9d\xc9\x01\xa2\x00\xfd}(9\xa9=k\t\xd0\xb0L5\x1bo\xab\xfb(\x81\xd7\x8b\xac\xa2lLnr\xb0\x84\x7f\xed\x9fl\x8a\x90\xaa\xca\xb8\xdf7\xb5L\x95j\xb8"\xcej\xa6\\\x85\'\xf6\xbd\xb3\xc0\xb8\xd8\x1a@o\x03~Q\xc8\x822\xf2\\\xcd\xafm\t\xb8\xd2N\xa4\xad\xf9\\V5j\xb4\x80\xb3j\xe1n\xd3\rJA\xa5\xac\xccX\x02\x93I\xab\xaeV\xee\x93\x1dqqw\xdf\xecr\xa3\x8d\xaa\xb1zi@\xb76r\xe3y\x0e\xe1\xd0p\xd4/Dwg\xfb\x8b]\'\xb3p\x18\xcf]\xb3\xddr\xf7\x96s\xaf\xef`\xcc\x1a\xf0\xab\xd0{\xc1\xdcI\xed\xf49/\xb5R\x94\x17\x14\x9a\x07jX\xec\xfaQ'
+    decrypted_delahera = rsa_decrypt(encrypted_delahera, barrio_n, barrio_d)
+
+    print("\nMensaje de De La Hera: ", decrypted_delahera.decode("utf-16"))
+    print("")
+    print("===========================================================")
\ No newline at end of file
@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""
+Binary keyring for RSA keys, designed to be opened with mmap.
+
+Layout (all integers big endian)
+--------------------------------
+Header:  magic "CRKR" | version (H) | reserved (H) | key count (I)
+         | index slots (I) | index offset (Q)
+Records: modulus bytes L (I) | number of primes u (H) | flags (H)
+         | n | e | d | r_1 | d_1 | t_1 | ... | r_u | d_u | t_u
+         Every integer takes exactly L bytes. d and the CRT parameters are
+         only present if the private flag is set.
+Index:   open addressing hash table of (fingerprint (16s), offset (Q))
+         slots, probed linearly from the first 8 bytes of the fingerprint.
+         An offset of 0 marks an empty slot.
+
+Lookups only touch the index slot and the record, so they are O(1) and,
+since the file is mapped read only, the pages are shared by every process
+that opens the same keyring. Records are decoded on first use.
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+from typing import Iterable, Iterator
+
+from .rsa import CRTKey, crt_key
+
+MAGIC = b"CRKR"
+VERSION = 1
+HEADER = struct.Struct("!4sHHIIQ")
+RECORD_HEADER = struct.Struct("!IHH")
+INDEX_SLOT = struct.Struct("!16sQ")
+FLAG_PRIVATE = 1
+
+
+def fingerprint(n: int, e: int) -> bytes:
+    '''
+    Identifier of a public key: the first 16 bytes of SHA-256(n || e)
+
+    Parameters
+    ----------
+    n : int
+        Public modulus
+    e : int
+        Public exponent
+
+    Returns
+    -------
+    bytes
+        The fingerprint
+    '''
+    size = (n.bit_length() + 7) // 8
+    return hashlib.sha256(n.to_bytes(size, "big") + e.to_bytes(size, "big")).digest()[:16]
+
+
+def _slot(fp: bytes, nslots: int) -> int:
+    return int.from_bytes(fp[:8], "big") % nslots
+
+
+def encode_record(n: int, e: int, d: int | CRTKey = None) -> bytes:
+    '''
+    Encode a key as a keyring record
+
+    Parameters
+    ----------
+    n : int
+        Public modulus
+    e : int
+        Public exponent
+    d : int | CRTKey, optional
+        Private key. Omit it to store only the public key
+
+    Returns
+    -------
+    bytes
+        The record
+    '''
+    size = (n.bit_length() + 7) // 8
+    fields = [n, e]
+    nprimes = 0
+    if d is not None:
+        if isinstance(d, CRTKey):
+            fields.append(d.d)
+            for params in zip(d.primes, d.exponents, d.coefficients):
+                fields.extend(params)
+            nprimes = len(d.primes)
+        else:
+            fields.append(d)
+    flags = FLAG_PRIVATE if d is not None else 0
+    return (RECORD_HEADER.pack(size, nprimes, flags)
+            + (b'').join(field.to_bytes(size, "big") for field in fields))
+
+
+def decode_record(buffer, offset: int) -> tuple[int, int, int | CRTKey | None]:
+    '''
+    Decode the record at offset
+
+    Parameters
+    ----------
+    buffer : bytes-like
+        Keyring contents
+    offset : int
+        Position of the record
+
+    Returns
+    -------
+    tuple[int, int, int | CRTKey | None]
+        n, e and the private key (None for public keys)
+    '''
+    size, nprimes, flags = RECORD_HEADER.unpack_from(buffer, offset)
+    nfields = 2 + (1 + 3 * nprimes if flags & FLAG_PRIVATE else 0)
+    start = offset + RECORD_HEADER.size
+    fields = [int.from_bytes(buffer[start + i * size:start + (i + 1) * size], "big")
+              for i in range(nfields)]
+    n, e = fields[:2]
+    if not flags & FLAG_PRIVATE:
+        return n, e, None
+    d = fields[2]
+    if nprimes:
+        crt = fields[3:]
+        d = CRTKey(d, tuple(crt[0::3]), tuple(crt[1::3]), tuple(crt[2::3]))
+    return n, e, d
+
+
+def write_keyring(path: str, keys: Iterable[tuple]) -> int:
+    '''
+    Write a keyring file with keys
+
+    Parameters
+    ----------
+    path : str
+        Destination file
+    keys : Iterable[tuple]
+        (n, e) or (n, e, d) tuples, d being an int or a CRTKey
+
+    Returns
+    -------
+    int
+        Number of keys written
+    '''
+    records = []
+    offset = HEADER.size
+    index = {}
+    for key in keys:
+        n, e, d = (tuple(key) + (None,))[:3]
+        fp = fingerprint(n, e)
+        if fp in index:
+            continue
+        record = encode_record(n, e, d)
+        index[fp] = offset
+        records.append(record)
+        offset += len(record)
+
+    # Load factor of at most 1/2 keeps the probe sequences short
+    nslots = max(1, 2 * len(index))
+    slots = [None] * nslots
+    for fp, record_offset in index.items():
+        i = _slot(fp, nslots)
+        while slots[i] is not None:
+            i = (i + 1) % nslots
+        slots[i] = (fp, record_offset)
+
+    # Private exponents: written to a file only its owner can read, and
+    # renamed so that readers never map a half written keyring
+    tmp = path + ".tmp"
+    with _open_private(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(index), nslots, offset))
+        for record in records:
+            f.write(record)
+        for slot in slots:
+            f.write(INDEX_SLOT.pack(*(slot or (bytes(16), 0))))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return len(index)
+
+
+def _open_private(path: str, mode: str = "w"):
+    # Opened for writing with permissions 0600, even if it already existed
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    os.fchmod(fd, 0o600)
+    return os.fdopen(fd, mode)
+
+
+class Keyring:
+    '''
+    Read only keyring mapped in memory
+
+    Parameters
+    ----------
+    path : str
+        Keyring file
+    '''
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.count, self._nslots, self._index = \
+            HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError("{} is not a keyring".format(path))
+        if version != VERSION:
+            raise ValueError("Unsupported keyring version {}".format(version))
+        self._decoded = {}
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._map.close()
+
+    def __reduce__(self):
+        # Pickled by path, a worker process maps the file again
+        return type(self), (self.path,)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def offset(self, fp: bytes) -> int | None:
+        '''
+        Offset of the record of the key with fingerprint fp, or None
+        '''
+        i = _slot(fp, self._nslots)
+        for _ in range(self._nslots):
+            slot_fp, offset = INDEX_SLOT.unpack_from(
+                self._map, self._index + i * INDEX_SLOT.size)
+            if offset == 0:
+                return None
+            if slot_fp == fp:
+                return offset
+            i = (i + 1) % self._nslots
+        return None
+
+    def get(self, fp: bytes | str) -> tuple[int, int, int | CRTKey | None]:
+        '''
+        Return the key with fingerprint fp, decoding it on first use
+
+        Parameters
+        ----------
+        fp : bytes | str
+            Fingerprint, raw or as a hex string
+
+        Returns
+        -------
+        tuple[int, int, int | CRTKey | None]
+            n, e and the private key (None for public keys)
+        '''
+        if isinstance(fp, str):
+            fp = bytes.fromhex(fp)
+        key = self._decoded.get(fp)
+        if key is not None:
+            return key
+        offset = self.offset(fp)
+        if offset is None:
+            raise KeyError(fp.hex())
+        key = decode_record(self._map, offset)
+        with self._lock:
+            self._decoded[fp] = key
+        return key
+
+    __getitem__ = get
+
+    def __contains__(self, fp: bytes | str) -> bool:
+        if isinstance(fp, str):
+            fp = bytes.fromhex(fp)
+        return self.offset(fp) is not None
+
+    def fingerprints(self) -> Iterator[bytes]:
+        '''
+        Iterate over the fingerprints of the keys, in index order
+        '''
+        for i in range(self._nslots):
+            fp, offset = INDEX_SLOT.unpack_from(
+                self._map, self._index + i * INDEX_SLOT.size)
+            if offset:
+                yield fp
+
+    def keys(self) -> Iterator[tuple[int, int, int | CRTKey | None]]:
+        '''
+        Iterate over every key
+        '''
+        for fp in self.fingerprints():
+            yield self.get(fp)
+
+
+def import_json(json_path: str, keyring_path: str) -> int:
+    '''
+    Build a keyring from a JSON file mapping names to {"n", "e", "d"}
+    (d optional, plus "primes" for CRT keys)
+    '''
+    with open(json_path) as f:
+        entries = json.load(f)
+    keys = []
+    for params in entries.values():
+        d = params.get("d")
+        if d is not None:
+            d = int(d)
+            if params.get("primes"):
+                d = crt_key(d, [int(r) for r in params["primes"]])
+        keys.append((int(params["n"]), int(params["e"]), d))
+    return write_keyring(keyring_path, keys)
+
+
+def export_json(keyring_path: str, json_path: str) -> int:
+    '''
+    Dump a keyring to a JSON file keyed by the hex fingerprints
+    '''
+    entries = {}
+    with Keyring(keyring_path) as keyring:
+        for fp in keyring.fingerprints():
+            n, e, d = keyring.get(fp)
+            params = {"n": n, "e": e}
+            if isinstance(d, CRTKey):
+                params["d"] = d.d
+                params["primes"] = list(d.primes)
+            elif d is not None:
+                params["d"] = d
+            entries[fp.hex()] = params
+    with _open_private(json_path) as f:
+        json.dump(entries, f, indent=1)
+    return len(entries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Binary RSA keyring tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("import", help="Build a keyring from JSON")
+    command.add_argument("json")
+    command.add_argument("keyring")
+    command = commands.add_parser("export", help="Dump a keyring to JSON")
+    command.add_argument("keyring")
+    command.add_argument("json")
+    command = commands.add_parser("list", help="List the keys of a keyring")
+    command.add_argument("keyring")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        print("Imported {} keys".format(import_json(args.json, args.keyring)))
+    elif args.command == "export":
+        print("Exported {} keys".format(export_json(args.keyring, args.json)))
+    else:
+        with Keyring(args.keyring) as keyring:
+            for fp in keyring.fingerprints():
+                n, e, d = keyring.get(fp)
+                print("{} {:>5} bits e={} {}".format(
+                    fp.hex(), n.bit_length(), e, "private" if d is not None else "public"))
+
+
+if __name__ == "__main__":
+    main()
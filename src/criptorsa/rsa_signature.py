@@ -6,7 +6,7 @@ Created on Tue Nov  22 13:08:44 2022
 """
 # RSA Signature Implementation
 import hashlib
-from rsa import rsa_decrypt, rsa_encrypt
+from .rsa import rsa_decrypt, rsa_encrypt, CRTKey
 
 def sha256(by: bytes) -> bytes:
     '''
@@ -25,7 +25,7 @@ def sha256(by: bytes) -> bytes:
     '''
     return hashlib.sha256(by).digest()
 
-def rsa_sign(by: bytes, n: int, d: int) -> bytes:
+def rsa_sign(by: bytes, n: int, d: int | CRTKey) -> bytes:
     '''
     Sign a message using RSA
 
@@ -35,8 +35,9 @@ def rsa_sign(by: bytes, n: int, d: int) -> bytes:
         Message to sign
     n: int
         Public modulus of receiver
-    d : int
-        Private exponent of receiver
+    d : int | CRTKey
+        Private exponent of receiver. A CRTKey uses the faster CRT private
+        operation
 
     Returns
     -------
@@ -67,8 +68,11 @@ def rsa_verify(by: bytes, n: int, e: int, signature: bytes) -> bool:
         True if the signature is valid, False otherwise
 
     '''
-    print("\nDecrypted: ",rsa_decrypt(signature, n, e))
-    return rsa_decrypt(signature, n, e) == by
+    try:
+        return rsa_decrypt(signature, n, e) == by
+    except (ValueError, IndexError, OverflowError):
+        # Made with another key or malformed: it does not even decode
+        return False
 
 def main():
 
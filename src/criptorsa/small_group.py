@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorized engine for groups with a small prime (p < 2 ** 31).
+
+Products of two values modulo such a prime fit in 62 bits, so whole arrays
+of blocks can be exponentiated with square-and-multiply over uint64 NumPy
+arrays instead of one Python pow call per block. elgamal and
+diffie_hellman switch to this engine automatically when supports(p) is
+True, and keep the pure Python path otherwise (including when NumPy is
+not installed).
+"""
+import threading
+from .funcs import block_from_bytes, random_bytes
+
+# NumPy is only imported the first time supports is called, see _load_numpy
+np = None
+_numpy_loaded = False
+_numpy_lock = threading.Lock()
+
+# Largest modulus whose products fit in an uint64
+MAX_MODULUS = 2 ** 31
+
+
+def _load_numpy():
+    global np, _numpy_loaded
+    if not _numpy_loaded:
+        # The flag is only set once the import is over, so that a thread
+        # never sees it loaded while np is still None
+        with _numpy_lock:
+            if not _numpy_loaded:
+                try:
+                    import numpy
+                    np = numpy
+                except ImportError:
+                    pass
+                _numpy_loaded = True
+    return np
+
+
+def supports(p: int) -> bool:
+    '''
+    Whether the vectorized engine can be used with the modulus p. Imports
+    NumPy the first time a small enough p is seen
+    '''
+    return 2 < p < MAX_MODULUS and _load_numpy() is not None
+
+
+def power_mod_array(base, exp, m: int):
+    '''
+    Element-wise (base ** exp) % m with square-and-multiply
+
+    Parameters
+    ----------
+    base : array_like
+        Bases, or a single base for every exponent
+    exp : array_like
+        Non negative exponents lower than 2 ** 64, or a single exponent for
+        every base
+    m : int
+        Modulo, lower than 2 ** 31
+
+    Returns
+    -------
+    numpy.ndarray
+        uint64 array with the results
+    '''
+    base, exp = np.broadcast_arrays(np.asarray(base, dtype=np.uint64) % np.uint64(m),
+                                    np.asarray(exp, dtype=np.uint64))
+    modulus = np.uint64(m)
+    one = np.uint64(1)
+    base = base.copy()
+    exp = exp.copy()
+    result = np.ones_like(base)
+    for _ in range(int(exp.max(initial=0)).bit_length()):
+        # Multiplying by 1 where the bit is clear is cheaper than masking
+        result *= np.where(exp & one, base, one)
+        result %= modulus
+        base *= base
+        base %= modulus
+        exp >>= one
+    return result
+
+
+def _reduce_exponent(ex: int, p: int) -> int:
+    # Exponents of elements of Z/pZ* can be reduced modulo p - 1 (Fermat)
+    # so they fit in an uint64
+    if ex < 2 ** 63:
+        return ex
+    return ex % (p - 1) or p - 1
+
+
+def blocks_array(by: bytes, block_size: int):
+    '''
+    Vectorized funcs.blocks_from_bytes: numeric value of each block of
+    block_size bytes, the last one possibly shorter
+
+    Parameters
+    ----------
+    by : bytes
+        Plain text
+    block_size : int
+        Number of bytes per block, at most 7
+
+    Returns
+    -------
+    numpy.ndarray
+        uint64 array with the blocks
+    '''
+    if block_size <= 0:
+        raise ValueError("Block size must be an integer greater than zero")
+    data = np.frombuffer(by, dtype=np.uint8)
+    full = len(data) // block_size * block_size
+    weights = np.uint64(256) ** np.arange(block_size - 1, -1, -1, dtype=np.uint64)
+    blocks = (data[:full].reshape(-1, block_size).astype(np.uint64) * weights).sum(
+        axis=1, dtype=np.uint64)
+    if full < len(data):
+        blocks = np.append(blocks, np.uint64(block_from_bytes(bytes(data[full:]))))
+    return blocks
+
+
+def random_range(count: int, low: int, high: int):
+    '''
+    count random values in [low, high) from funcs.random_bytes. high - low must be
+    lower than 2 ** 31, so the bias of reducing 64 random bits is below
+    2 ** -33
+
+    Returns
+    -------
+    numpy.ndarray
+        uint64 array with the values
+    '''
+    raw = np.frombuffer(random_bytes(8 * count), dtype=np.uint64)
+    return raw % np.uint64(high - low) + np.uint64(low)
+
+
+def elgamal_encryption(by: bytes, g: int, pk_bob: int, p: int,
+                       extract_blocks_size: int, low: int, high: int
+                       ) -> list[tuple[int, int]]:
+    '''
+    Vectorized elgamal.elgamal_encryption
+
+    Parameters
+    ----------
+    by : bytes
+        Message to be encrypted
+    g : int
+        Generator for G = Z/pZ*
+    pk_bob : int
+        Public key of Bob
+    p : int
+        Prime number
+    extract_blocks_size : int
+        Size of the blocks to be extracted from the message
+    low, high : int
+        Range of the ephemeral keys, see diffie_hellman.exponent_range
+    Returns
+    -------
+    list[tuple[int, int]]
+        Encrypted message
+    '''
+    blocks = blocks_array(by, extract_blocks_size)
+    keys = random_range(len(blocks), low, high)
+    # g ** key and pk_bob ** key share the exponents, so one pass does both
+    C1, shared = power_mod_array([[g], [pk_bob]], keys, p)
+    C2 = blocks * shared % np.uint64(p)
+    return list(zip(C1.tolist(), C2.tolist()))
+
+
+def bytes_array(chunks: list[bytes]):
+    '''
+    Numeric value of each chunk of bytes (big endian), at most 8 bytes long
+
+    Returns
+    -------
+    numpy.ndarray
+        uint64 array with the values
+    '''
+    width = len(chunks[0]) if chunks else 0
+    if any(len(chunk) != width for chunk in chunks):
+        return np.array([block_from_bytes(chunk) for chunk in chunks], dtype=np.uint64)
+    padded = np.zeros((len(chunks), 8), dtype=np.uint8)
+    if width:
+        padded[:, 8 - width:] = np.frombuffer((b'').join(chunks), dtype=np.uint8).reshape(-1, width)
+    return padded.view(">u8").ravel().astype(np.uint64)
+
+
+def elgamal_decryption(listC1: list, listC2: list, ai: int, p: int) -> list[int]:
+    '''
+    Vectorized elgamal.elgamal_decryption
+
+    Parameters
+    ----------
+    listC1 : list
+        List of C1
+    listC2 : list
+        List of C2, as bytes
+    ai : int
+        Private key
+    p : int
+        Prime number
+    Returns
+    -------
+    list[int]
+        Decrypted blocks
+    '''
+    shared = power_mod_array(listC1, _reduce_exponent(ai, p), p)
+    # p is prime, so the inverse is shared ** (p - 2)
+    inverse = power_mod_array(shared, p - 2, p)
+    return (bytes_array(listC2) * inverse % np.uint64(p)).tolist()
+
+
+def prime_factors(n: int) -> list[int]:
+    '''
+    Distinct prime factors of n by trial division
+    '''
+    factors = []
+    f = 2
+    while f * f <= n:
+        if n % f == 0:
+            factors.append(f)
+            while n % f == 0:
+                n //= f
+        f += 1 if f == 2 else 2
+    if n > 1:
+        factors.append(n)
+    return factors
+
+
+def generator_mask(candidates, p: int):
+    '''
+    Vectorized diffie_hellman.is_generator. A candidate g in [2, p - 1]
+    generates Z/pZ* iff g ** ((p - 1) / f) != 1 for every prime factor f
+    of p - 1
+
+    Parameters
+    ----------
+    candidates : array_like
+        Numbers to be checked
+    p : int
+        Prime number
+
+    Returns
+    -------
+    numpy.ndarray
+        Boolean array, True for the generators
+    '''
+    candidates = np.asarray(candidates, dtype=np.uint64)
+    mask = (candidates >= 2) & (candidates <= p - 1)
+    for f in prime_factors(p - 1):
+        mask &= power_mod_array(candidates, (p - 1) // f, p) != 1
+    return mask
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-from rsa import rsa_encrypt, rsa_decrypt
+from .rsa import rsa_encrypt, rsa_decrypt
 
 if __name__ == "__main__":
     # Barrio's keys
@@ -0,0 +1,74 @@
+import random
+import warnings
+
+import pytest
+
+from criptorsa import funcs
+from criptorsa.funcs import (
+    BACKEND_ENV_VAR, get_backend, set_backend, power_mod, product_mod,
+    multiplicative_inverse
+)
+from criptorsa.rsa import rsa_keygen, rsa_encrypt, rsa_decrypt
+
+
+@pytest.fixture(params=["python", "gmpy2"])
+def backend(request, monkeypatch):
+    if request.param == "gmpy2":
+        pytest.importorskip("gmpy2")
+    previous = funcs._backend
+    monkeypatch.setenv(BACKEND_ENV_VAR, request.param)
+    set_backend()
+    yield request.param
+    funcs._backend = previous
+
+
+def _cases(seed, count=200):
+    rng = random.Random(seed)
+    for _ in range(count):
+        m = rng.getrandbits(rng.choice([8, 64, 521, 2048])) | 1
+        yield rng.randrange(m), rng.getrandbits(rng.choice([1, 17, 1024])), m
+
+
+def test_selected_from_environment(backend):
+    assert get_backend().name == backend
+
+
+def test_power_mod(backend):
+    for base, exp, m in _cases(1):
+        result = power_mod(base, exp, m)
+        assert type(result) is int
+        assert result == pow(base, exp, m)
+    assert power_mod(3, 0, 7) == 1
+    assert power_mod(3, -1, 7) == 5
+    assert power_mod(12345, -3, 2 ** 127 - 1) == pow(12345, -3, 2 ** 127 - 1)
+
+
+def test_product_mod(backend):
+    for a, b, m in _cases(2):
+        result = product_mod(a, b, m)
+        assert type(result) is int
+        assert result == a * b % m
+
+
+def test_multiplicative_inverse(backend):
+    for number, _, m in _cases(3):
+        try:
+            expected = pow(number, -1, m)
+        except ValueError:
+            with pytest.raises(ValueError):
+                multiplicative_inverse(number, m)
+            continue
+        result = multiplicative_inverse(number, m)
+        assert type(result) is int
+        assert result == expected
+    with pytest.raises(ValueError):
+        multiplicative_inverse(6, 9)
+
+
+@pytest.mark.parametrize("crt", [False, True])
+def test_rsa_roundtrip(backend, crt):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        (n, e), d = rsa_keygen(1024, crt=crt)
+    for message in (b"", b"x", b"\x00\x00leading zeros", bytes(range(256)) * 3):
+        assert rsa_decrypt(rsa_encrypt(message, n, e), n, d) == message
@@ -0,0 +1,176 @@
+import errno
+import socket
+import threading
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from criptorsa.crypto_client import CryptoClient, DaemonError
+from criptorsa.crypto_daemon import CryptoDaemon, load_keys
+from criptorsa.diffie_hellman import rfc_group, generate_keypair
+from criptorsa.rsa import rsa_keygen, rsa_encrypt
+from criptorsa.rsa_keyring import write_keyring, fingerprint
+from criptorsa.rsa_signature import rsa_sign, rsa_verify
+
+
+def _keygen():
+    # Small keys keep the tests fast, the warning is expected
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        (n, e), d = rsa_keygen(1024)
+    return {"n": n, "e": e, "d": d}
+
+
+@pytest.fixture(scope="module")
+def keys():
+    group = rfc_group(1536)
+    return {"alice": _keygen(), "bob": _keygen(),
+            "dh": {"p": group.p, "q": group.q}}
+
+
+@pytest.fixture(scope="module")
+def group():
+    return rfc_group(1536)
+
+
+def _serve(path, keys, use_processes, **kwargs):
+    server = CryptoDaemon(str(path), keys, workers=2, use_processes=use_processes,
+                          **kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, thread
+
+
+def _stop(server, thread):
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+@pytest.fixture(params=["threads", "processes"])
+def daemon(request, tmp_path, keys):
+    path = tmp_path / "daemon.sock"
+    server, thread = _serve(path, keys, request.param == "processes")
+    yield str(path)
+    _stop(server, thread)
+
+
+def test_operations(daemon, keys, group):
+    alice = keys["alice"]
+    message = b"hello world " * 20
+    with CryptoClient(daemon) as client:
+        encrypted = client.encrypt("alice", message)
+        assert client.decrypt("alice", encrypted) == message
+        assert client.decrypt("alice", rsa_encrypt(message, alice["n"], alice["e"])) == message
+        assert client.decrypt("alice", rsa_encrypt(b"", alice["n"], alice["e"])) == b''
+
+        signature = client.sign("alice", message)
+        assert rsa_verify(message, alice["n"], alice["e"], signature)
+        assert client.verify("alice", message, signature)
+        assert client.verify("alice", message, rsa_sign(message, alice["n"], alice["d"]))
+        assert not client.verify("alice", message + b"!", signature)
+        assert not client.verify("bob", message, signature)
+        assert not client.verify("alice", message, b"garbage")
+
+        _, ga = generate_keypair(group.p, group.g, group.q)
+        assert 1 < client.common_key("dh", ga) < group.p - 1
+
+
+def test_errors(daemon):
+    with CryptoClient(daemon) as client:
+        with pytest.raises(DaemonError, match="Unknown key"):
+            client.encrypt("nobody", b"x")
+        with pytest.raises(DaemonError):
+            client.decrypt("alice", b"not a ciphertext")
+        with pytest.raises(DaemonError):
+            client.common_key("dh", 1)
+        # A failed request leaves the connection usable
+        assert client.decrypt("alice", client.encrypt("alice", b"x")) == b"x"
+
+
+@pytest.mark.parametrize("use_processes", [False, True], ids=["threads", "processes"])
+def test_concurrent_batches(tmp_path, keys, group, use_processes):
+    path = tmp_path / "daemon.sock"
+    # A long window and a small batch size force full and partial batches
+    server, thread = _serve(path, keys, use_processes, max_batch=8, window=0.05)
+    try:
+        alice, bob = keys["alice"], keys["bob"]
+
+        def roundtrip(i):
+            key_id, key = ("alice", alice) if i % 2 else ("bob", bob)
+            message = i.to_bytes(2, "big") * (i % 50)
+            with CryptoClient(str(path)) as client:
+                assert client.decrypt(key_id, client.encrypt(key_id, message)) == message
+                signature = client.sign(key_id, message)
+                assert rsa_verify(message, key["n"], key["e"], signature)
+                assert client.verify(key_id, message, signature)
+                _, ga = generate_keypair(group.p, group.g, group.q)
+                assert 1 < client.common_key("dh", ga) < group.p - 1
+            return i
+
+        with ThreadPoolExecutor(16) as pool:
+            assert sorted(pool.map(roundtrip, range(64))) == list(range(64))
+    finally:
+        _stop(server, thread)
+
+
+def test_daemons_keep_their_keys(tmp_path, keys):
+    first = _serve(tmp_path / "first.sock", {"k": keys["alice"]}, False)
+    second = _serve(tmp_path / "second.sock", {"k": keys["bob"]}, False)
+    try:
+        alice, bob = keys["alice"], keys["bob"]
+        with CryptoClient(str(tmp_path / "first.sock")) as client:
+            assert client.decrypt("k", rsa_encrypt(b"x", alice["n"], alice["e"])) == b"x"
+        with CryptoClient(str(tmp_path / "second.sock")) as client:
+            assert client.decrypt("k", rsa_encrypt(b"x", bob["n"], bob["e"])) == b"x"
+    finally:
+        _stop(*first)
+        _stop(*second)
+
+
+def test_keyring(tmp_path, keys):
+    alice, bob = keys["alice"], keys["bob"]
+    keyring = tmp_path / "keys.ring"
+    write_keyring(str(keyring), [(alice["n"], alice["e"], alice["d"]),
+                                 (bob["n"], bob["e"], bob["d"])])
+    loaded = load_keys(str(keyring))
+    key_id = fingerprint(bob["n"], bob["e"]).hex()
+    assert loaded.get("zz") is None
+    for use_processes in (False, True):
+        path = tmp_path / "keyring.sock"
+        server, thread = _serve(path, loaded, use_processes)
+        try:
+            with CryptoClient(str(path)) as client:
+                assert client.decrypt(key_id, client.encrypt(key_id, b"ring")) == b"ring"
+                with pytest.raises(DaemonError, match="Unknown key"):
+                    client.encrypt("00" * 16, b"x")
+        finally:
+            _stop(server, thread)
+    loaded.keyring.close()
+
+
+def test_socket_path(tmp_path, keys):
+    path = tmp_path / "daemon.sock"
+    # Not a socket
+    path.write_text("data")
+    with pytest.raises(FileExistsError):
+        CryptoDaemon(str(path), keys, workers=1, use_processes=False)
+    assert path.read_text() == "data"
+    path.unlink()
+
+    # A stale socket is replaced
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(str(path))
+    stale.close()
+    server, thread = _serve(path, keys, False)
+    try:
+        # A daemon still listening is not
+        with pytest.raises(OSError) as err:
+            CryptoDaemon(str(path), keys, workers=1, use_processes=False)
+        assert err.value.errno == errno.EADDRINUSE
+        with CryptoClient(str(path)) as client:
+            assert client.decrypt("alice", client.encrypt("alice", b"x")) == b"x"
+    finally:
+        _stop(server, thread)
+    assert not path.exists()
@@ -0,0 +1,114 @@
+import pytest
+
+from criptorsa.funcs import (
+    PRIMALITY_ENGINES, baillie_psw, strong_lucas, jacobi, deterministic_miller_rabin,
+    is_probable_prime, miller_rabin
+)
+
+LIMIT = 20000
+
+CARMICHAEL = [561, 1105, 1729, 2465, 2821, 6601, 8911, 10585, 15841, 29341,
+              41041, 825265, 321197185, 5394826801, 232250619601, 9746347772161]
+
+# Strong pseudoprimes to base 2 (OEIS A001262)
+STRONG_PSEUDOPRIMES_2 = [2047, 3277, 4033, 4681, 8321, 15841, 29341, 42799, 49141,
+                         52633, 65281, 74665, 80581, 85489, 88357, 90751]
+
+# Strong Lucas pseudoprimes with Selfridge's parameters (OEIS A217255)
+STRONG_LUCAS_PSEUDOPRIMES = [5459, 5777, 10877, 16109, 18971, 22499, 24569, 25199,
+                             40309, 58519, 75077, 97439]
+
+PRIMES = [2 ** 31 - 1, 2 ** 61 - 1, 2 ** 89 - 1, 2 ** 107 - 1, 2 ** 127 - 1,
+          2 ** 521 - 1, 2 ** 607 - 1, 1000000007, 3215031749]
+
+
+def _sieve(limit):
+    is_prime = [False, False] + [True] * (limit - 2)
+    for i in range(2, int(limit ** 0.5) + 1):
+        if is_prime[i]:
+            is_prime[i * i::i] = [False] * len(range(i * i, limit, i))
+    return is_prime
+
+
+SIEVE = _sieve(LIMIT)
+ODD = range(3, LIMIT, 2)
+
+
+def test_jacobi():
+    assert jacobi(1001, 9907) == -1
+    assert jacobi(19, 45) == 1
+    assert jacobi(8, 21) == -1
+    assert jacobi(5, 21) == 1
+    assert jacobi(0, 1) == 1
+    assert jacobi(6, 15) == 0
+    assert jacobi(-1, 7) == -1
+    # Euler's criterion for odd primes
+    for p in (3, 5, 7, 11, 101, 9973):
+        for a in range(p):
+            expected = pow(a, (p - 1) // 2, p)
+            assert jacobi(a, p) == (expected if expected < 2 else -1)
+    # Multiplicative in the denominator
+    for a in range(-20, 60):
+        assert jacobi(a, 9 * 35) == jacobi(a, 9) * jacobi(a, 35)
+
+
+def test_strong_lucas():
+    for n in ODD:
+        if SIEVE[n] and n > 5:
+            assert strong_lucas(n), n
+    for n in STRONG_LUCAS_PSEUDOPRIMES:
+        assert strong_lucas(n), n
+    pseudoprimes = set(STRONG_LUCAS_PSEUDOPRIMES)
+    assert not any(strong_lucas(n) for n in ODD if not SIEVE[n] and n not in pseudoprimes)
+    # Perfect squares have no valid parameters
+    assert not strong_lucas(9)
+    assert not strong_lucas(10403 ** 2)
+
+
+def test_baillie_psw():
+    for n in ODD:
+        assert baillie_psw(n) == SIEVE[n], n
+    for n in CARMICHAEL + STRONG_PSEUDOPRIMES_2 + STRONG_LUCAS_PSEUDOPRIMES:
+        assert not baillie_psw(n), n
+    for p in PRIMES[1:]:
+        assert baillie_psw(p), p
+        assert not baillie_psw(p * 1000003)
+
+
+def test_deterministic_miller_rabin():
+    for n in ODD:
+        assert deterministic_miller_rabin(n) == SIEVE[n], n
+    for n in CARMICHAEL + STRONG_PSEUDOPRIMES_2:
+        assert not deterministic_miller_rabin(n), n
+    # Strong pseudoprime to bases 2, 3, 5 and 7, the first bound where they
+    # are not enough
+    assert not deterministic_miller_rabin(3215031751)
+    assert deterministic_miller_rabin(3215031749)
+    assert deterministic_miller_rabin(2 ** 61 - 1)
+    with pytest.raises(ValueError):
+        deterministic_miller_rabin(2 ** 89 - 1)
+
+
+@pytest.mark.parametrize("engine", PRIMALITY_ENGINES)
+def test_is_probable_prime(engine):
+    for n in range(-2, LIMIT):
+        expected = n >= 0 and SIEVE[n]
+        assert is_probable_prime(n, engine=engine) == expected, n
+    for n in CARMICHAEL + STRONG_PSEUDOPRIMES_2 + STRONG_LUCAS_PSEUDOPRIMES:
+        assert not is_probable_prime(n, engine=engine), n
+    assert not is_probable_prime(3215031751, engine=engine)
+    for p in PRIMES:
+        assert is_probable_prime(p, engine=engine), p
+        assert not is_probable_prime(p * (2 ** 61 - 1), engine=engine)
+
+
+@pytest.mark.parametrize("engine", PRIMALITY_ENGINES)
+def test_engines_agree_with_miller_rabin(engine):
+    start = 10 ** 12
+    for n in range(start + 1, start + 4000, 2):
+        assert is_probable_prime(n, engine=engine) == miller_rabin(n, 20), n
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        is_probable_prime(7, engine="fermat")
@@ -0,0 +1,33 @@
+import warnings
+
+import pytest
+
+from criptorsa.rsa import rsa_keygen
+from criptorsa.rsa_signature import rsa_sign, rsa_verify
+
+
+@pytest.fixture(scope="module")
+def keys():
+    # Small keys keep the tests fast, the warning is expected
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return rsa_keygen(1024), rsa_keygen(1024)
+
+
+def test_verify(keys):
+    ((n, e), d), ((n2, e2), _) = keys
+    message = b"message " * 40
+    signature = rsa_sign(message, n, d)
+    assert rsa_verify(message, n, e, signature)
+    assert not rsa_verify(message + b"!", n, e, signature)
+    # Another key, truncated or malformed signatures are just invalid
+    assert not rsa_verify(message, n2, e2, signature)
+    assert not rsa_verify(message, n, e, signature[:-1])
+    assert not rsa_verify(message, n, e, b"garbage")
+    assert not rsa_verify(message, n, e, b"")
+
+
+def test_empty_message(keys):
+    ((n, e), d), _ = keys
+    assert rsa_verify(b"", n, e, rsa_sign(b"", n, d))
+    assert not rsa_verify(b"x", n, e, rsa_sign(b"", n, d))